@@ -4,12 +4,15 @@ import random
 import cv2 as cv
 import time
 
-from hwnd import WindowHandler, WindowCaptureMSS
-from events import Mouse, KeyboardInputHandler
-from control import PIDController, PIDParams
-from vision import FrameProcessorCV, ProcessingParams
-import utils
-from debug import FrameDebugger, DebugFPS
+from events import Mouse, MouseBackend, KeyboardInputHandler, KeyboardBackend
+from control import PIDBank, PIDParams, ControlScheduler, MotionLog
+from vision import FrameProcessorCV, ProcessingParams, VisionResult
+from pipeline import VisionPipeline, ProcessVisionPipeline
+from tracking import Tracker, TrackerParams
+from quality import QualityController, QualityParams
+from session import SessionRecorder
+from sources import FrameSource
+from debug import FrameDebugger, DebugFPS, StageTimer
 
 from typing import List, Tuple, Iterable, Any
 from dataclasses import dataclass
@@ -22,6 +25,28 @@ CLOSE_KEY = '9'
 
 # =======================
 
+def openWindowCapture(windowTitle: str) -> FrameSource:
+    '''live capture of game window (win32 only, imported on demand)'''
+    if windowTitle is None:
+        raise ValueError("Either windowTitle or frameSource must be given")
+    
+    from hwnd import WindowCaptureMSS
+    return WindowCaptureMSS(windowTitle=windowTitle)
+
+
+@dataclass
+class SearchWindowParams:
+    '''
+    tracking mode: while a target is held only a window around its last bbox is processed
+    window margin (per side) = minMargin + marginScale * max(w, h) + motionScale * last target motion
+    the window is shifted by the mouse movement since the bbox's frame was captured
+    '''
+    marginScale: float = 1.0
+    minMargin: int = 32  # px
+    motionScale: float = 2.0  # px of margin per px the target moved between last two frames
+    fullScanInterval: int = 30  # frames, full-frame scan even while target is held
+
+
 def drawCursor(frame: np.ndarray, color: tuple, cursorShape: str='+', fontScale: float=0.75) -> None:
     '''cursor at the center of frame'''
     h, w = frame.shape[:2] # omit other channels
@@ -44,90 +69,199 @@ def drawCursor(frame: np.ndarray, color: tuple, cursorShape: str='+', fontScale:
 
 
 class AutoAimBot:
-    # bbox filtering params (valid is inside this rect)
-    xCenterMin = 135
-    xCenterMax = float('inf')
-    yCenterMin = 0
-    yCenterMax = float('inf')
     
     def __init__(
         self, 
-        windowTitle: str, 
+        windowTitle: str | None=None, 
         processingParams: ProcessingParams=ProcessingParams(),
         pidParams=PIDParams(),
         debug=False,
+        pipelined=False,
+        frameSource: FrameSource | None=None,
+        tracking=False,
+        searchWindowParams: SearchWindowParams=SearchWindowParams(),
+        trackerParams: TrackerParams=TrackerParams(),
+        latencyCompensation=True,
+        maxPredictionTime: float=0.15,
+        keyboardBackend: KeyboardBackend | None=None,
+        mouseBackend: MouseBackend | None=None,
+        controlRate: float | None=None,
+        visionProcesses: int=0,
+        sessionPath: str | None=None,
+        qualityParams: QualityParams | None=None,
+        cameraFollowsMouse=True,
     ) -> None:
         
-        # same PID params for yaw and pitch
-        self.yawController = PIDController(params=pidParams)
-        self.pitchController = PIDController(params=pidParams)
-        
-        self.hWnd = WindowCaptureMSS(windowTitle=windowTitle)
-        self.mouseController = Mouse()
-        self.keyboardListener = KeyboardInputHandler()
-        
-        self.processingParams = ProcessingParams()
-        self.frameProc = FrameProcessorCV(params=self.processingParams)
+        # same PID params for yaw and pitch, stepped together
+        self.controller = PIDBank(pidParams, n=2)
+        
+        self.frameSource = frameSource if frameSource is not None else openWindowCapture(windowTitle)
+        self.mouseController = Mouse(backend=mouseBackend)
+        
+        # controlRate (Hz): controllers run in their own thread and output mouse velocity (px/s),
+        # frames only publish measurements; None -> one controller step per frame
+        self.controlScheduler = None
+        if controlRate:
+            self.controlScheduler = ControlScheduler(
+                self.controller, self.mouseController, 
+                rate=controlRate, maxPredictionTime=maxPredictionTime,
+            )
+        self.keyboardListener = KeyboardInputHandler(backend=keyboardBackend)
+        
+        self.processingParams = processingParams
+        # debug frames read result masks after vision moved on (pipelined), keep copies
+        self.frameProc = FrameProcessorCV(params=self.processingParams, keepMasks=debug)
+        
+        # capture and vision in background threads, main loop takes newest detections
+        self.pipeline = VisionPipeline(self.frameSource, self.detect) if pipelined else None
+        if visionProcesses:
+            # vision in worker processes (full frames, search window is not applied there)
+            self.pipeline = ProcessVisionPipeline(self.frameSource, self.processingParams, workers=visionProcesses)
+        
+        # qualityParams: blur/dilation/downscale are stepped down while frames go over 
+        # qualityParams.frameBudget and back up as headroom returns (in-process vision only)
+        self.quality = None
+        if qualityParams is not None and not visionProcesses:
+            self.quality = QualityController(self.frameProc, qualityParams)
         
         self.debug = debug
         self.frameDebugger = FrameDebugger()
         self.fpsDebugger = DebugFPS(sz=20)
         
-        self.prevTargetPos: Tuple[int, int] | None = None  # pos on image
+        # every detection is tracked, target is one of the tracks
+        self.tracker = Tracker(params=trackerParams)
+        self.trackIds = np.empty(0, dtype=np.int64)  # track id per bbox of current frame
+        self.targetId: int | None = None
+        # tracks live in a world frame (screen + own mouse movement), so turning the camera 
+        # is not mistaken for target motion; cameraOffset is the movement at current frame capture
+        # cameraFollowsMouse=False (replays: frames do not react to the mouse) -> world frame = screen
+        self.cameraFollowsMouse = cameraFollowsMouse
+        self.motion = MotionLog()
+        if cameraFollowsMouse and self.controlScheduler is not None:
+            self.motion = self.controlScheduler.motion
+        self.cameraOffset = np.zeros(2)
+        
+        self.prevTargetPos: Tuple[float, float] | None = None  # pos on image
+        self.prevTargetBbox: Tuple[int, int, int, int] | None = None
+        self.targetMotion = 0.0  # px the target moves between frames
+        
+        # capture -> mouse input latency of recent ticks, target is aimed where it will be when input lands
+        self.latency = StageTimer(sz=32)
+        self.latencyCompensation = latencyCompensation
+        self.maxPredictionTime = maxPredictionTime  # s, cap on extrapolation
+        
+        # search-window tracking (see SearchWindowParams)
+        self.tracking = tracking
+        self.searchWindowParams = searchWindowParams
+        self.framesSinceFullScan = 0
+        
+        # per-tick log of detections, target and control outputs (see session.py)
+        self.session = SessionRecorder(sessionPath) if sessionPath else None
+        self.frameSeq = 0  # seq of the current frame, 1-based
+        self.mouseDelta = (0, 0)  # mouse move emitted by the last update()
+        self.aimTarget: Tuple[float, float] | None = None  # position the last update() aimed at
+        self._loggedMoved = np.zeros(2)  # scheduler movement already logged
     
     def getTargetCentroids(self, bboxes) -> List[Tuple[int, int]]:
         return [(x + w // 2, y + h // 2) for x, y, w, h in bboxes]
     
-    def filterBboxes(self, bboxes):
-        
-        def isValid(bbox) -> bool:
-            x, y, w, h = bbox
-            cx, cy = x + w // 2, y + h // 2
-            
-            if self.xCenterMin <= cx <= self.xCenterMax and self.yCenterMin <= cy <= self.yCenterMax:
-                return True
-        
-            return False
-        
-        return list(filter(isValid, bboxes))
+    @property
+    def roi(self):
+        '''valid bbox area (valid is inside this rect), shared with the frame processor'''
+        return self.processingParams.roi
+    
+    def updateTracks(self, bboxes, captureTime: float) -> None:
+        '''feed detections of a frame captured at `captureTime` to the tracker'''
+        centroids = np.asarray(self.getTargetCentroids(bboxes), dtype=np.float64).reshape(-1, 2)
+        self.cameraOffset = offset = self.motion.at(captureTime)
+        shift = np.append(np.rint(offset), (0, 0)).astype(np.int64)
+        boxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4) + shift
+        self.trackIds = self.tracker.update(centroids + offset, boxes, captureTime)
     
     def chooseTarget(self, bboxes) -> None:  # side-effect
         
-        if not bboxes:
-            self.prevTargetPos = None
+        if self.targetId in self.tracker:
             return
         
-        if self.prevTargetPos:
-            return
-        
-        def bboxArea(bbox):
-            _, _, w, h = bbox
+        def bboxArea(idx):
+            _, _, w, h = bboxes[idx]
             return w * h
         
-        validBboxes = self.filterBboxes(bboxes)
-        if not validBboxes:
+        centroids = self.getTargetCentroids(bboxes)
+        validIdx = [i for i, (cx, cy) in enumerate(centroids) if self.roi.contains(cx, cy) and self.trackIds[i] >= 0]
+        if not validIdx:
             self.resetTarget()
             return
         
         # get random target from top 3 largest (nearest to player in-game) bboxes
-        targetBboxesSorted = sorted(validBboxes, key=bboxArea, reverse=True)
-        randomTargetBbox = random.choice(targetBboxesSorted[:3])
-        targetCentroid = self.getTargetCentroids([randomTargetBbox])[0]
-        self.prevTargetPos = targetCentroid
+        targetIdxSorted = sorted(validIdx, key=bboxArea, reverse=True)
+        self.targetId = int(self.trackIds[random.choice(targetIdxSorted[:3])])
+        self.updateCurrentTarget()
     
-    def updateCurrentTarget(self, bboxes) -> None:
-        '''get centroid that is nearest to target from previous state'''
+    def updateCurrentTarget(self) -> None:
+        '''target state from its track, predicted position while detections are missing'''
         
-        if self.prevTargetPos is None or not bboxes:
+        if self.targetId not in self.tracker:
+            self.targetId = None
+            self.prevTargetPos = None
+            self.prevTargetBbox = None
             return
-
-        centroids = self.getTargetCentroids(bboxes)
-
-        prevPos = np.array(self.prevTargetPos)
-        distances = [utils.distL2(prevPos, np.array(centroid)) for centroid in centroids]
-
-        nearestIdx = np.argmin(distances)
-        self.prevTargetPos = centroids[nearestIdx]
+        
+        self.prevTargetPos = tuple((self.tracker.position(self.targetId) - self.cameraOffset).tolist())
+        x, y, w, h = self.tracker.bbox(self.targetId)
+        dx, dy = np.rint(self.cameraOffset).astype(int).tolist()
+        self.prevTargetBbox = x - dx, y - dy, w, h
+        self.targetMotion = float(np.hypot(*self.tracker.velocity(self.targetId))) * self.tracker.frameInterval
+    
+    def searchWindow(self) -> Tuple[int, int, int, int] | None:
+        '''-> (x, y, w, h) around the held target, None -> full frame'''
+        bbox = self.prevTargetBbox
+        params = self.searchWindowParams
+        
+        if not self.tracking or bbox is None or self.framesSinceFullScan >= params.fullScanInterval:
+            return None
+        
+        x, y, w, h = bbox
+        # bbox is in screen space of its frame, the mouse moved since: the target shows up shifted back by it
+        dx, dy = np.rint(self.motion.total - self.cameraOffset).astype(int).tolist()
+        margin = int(params.minMargin + params.marginScale * max(w, h) + params.motionScale * self.targetMotion)
+        return x - dx - margin, y - dy - margin, w + 2 * margin, h + 2 * margin
+    
+    def detect(self, frame: np.ndarray) -> VisionResult:
+        '''vision for one frame, inside the search window while a target is tracked'''
+        t0 = time.perf_counter()
+        result = self._detect(frame)
+        if self.quality is not None:
+            self.quality.observe(time.perf_counter() - t0)
+        return result
+    
+    def _detect(self, frame: np.ndarray) -> VisionResult:
+        window = self.searchWindow()
+        if window is not None:
+            result = self.frameProc(frame, window=window)
+            if result.bboxes:
+                self.framesSinceFullScan += 1
+                return result
+            # target lost inside the window -> rescan whole frame
+        
+        self.framesSinceFullScan = 0
+        return self.frameProc(frame)
+    
+    def nextFrame(self) -> Tuple[np.ndarray, VisionResult, float] | None:
+        '''-> (frame, vision result, capture time), None if frame source/pipeline has stopped or timed out'''
+        if self.pipeline is None:
+            frame = self.frameSource.takeScreenshot()
+            captureTime = time.perf_counter()
+            if frame is None:  # source exhausted (replay)
+                return None
+            self.frameSeq += 1
+            return frame, self.detect(frame), captureTime
+        
+        detection = self.pipeline.latest(timeout=1.0)
+        if detection is None:
+            return None
+        self.frameSeq = detection.seq
+        return detection.frame, detection.result, detection.captureTime
     
     def lockTarget(self):
         '''rly idk if i need it'''
@@ -135,37 +269,107 @@ class AutoAimBot:
     
     def resetTarget(self) -> None:
         '''choose new target that is not current and reset PID-controllers'''
-        self.yawController.reset()
-        self.pitchController.reset()
+        if self.controlScheduler is not None:
+            self.controlScheduler.clear()  # controllers and mouse residual are reset on the control thread
+        else:
+            self.controller.reset()
+            self.mouseController.clearResidual()  # sub-pixel carry belongs to the old target
+        self.targetId = None
         self.prevTargetPos = None
+        self.prevTargetBbox = None
+        self.targetMotion = 0.0
     
-    def update(self, dt, frame) -> None:
+    @property
+    def expectedLatency(self) -> float:
+        '''s, median capture -> mouse input latency of recent ticks'''
+        window = self.latency.window
+        return float(np.median(window)) if window.size else 0.0
+    
+    def aimPoint(self, captureTime: float) -> Tuple[float, float] | None:
+        '''
+        target position extrapolated from capture time to the moment the mouse input lands, 
+        relative to where the camera points now (moves emitted after capture are taken out)
+        '''
+        if not self.latencyCompensation or self.targetId not in self.tracker:
+            return self.prevTargetPos
+        
+        horizon = min(self.expectedLatency, self.maxPredictionTime)
+        return tuple((self.tracker.position(self.targetId, captureTime + horizon) - self.motion.total).tolist())
+    
+    def publishTarget(self, pidTarget: np.ndarray, captureTime: float) -> None:
+        '''measurement for the control thread, it extrapolates with the (world frame) track velocity itself'''
+        if self.prevTargetPos is None:
+            self.controlScheduler.clear()
+            return
+        
+        velocity = self.tracker.velocity(self.targetId) if self.latencyCompensation else None
+        self.controlScheduler.publish(
+            np.array(self.prevTargetPos) - pidTarget, 
+            velocity if velocity is not None else (0.0, 0.0), 
+            captureTime,
+        )
+    
+    def update(self, dt, frame, captureTime: float) -> None:
         '''step over PID-controllers and move mouse'''
         
         h, w = frame.shape[:2]
         pidTarget = np.array([w // 2, h // 2])
+        self.mouseDelta = (0, 0)
+        
+        if self.controlScheduler is not None:
+            self.publishTarget(pidTarget, captureTime)
+            self.aimTarget = self.prevTargetPos  # extrapolated on the control thread from here
+            return
 
-        if self.prevTargetPos is not None:
-            targetOffset = np.array(self.prevTargetPos) - pidTarget
+        aimPoint = self.aimTarget = self.aimPoint(captureTime)
+        if aimPoint is not None and dt > 0:  # dt 0: clock did not advance, nothing to integrate
+            targetOffset = np.array(aimPoint) - pidTarget
 
-            yawAdjustment = self.yawController.step(dt, 0, targetOffset[0])
-            pitchAdjustment = self.pitchController.step(dt, 0, targetOffset[1])
+            yawAdjustment, pitchAdjustment = self.controller.step(dt, 0, targetOffset)
 
-            self.mouseController.moveBy(int(yawAdjustment), int(pitchAdjustment))
+            # fractions are carried by the mouse to the next tick instead of being truncated away
+            self.mouseDelta = self.mouseController.moveBy(yawAdjustment, pitchAdjustment)
+            if self.cameraFollowsMouse:
+                self.motion.add(time.perf_counter(), *self.mouseDelta)
+            self.latency.add(time.perf_counter() - captureTime)
+    
+    def logTick(self, captureTime: float, bboxes) -> None:
+        '''append current tick to the session log'''
+        if self.controlScheduler is not None:
+            # moves are emitted by the control thread, log what it moved since last tick
+            moved = self.controlScheduler.moved.copy()
+            self.mouseDelta = tuple(np.trunc(moved - self._loggedMoved).astype(int))
+            self._loggedMoved += self.mouseDelta
+        
+        self.session.append(
+            timestamp=time.perf_counter(),
+            captureTime=captureTime,
+            frameRef=self.frameSeq - 1,  # frame index in a recording of this run (--record)
+            bboxes=bboxes,
+            targetId=self.targetId,
+            target=self.aimTarget,
+            pTerm=self.controller.pTerm,
+            iTerm=self.controller.iTerm,
+            dTerm=self.controller.dTerm,
+            mouseDelta=self.mouseDelta,
+        )
+        self.mouseDelta = (0, 0)
+        self.aimTarget = None
     
     def debugDrawValidBboxArea(self, frame: np.ndarray):
         lineColor = (0, 255, 0)
         thickness = 2
+        roi = self.roi
         
-        if self.yCenterMin != float('-inf'):
-            cv.line(frame, (0, self.yCenterMin), (frame.shape[1], self.yCenterMin), lineColor, thickness)
-        if self.yCenterMax != float('inf'):
-            cv.line(frame, (0, self.yCenterMax), (frame.shape[1], self.yCenterMax), lineColor, thickness)
+        if roi.yCenterMin != float('-inf'):
+            cv.line(frame, (0, roi.yCenterMin), (frame.shape[1], roi.yCenterMin), lineColor, thickness)
+        if roi.yCenterMax != float('inf'):
+            cv.line(frame, (0, roi.yCenterMax), (frame.shape[1], roi.yCenterMax), lineColor, thickness)
         
-        if self.xCenterMin != float('-inf'):
-            cv.line(frame, (self.xCenterMin, 0), (self.xCenterMin, frame.shape[0]), lineColor, thickness)
-        if self.xCenterMax != float('inf'):
-            cv.line(frame, (self.xCenterMax, 0), (self.xCenterMax, frame.shape[0]), lineColor, thickness)
+        if roi.xCenterMin != float('-inf'):
+            cv.line(frame, (roi.xCenterMin, 0), (roi.xCenterMin, frame.shape[0]), lineColor, thickness)
+        if roi.xCenterMax != float('inf'):
+            cv.line(frame, (roi.xCenterMax, 0), (roi.xCenterMax, frame.shape[0]), lineColor, thickness)
     
     def debugFrame(
         self, 
@@ -174,12 +378,16 @@ class AutoAimBot:
     ) -> None:
         '''pass output of the vision pipeline'''
         dtDebug = self.fpsDebugger.average
-        fps = int(1 / dtDebug)
+        fps = int(1 / dtDebug) if dtDebug > 0 else 0
         
         debugInfo = {
             'fps': fps,
+            'latency ms': round(self.expectedLatency * 1e3, 1),
             'bboxes': bboxes
         }
+        if self.quality is not None:
+            debugInfo['quality'] = f"{self.quality.level}/{len(self.quality.ladder) - 1}"
+
         
         resFrame = self.frameDebugger(frame, debugInfo)
         self.debugDrawValidBboxArea(resFrame)
@@ -188,76 +396,113 @@ class AutoAimBot:
     
     def mainLoop(self):
         
-        self.hWnd.focusCurrentWindow()
-        
-        while True:
-            # self.hWnd.focusCurrentWindow()
-            
-            currentPressedKeys = self.keyboardListener._currentState
-            
-            if (cv.waitKey(1) & 0xFF == ord('q')) or (CLOSE_KEY in currentPressedKeys):
-                break
+        self.frameSource.focusCurrentWindow()
+        try:
+            if self.pipeline is not None:
+                self.pipeline.start()
+            if self.controlScheduler is not None:
+                self.controlScheduler.start()
             
-            prevTime = time.time()
-            currentFrame = self.hWnd.takeScreenshot()
-            processedFrame, bboxes = self.frameProc(currentFrame)
-            
-            if not bboxes:
-                self.resetTarget()
+            # dt is the tick period (previous tick -> this one), not the wait for a frame inside it
+            prevTime = time.perf_counter()
+            while True:
+                # self.frameSource.focusCurrentWindow()
+                
+                currentPressedKeys = self.keyboardListener.poll()  # one keyboard snapshot per tick
                 
-            if RESET_TARGET_KEY in self.keyboardListener.releasedKeys:
-                self.resetTarget()
+                # debug windows are the only GUI, headless OpenCV builds have no waitKey
+                if (self.debug and cv.waitKey(1) & 0xFF == ord('q')) or (CLOSE_KEY in currentPressedKeys):
+                    break
                 
-            if not (TRACK_TARGET_KEY in currentPressedKeys):
-                # next iteration
+                nextFrame = self.nextFrame()
+                if nextFrame is None:
+                    if self.pipeline is not None and not self.pipeline.closed:
+                        continue  # timed out (capture stalled), keep polling
+                    break
                 
-                currTime = time.time()
-                dt = currTime - prevTime
+                currTime = time.perf_counter()
+                dt, prevTime = currTime - prevTime, currTime
                 
-                # self.chooseTarget(bboxes)
-                # self.update(dt, currentFrame)
-                self.updateCurrentTarget(bboxes)
+                currentFrame, visionResult, captureTime = nextFrame
+                bboxes = visionResult.bboxes
+                
+                self.updateTracks(bboxes, captureTime)
+                if self.targetId is not None and self.targetId not in self.tracker:
+                    # target missed for more than trackerParams.maxMissedFrames frames
+                    self.resetTarget()
+                    
+                if RESET_TARGET_KEY in self.keyboardListener.releasedKeys:
+                    self.resetTarget()
+                    
+                if not (TRACK_TARGET_KEY in currentPressedKeys):
+                    # next iteration
+                    
+                    # self.chooseTarget(bboxes)
+                    # self.update(dt, currentFrame)
+                    self.updateCurrentTarget()
+                    if self.controlScheduler is not None:
+                        self.controlScheduler.clear()  # not steering while key is up
+                    if self.session is not None:
+                        self.logTick(captureTime, bboxes)
+                    
+                    if self.debug:
+                        self.fpsDebugger.append(dt)
+                        self.debugFrame(visionResult.rgbMask, bboxes)
+                    
+                    continue
+                
+                self.chooseTarget(bboxes)
+                self.updateCurrentTarget()
+                self.update(dt, currentFrame, captureTime)
+                if self.session is not None:
+                    self.logTick(captureTime, bboxes)
+                
+                self.keyboardListener.updateKeyboard()  # update keyboard state (prev)
                 
                 if self.debug:
                     self.fpsDebugger.append(dt)
-                    self.debugFrame(processedFrame, bboxes)
-                
-                continue
-            
-            currTime = time.time()
-            dt = currTime - prevTime
-            
-            self.chooseTarget(bboxes)
-            self.update(dt, currentFrame)
-            
-            self.updateCurrentTarget(bboxes)
-            self.keyboardListener.updateKeyboard()  # update keyboard state (prev)
-            
+                    self.debugFrame(visionResult.rgbMask, bboxes)
+        finally:
+            if self.controlScheduler is not None:
+                self.controlScheduler.stop()
+            if self.pipeline is not None:
+                self.pipeline.stop()
+            if self.session is not None:
+                self.session.close()
+            self.frameSource.close()
             if self.debug:
-                self.fpsDebugger.append(dt)
-                self.debugFrame(processedFrame, bboxes)
-        
-        cv.destroyAllWindows()
+                cv.destroyAllWindows()
 
 
 class AutoFireBot:
     
     def __init__(
         self, 
-        windowTitle, 
+        windowTitle=None, 
         processingParams=ProcessingParams(),
         pidParams=PIDParams(),
-        debug=False
+        debug=False,
+        pipelined=False,
+        frameSource: FrameSource | None=None,
+        keyboardBackend: KeyboardBackend | None=None,
+        mouseBackend: MouseBackend | None=None,
+        visionProcesses: int=0,
     ) -> None:
         
         self.windowTitle = windowTitle
         
-        self.mouse = Mouse()
-        self.keyboardHandler = KeyboardInputHandler()
+        self.mouse = Mouse(backend=mouseBackend)
+        self.keyboardHandler = KeyboardInputHandler(backend=keyboardBackend)
+        
+        self.frameSource = frameSource if frameSource is not None else openWindowCapture(windowTitle)
         
-        self.hWnd = WindowCaptureMSS(windowTitle=windowTitle)
+        self.frameProc = FrameProcessorCV(params=processingParams, keepMasks=debug)
         
-        self.frameProc = FrameProcessorCV()
+        self.pipeline = VisionPipeline(self.frameSource, self.frameProc.simpleVisionPipeline) if pipelined else None
+        if visionProcesses:
+            self.pipeline = ProcessVisionPipeline(
+                self.frameSource, processingParams, workers=visionProcesses, method='simpleVisionPipeline',
+            )
         
         self.debug = debug
         self.frameDebugger = FrameDebugger()
@@ -266,6 +511,19 @@ class AutoFireBot:
     def getTargetCentroids(self, bboxes) -> List[Tuple[int, int]]:
         return [(x + w // 2, y + h // 2) for x, y, w, h in bboxes]
     
+    def nextFrame(self) -> Tuple[np.ndarray, VisionResult] | None:
+        '''-> (frame, vision result), None if frame source/pipeline has stopped or timed out'''
+        if self.pipeline is None:
+            frame = self.frameSource.takeScreenshot()
+            if frame is None:  # source exhausted (replay)
+                return None
+            return frame, self.frameProc.simpleVisionPipeline(frame)
+        
+        detection = self.pipeline.latest(timeout=1.0)
+        if detection is None:
+            return None
+        return detection.frame, detection.result
+    
     def shouldFire(self, frame: np.ndarray, bboxes: List[np.ndarray]) -> bool:
         
         fw, fh = frame.shape[:2]
@@ -289,46 +547,58 @@ class AutoFireBot:
     ) -> None:
         '''pass output of the vision pipeline'''
         dtDebug = self.fpsDebugger.average
-        fps = int(1 / dtDebug)
+        fps = int(1 / dtDebug) if dtDebug > 0 else 0
         
         resFrame = self.frameDebugger(frame, debugInfo)
         drawCursor(resFrame, (255, 0, 255), cursorShape='+')
         cv.imshow(f"Aimbot eyes", resFrame)
     
     def mainLoop(self):
-        self.hWnd.focusCurrentWindow()
-        
-        while True:
-            
-            currentPressedKeys = self.keyboardHandler._currentState
-            
-            if (cv.waitKey(1) & 0xFF == ord('q')) or (CLOSE_KEY in currentPressedKeys):
-                break
-            
-            prevTime = time.time()
-            
-            currentFrame = self.hWnd.takeScreenshot()
-            processedFrame, bboxes = self.frameProc.simpleVisionPipeline(currentFrame)
-            
-            _shouldFire = self.shouldFire(processedFrame, bboxes) and (ENABLE_AUTOFIRE_KEY in currentPressedKeys)
-            if _shouldFire:
-                self.mouse.click('left')
-            
-            currTime = time.time()
-            
-            dt = currTime - prevTime
+        self.frameSource.focusCurrentWindow()
+        try:
+            if self.pipeline is not None:
+                self.pipeline.start()
             
+            prevTime = time.perf_counter()  # dt: tick period
+            while True:
+                
+                currentPressedKeys = self.keyboardHandler.poll()
+                
+                # debug windows are the only GUI, headless OpenCV builds have no waitKey
+                if (self.debug and cv.waitKey(1) & 0xFF == ord('q')) or (CLOSE_KEY in currentPressedKeys):
+                    break
+                
+                nextFrame = self.nextFrame()
+                if nextFrame is None:
+                    if self.pipeline is not None and not self.pipeline.closed:
+                        continue  # timed out (capture stalled), keep polling
+                    break
+                
+                currentFrame, visionResult = nextFrame
+                bboxes = visionResult.bboxes
+                
+                _shouldFire = self.shouldFire(currentFrame, bboxes) and (ENABLE_AUTOFIRE_KEY in currentPressedKeys)
+                if _shouldFire:
+                    self.mouse.click('left')
+                
+                currTime = time.perf_counter()
+                dt, prevTime = currTime - prevTime, currTime
+                
+                if self.debug:
+                    self.fpsDebugger.append(dt)
+                    fps = int(1 / self.fpsDebugger.average) if self.fpsDebugger.average > 0 else 0
+                    debugInfo = {
+                        'fps': fps,
+                        'shouldFire': _shouldFire,
+                        'bboxes': bboxes
+                    }
+                    self.debugFrame(visionResult.rgbMask, debugInfo)
+        finally:
+            if self.pipeline is not None:
+                self.pipeline.stop()
+            self.frameSource.close()
             if self.debug:
-                self.fpsDebugger.append(dt)
-                fps = int(1 / self.fpsDebugger.average)
-                debugInfo = {
-                    'fps': fps,
-                    'shouldFire': _shouldFire,
-                    'bboxes': bboxes
-                }
-                self.debugFrame(processedFrame, debugInfo)
-
-        cv.destroyAllWindows()
+                cv.destroyAllWindows()
 
 
 
@@ -0,0 +1,287 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import dataclasses
+import numpy as np
+import cv2 as cv
+
+from typing import Dict, List, Tuple, Callable, Iterable
+
+from vision import BLUR_ENGINES, FrameProcessorCV, ProcessingParams
+from debug import StageTimers
+import utils
+
+BENCH_RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (2560, 1440)]
+BENCH_BLOB_COUNTS = [1, 10, 50]
+BENCH_SCALES = [1.0, 0.5, 0.25]  # downscale factors, accuracy/speed trade-off vs full scale
+BENCH_BLUR_ENGINES = list(BLUR_ENGINES)  # compared with params.blurEngine at full scale, [] - params.blurEngine only
+
+# stats reported for every timed stage (ms) + throughput
+BENCH_PERCENTILES = (50, 95, 99)
+
+# modules whose import is timed in a fresh interpreter (startup cost of the CLI and the bots)
+BENCH_IMPORTS = ['click', 'numpy', 'cv2', 'vision', 'aim', 'main']
+
+
+def syntheticFrame(width: int, height: int, blobCount: int, seed: int=0) -> np.ndarray:
+    '''noisy dark background with `blobCount` green (hsv ~ [60, 255, 255]) blobs'''
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 60, size=(height, width, 3), dtype=np.uint8)
+
+    maxRadius = max(4, min(width, height) // 30)
+    for _ in range(blobCount):
+        cx = int(rng.integers(0, width))
+        cy = int(rng.integers(0, height))
+        rx = int(rng.integers(3, maxRadius))
+        ry = int(rng.integers(3, maxRadius * 2))
+        cv.ellipse(frame, (cx, cy), (rx, ry), 0, 0, 360, (0, 255, 0), -1)
+
+    return frame
+
+
+def loadRecordedFrames(path: str, limit: int | None=None) -> List[np.ndarray]:
+    '''frames from a raw frame file (see sources.FrameRecorder)'''
+    from sources import openFrameFile
+
+    header, _, frames = openFrameFile(path)
+    count = int(header['count'])
+    if limit is not None:
+        count = min(count, limit)
+    return [np.ascontiguousarray(frames[i]) for i in range(count)]
+
+
+def latencyStats(samples: Iterable[float]) -> Dict[str, float]:
+    '''seconds -> {p50, p95, p99, max (ms), fps}'''
+    samplesMs = np.asarray(list(samples), dtype=np.float64) * 1e3
+    if samplesMs.size == 0:
+        return {}
+
+    stats = {f'p{q}': float(v) for q, v in zip(BENCH_PERCENTILES, np.percentile(samplesMs, BENCH_PERCENTILES))}
+    stats['max'] = float(samplesMs.max())
+    stats['fps'] = float(1e3 / samplesMs.mean())
+    return stats
+
+
+def timeCall(fn: Callable, *args) -> float:
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def benchmarkFrames(
+    frameProc: FrameProcessorCV,
+    frames: List[np.ndarray],
+    repeats: int=1,
+    warmup: int=2,
+) -> Dict[str, Dict]:
+    '''
+    -> {'pipeline': stats, 'simplePipeline': stats, 'stages': {stage: stats}}
+    stages come from the processor's own stage timers during __call__
+    '''
+    for frame in frames[:warmup]:
+        frameProc(frame)
+        frameProc.simpleVisionPipeline(frame)
+
+    timers = frameProc.timers
+    timers.sz = max(timers.sz, repeats * len(frames))
+    timers.reset()
+
+    pipelineSamples, simpleSamples = [], []
+    for _ in range(repeats):
+        for frame in frames:
+            timers.enabled = True
+            pipelineSamples.append(timeCall(frameProc, frame))
+            timers.enabled = False
+            simpleSamples.append(timeCall(frameProc.simpleVisionPipeline, frame))
+
+    stages = {}
+    for stage, summary in timers.summary().items():
+        stages[stage] = {key: summary[key] for key in (*(f'p{q}' for q in BENCH_PERCENTILES), 'max')}
+        stages[stage]['fps'] = 1e3 / summary['mean']
+
+    return {
+        'pipeline': latencyStats(pipelineSamples),
+        'simplePipeline': latencyStats(simpleSamples),
+        'stages': stages,
+    }
+
+
+def detectionAgreement(
+    referenceProc: FrameProcessorCV,
+    frameProc: FrameProcessorCV,
+    frames: List[np.ndarray],
+    iouThreshold: float=0.5,
+) -> Dict[str, float]:
+    '''bboxes of `frameProc` vs `referenceProc` on the same frames -> {precision, recall, meanIoU}'''
+    tp = fp = fn = 0
+    ious = []
+    for frame in frames:
+        match = utils.matchBboxes(referenceProc(frame).bboxes, frameProc(frame).bboxes, iouThreshold)
+        tp, fp, fn = tp + match['tp'], fp + match['fp'], fn + match['fn']
+        ious.extend(match['ious'])
+
+    return {
+        'precision': tp / (tp + fp) if tp + fp else 1.0,
+        'recall': tp / (tp + fn) if tp + fn else 1.0,
+        'meanIoU': float(np.mean(ious)) if ious else 0.0,
+    }
+
+
+def runCase(
+    params: ProcessingParams,
+    frames: List[np.ndarray],
+    scales: List[float],
+    caseName: str,
+    blurEngines: List[str]=BENCH_BLUR_ENGINES,
+) -> Dict[str, Dict]:
+    '''
+    one frame set at every scale, and at full scale with every other blur engine
+    cases other than params at 1.0 are named "<case>[+<blurEngine>][@<scale>]" and get agreement 
+    vs the reference (gaussian blur, full scale)
+    '''
+    results = {}
+    referenceParams = dataclasses.replace(params, downscale=1.0, blurEngine='gaussian')
+    referenceProc = FrameProcessorCV(params=referenceParams)
+
+    for engine in [params.blurEngine] + [e for e in blurEngines if e != params.blurEngine]:
+        for scale in (scales if engine == params.blurEngine else [1.0]):
+            variant = dataclasses.replace(params, downscale=scale, blurEngine=engine)
+            frameProc = FrameProcessorCV(params=variant, timers=StageTimers())
+            name = caseName + ('' if engine == params.blurEngine else f'+{engine}') + ('' if scale == 1.0 else f'@{scale:g}')
+            results[name] = benchmarkFrames(frameProc, frames)
+            if variant.planKey() != referenceParams.planKey():
+                results[name]['agreement'] = detectionAgreement(referenceProc, frameProc, frames)
+
+    return results
+
+
+def runBenchmarks(
+    params: ProcessingParams=ProcessingParams(),
+    resolutions: List[Tuple[int, int]]=BENCH_RESOLUTIONS,
+    blobCounts: List[int]=BENCH_BLOB_COUNTS,
+    frameCount: int=20,
+    recording: str | None=None,
+    scales: List[float]=BENCH_SCALES,
+    blurEngines: List[str]=BENCH_BLUR_ENGINES,
+) -> Dict[str, Dict]:
+    '''-> {case name: benchmarkFrames result}, case name is "<w>x<h>/blobs<n>[+engine][@scale]" or "recording[+engine][@scale]"'''
+    results = {}
+
+    for width, height in resolutions:
+        for blobCount in blobCounts:
+            frames = [syntheticFrame(width, height, blobCount, seed=i) for i in range(frameCount)]
+            results.update(runCase(params, frames, scales, f'{width}x{height}/blobs{blobCount}', blurEngines))
+
+    if recording:
+        frames = loadRecordedFrames(recording, limit=frameCount)
+        results.update(runCase(params, frames, scales, 'recording', blurEngines))
+
+    return results
+
+
+def importBenchmarks(modules: List[str]=BENCH_IMPORTS, repeats: int=5) -> Dict[str, Dict[str, float]]:
+    '''
+    -> {module: latencyStats of `import module`}, every sample in a fresh interpreter (nothing preloaded)
+    plus 'main.py --help': wall time of the whole command, interpreter startup included
+    '''
+    repoDir = os.path.dirname(os.path.abspath(__file__))
+    code = "import time; t0 = time.perf_counter(); import {}; print(time.perf_counter() - t0)"
+
+    results = {}
+    for module in modules:
+        samples = [
+            float(subprocess.run([sys.executable, '-c', code.format(module)], cwd=repoDir, 
+                                 capture_output=True, text=True, check=True).stdout)
+            for _ in range(repeats)
+        ]
+        results[module] = latencyStats(samples)
+
+    helpCommand = [sys.executable, os.path.join(repoDir, 'main.py'), '--help']
+    results['main.py --help'] = latencyStats(
+        timeCall(lambda: subprocess.run(helpCommand, capture_output=True, check=True)) for _ in range(repeats)
+    )
+    return results
+
+
+def compareWithBaseline(
+    results: Dict[str, Dict],
+    baseline: Dict[str, Dict],
+    tolerance: float=0.15,
+    metric: str='p50',
+) -> List[str]:
+    '''-> human-readable regressions: `metric` latency grew by more than `tolerance` vs baseline'''
+    regressions = []
+
+    def check(case, name, current, previous):
+        if metric not in current or metric not in previous:
+            return
+        if current[metric] > previous[metric] * (1 + tolerance):
+            regressions.append(
+                f"{case} {name}: {metric} {previous[metric]:.2f}ms -> {current[metric]:.2f}ms "
+                f"(+{100 * (current[metric] / previous[metric] - 1):.0f}%)"
+            )
+
+    for case, caseResult in results.items():
+        if case not in baseline:
+            continue
+        caseBaseline = baseline[case]
+        for name in ('pipeline', 'simplePipeline'):
+            check(case, name, caseResult[name], caseBaseline.get(name, {}))
+        for stage, stats in caseResult['stages'].items():
+            check(case, stage, stats, caseBaseline.get('stages', {}).get(stage, {}))
+
+    return regressions
+
+
+def loadBaseline(path: str) -> Dict[str, Dict]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def saveBaseline(path: str, results: Dict[str, Dict]) -> None:
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def formatReport(
+    results: Dict[str, Dict], 
+    regressions: List[str] | None=None, 
+    imports: Dict[str, Dict] | None=None,
+) -> str:
+    def row(name, stats):
+        return (f"  {name:<16}"
+                + "".join(f"{stats.get(f'p{q}', 0):>9.2f}" for q in BENCH_PERCENTILES)
+                + f"{stats.get('max', 0):>9.2f}{stats.get('fps', 0):>9.1f}")
+
+    header = f"  {'stage':<16}" + "".join(f"{f'p{q} ms':>9}" for q in BENCH_PERCENTILES) + f"{'max ms':>9}{'fps':>9}"
+    lines = []
+    for case, caseResult in results.items():
+        lines.append(case)
+        lines.append(header)
+        lines.append(row('pipeline', caseResult['pipeline']))
+        lines.append(row('simplePipeline', caseResult['simplePipeline']))
+        for stage, stats in caseResult['stages'].items():
+            lines.append(row(stage, stats))
+        if 'agreement' in caseResult:
+            agreement = caseResult['agreement']
+            lines.append(f"  vs gaussian, full scale: precision {agreement['precision']:.3f}, "
+                         f"recall {agreement['recall']:.3f}, mean IoU {agreement['meanIoU']:.3f}")
+        lines.append('')
+
+    if imports:
+        lines.append('imports (fresh interpreter)')
+        lines.append(f"  {'module':<16}" + "".join(f"{f'p{q} ms':>9}" for q in BENCH_PERCENTILES) + f"{'max ms':>9}")
+        for module, stats in imports.items():
+            lines.append(f"  {module:<16}" + "".join(f"{stats[f'p{q}']:>9.2f}" for q in BENCH_PERCENTILES) + f"{stats['max']:>9.2f}")
+        lines.append('')
+
+    if regressions is not None:
+        if regressions:
+            lines.append(f"REGRESSIONS ({len(regressions)}):")
+            lines.extend(f"  {r}" for r in regressions)
+        else:
+            lines.append("no regressions vs baseline")
+
+    return "\n".join(lines)
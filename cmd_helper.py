@@ -1,10 +1,29 @@
+from __future__ import annotations
+
 import click
 import ast
-import numpy as np
-import cv2 as cv
+import importlib
+
+from types import ModuleType
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from vision import ProcessingParams
+    from control import PIDParams
+
+
+class LazyModule:
+    '''module imported on first attribute access, keeps CLI startup (--help) free of numpy/OpenCV'''
+    
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module: ModuleType | None = None
+    
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
 
-from vision import ProcessingParams
-from control import PIDParams
 
 #  ====== Click helper namespace
 class ClickLiteralOption(click.Option):
@@ -18,6 +37,9 @@ class ClickLiteralOption(click.Option):
 
 
 def constructProcessingParams(**kwargs) -> ProcessingParams:
+    import numpy as np
+    from vision import ProcessingParams
+    
     # maskColor: tuple = (0, 255, 0)  # unused 
     # hsvColor: tuple = (60, 255, 255)  # green hsv
     # hsvMin: np.ndarray = field(default_factory=lambda: np.array([50, 210, 70]))
@@ -36,15 +58,20 @@ def constructProcessingParams(**kwargs) -> ProcessingParams:
     
     convertedParams = {
         'hsvMin': hsvMin,
-        'hsvMin': hsvMax,
-        'gaussianBlurSize': (21, 21),
-        'morphKernelSize': (3, 3),
+        'hsvMax': hsvMax,
+        'gaussianBlurSize': tuple(kwargs.get('gaussianBlurSize', (21, 21))),
+        'morphKernelSize': tuple(kwargs.get('morphKernelSize', (3, 3))),
+        'downscale': kwargs.get('downscale', 1.0),
+        'thresholdEngine': kwargs.get('thresholdEngine', 'hsv'),
+        'blurEngine': kwargs.get('blurEngine', 'gaussian'),
     }
     
     return ProcessingParams(**convertedParams)
 
 
 def constructPIDParams(pidCoefs) -> PIDParams:
+    from control import PIDParams
+    
     # kp: float = 4.0
     # ki: float = 0.2
     # kd: float = 0.3
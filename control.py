@@ -1,6 +1,9 @@
+import threading
+import time
 import numpy as np
 
-from dataclasses import dataclass, field
+from collections import deque
+from dataclasses import dataclass, field, fields, astuple
 from typing import Iterable, Union
 
 Real = Union[float | int]
@@ -70,3 +73,213 @@ class PIDController:
         return self.step(dt, current, target)
 
 
+
+
+class PIDBank:
+    '''
+    N independent PID controllers (axes or candidate params) stepped in one vectorized call
+    same terms and clamping as PIDController.step, every coefficient/limit is an (N,) array
+    '''
+    
+    def __init__(self, params: PIDParams | Iterable[PIDParams]=PIDParams(), n: int | None=None) -> None:
+        paramsList = [params] * (n or 1) if isinstance(params, PIDParams) else list(params)
+        coefs = np.array([astuple(p) for p in paramsList], dtype=np.float64).reshape(-1, len(fields(PIDParams)))
+        self._setCoefs(**{f.name: coefs[:, i] for i, f in enumerate(fields(PIDParams))})
+    
+    @classmethod
+    def fromArrays(cls, **coefs) -> 'PIDBank':
+        '''PIDParams field name -> array (or scalar), broadcast to a common length; missing fields use defaults'''
+        bank = cls.__new__(cls)
+        defaults = PIDParams()
+        arrays = np.broadcast_arrays(*(np.asarray(coefs.get(f.name, getattr(defaults, f.name)), dtype=np.float64) 
+                                       for f in fields(PIDParams)))
+        bank._setCoefs(**{f.name: np.atleast_1d(a).astype(np.float64) for f, a in zip(fields(PIDParams), arrays)})
+        return bank
+    
+    def _setCoefs(self, **coefs: np.ndarray) -> None:
+        for name, values in coefs.items():
+            setattr(self, name, values)
+        
+        n = self.kp.size
+        self.pTerm = np.zeros(n)
+        self.iTerm = np.zeros(n)
+        self.dTerm = np.zeros(n)
+        self.prevError = np.zeros(n)  # for derivative term
+    
+    def __len__(self) -> int:
+        return self.kp.size
+    
+    def params(self, idx: int) -> PIDParams:
+        return PIDParams(**{f.name: float(getattr(self, f.name)[idx]) for f in fields(PIDParams)})
+    
+    def step(self, dt: float | np.ndarray, current: float | np.ndarray, target: float | np.ndarray) -> np.ndarray:
+        
+        if np.any(np.asarray(dt) == 0):
+            raise ValueError("dt cannot be zero")
+        
+        error = np.broadcast_to(np.asarray(target, dtype=np.float64) - current, self.kp.shape).copy()
+        
+        self.pTerm = error
+        
+        # integral with windup clamping
+        self.iTerm = np.maximum(np.minimum(self.iTerm + error * dt, self.intMaxLimit), self.intMinLimit)
+        
+        raw_dTerm = (error - self.prevError) / dt
+        self.dTerm = np.maximum(np.minimum(raw_dTerm, self.derMaxLimit), self.derMinLimit)
+        
+        self.prevError = error
+        
+        return self.kp * self.pTerm + self.ki * self.iTerm + self.kd * self.dTerm
+    
+    def reset(self, mask: np.ndarray | None=None) -> None:
+        '''reset all controllers or those selected by boolean/index mask'''
+        idx = slice(None) if mask is None else mask
+        for term in (self.pTerm, self.iTerm, self.dTerm, self.prevError):
+            term[idx] = 0
+    
+    def __call__(self, dt, current, target) -> np.ndarray:
+        return self.step(dt, current, target)
+
+
+class MotionLog:
+    '''
+    cumulative mouse movement + ring of (time, x, y), to look up how far the camera had turned 
+    when a frame was captured; screen position + movement at capture = position in a world frame 
+    that does not move with the camera (1 mouse count = 1 px)
+    written by the thread that moves the mouse, read from any thread
+    '''
+    
+    def __init__(self, size: int=1024) -> None:
+        self._lock = threading.Lock()
+        self.total = np.zeros(2)  # replaced on every add, readers never see a half-written value
+        self._history = deque(maxlen=size)
+        self._base = (0.0, 0.0)  # movement before the oldest entry of the ring
+    
+    def add(self, t: float, dx: float, dy: float) -> None:
+        with self._lock:
+            if len(self._history) == self._history.maxlen:
+                self._base = self._history[0][1:]
+            self.total = self.total + (dx, dy)
+            self._history.append((t, *self.total))
+    
+    def at(self, t: float) -> np.ndarray:
+        '''cumulative movement at time t'''
+        with self._lock:
+            history = list(self._history)
+            base = self._base
+        for tick, x, y in reversed(history):
+            if tick <= t:
+                return np.array((x, y))
+        return np.array(base)
+
+
+class ControlScheduler:
+    '''
+    fixed-rate control thread, decoupled from the vision frame rate
+    - vision publishes target measurements: offset from crosshair (px), velocity (px/s), capture time
+    - velocity is in the world frame (see MotionLog), screen-space velocity would count the camera 
+      motion twice: once in the velocity and once in the movement subtracted below
+    - every tick the yaw/pitch controller bank runs on the measurement extrapolated to now, 
+      minus what the mouse has moved since the frame was captured
+    - controller output is mouse velocity (px/s), integrated into small moves by mouse.update()
+    '''
+    
+    def __init__(
+        self, 
+        controller: PIDBank, 
+        mouse, 
+        rate: float=1000.0,
+        maxPredictionTime: float=0.15,
+    ) -> None:
+        self.controller = controller  # 2 controllers: yaw, pitch
+        self.mouse = mouse
+        self.rate = rate
+        self.maxPredictionTime = maxPredictionTime  # s, cap on extrapolation of a measurement
+        
+        self._lock = threading.Lock()
+        self._measurement = None  # (offset, velocity, captureTime, mouse moved at captureTime)
+        self._reset = False
+        
+        # mouse movement emitted by this thread, to look up movement since capture
+        self.motion = MotionLog()
+        
+        self._stopEvent = threading.Event()
+        self._thread = None
+        self.ticks = 0
+        self.overruns = 0
+    
+    @property
+    def moved(self) -> np.ndarray:
+        '''cumulative mouse movement'''
+        return self.motion.total
+    
+    def publish(self, offset: Iterable[float], velocity: Iterable[float], captureTime: float) -> None:
+        '''new target measurement (vision thread)'''
+        measurement = (np.asarray(offset, dtype=np.float64), np.asarray(velocity, dtype=np.float64), 
+                       captureTime, self.motion.at(captureTime))
+        with self._lock:
+            self._measurement = measurement
+    
+    def clear(self) -> None:
+        '''no target: stop the mouse, reset controllers and mouse residual (on the control thread)'''
+        with self._lock:
+            self._measurement = None
+            self._reset = True
+    
+    def tick(self, now: float, dt: float) -> None:
+        with self._lock:
+            measurement = self._measurement
+            reset, self._reset = self._reset, False
+        
+        if reset:
+            self.controller.reset()
+            self.mouse.clearResidual()  # sub-pixel carry belongs to the old target
+        
+        if measurement is None or dt <= 0:
+            self.mouse.setVelocity(0, 0)
+        else:
+            offset, velocity, captureTime, movedAtCapture = measurement
+            horizon = min(now - captureTime, self.maxPredictionTime)
+            error = offset + velocity * horizon - (self.moved - movedAtCapture)
+            
+            self.mouse.setVelocity(*self.controller.step(dt, 0, error))
+        
+        dx, dy = self.mouse.update(now)
+        self.motion.add(now, dx, dy)
+    
+    def _loop(self) -> None:
+        period = 1.0 / self.rate
+        prevTime = nextTime = time.perf_counter()
+        while not self._stopEvent.is_set():
+            nextTime += period
+            delay = nextTime - time.perf_counter()
+            if delay > 0:
+                self._stopEvent.wait(delay)
+            else:  # overrun, skip missed ticks instead of bursting
+                self.overruns += 1
+                nextTime = time.perf_counter()
+            
+            now = time.perf_counter()
+            self.tick(now, now - prevTime)
+            prevTime = now
+            self.ticks += 1
+        
+        self.mouse.setVelocity(0, 0)
+    
+    def start(self) -> 'ControlScheduler':
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._loop, name='control', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self, timeout: float=1.0) -> None:
+        self._stopEvent.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+    
+    def __enter__(self) -> 'ControlScheduler':
+        return self.start()
+    
+    def __exit__(self, *exc) -> None:
+        self.stop()
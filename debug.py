@@ -1,7 +1,11 @@
+import atexit
+import json
+import time
 import cv2 as cv
 import numpy as np
 
 from collections import deque
+from contextlib import nullcontext
 from typing import Dict, Any, List, Tuple
 
 
@@ -16,6 +20,86 @@ class DebugFPS(deque):
         return sum(self) / len(self)
 
 
+class StageTimer:
+    '''rolling window of the last `sz` durations of one stage, re-usable context manager'''
+    __slots__ = ('samples', 'count', '_t0')
+    
+    def __init__(self, sz: int):
+        self.samples = np.zeros(sz, dtype=np.float64)
+        self.count = 0
+        self._t0 = 0.0
+    
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.add(time.perf_counter() - self._t0)
+    
+    def add(self, dt: float) -> None:
+        self.samples[self.count % self.samples.size] = dt
+        self.count += 1
+    
+    @property
+    def window(self) -> np.ndarray:
+        return self.samples[:min(self.count, self.samples.size)]
+    
+    def summary(self) -> Dict[str, float]:
+        '''-> {count, mean, p50, p95, p99, max}, durations in ms'''
+        window = self.window * 1e3
+        if window.size == 0:
+            return {'count': 0}
+        
+        p50, p95, p99 = np.percentile(window, (50, 95, 99))
+        return {
+            'count': self.count,
+            'mean': float(window.mean()),
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(window.max()),
+        }
+
+
+class StageTimers:
+    '''
+    per-stage timers for the vision pipeline
+    
+    with timers.stage('blur'):
+        ...
+    
+    disabled timers hand out a shared no-op context, so they can stay in production code
+    '''
+    _NULL = nullcontext()
+    
+    def __init__(self, enabled: bool=False, sz: int=512):
+        self.enabled = enabled
+        self.sz = sz
+        self.timers: Dict[str, StageTimer] = {}
+    
+    def stage(self, name: str):
+        if not self.enabled:
+            return self._NULL
+        
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = StageTimer(self.sz)
+        return timer
+    
+    def reset(self) -> None:
+        self.timers.clear()
+    
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: timer.summary() for name, timer in self.timers.items()}
+    
+    def dump(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+    
+    def dumpOnExit(self, path: str) -> None:
+        atexit.register(self.dump, path)
+
+
 class FrameDebugger:
     
     def __init__(self):
@@ -1,6 +1,9 @@
 import ctypes
+import time
+import numpy as np
 
-from typing import Tuple, Any, Literal, Set
+from contextlib import contextmanager
+from typing import Tuple, Any, Literal, Set, Iterable, List
 
 
 class Mouse:
@@ -14,60 +17,258 @@ class Mouse:
     MOUSEEVENTF_MIDDLEDOWN = 0x0020
     MOUSEEVENTF_MIDDLEUP = 0x0040
     
-    def __init__(self):
+    BUTTON_FLAGS = {
+        # button: (down, up)
+        "left": (MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP),
+        "right": (MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP),
+        "middle": (MOUSEEVENTF_MIDDLEDOWN, MOUSEEVENTF_MIDDLEUP),
+    }
+    
+    def __init__(self, backend: 'MouseBackend | None'=None):
+        '''
+        moves and button events are queued and handed to the backend in one send() per batch:
+        every call is its own batch, unless made inside `with mouse.batch():`
+        fractional moves are carried to the next move, nothing is lost to truncation
+        '''
+        self.backend = backend if backend is not None else SendInputMouseBackend()
         self.pressedButtons = set()
         
-        # use these guys later
-        # self.movementVelocity = (0, 0)
+        self._queue: List[Tuple[int, int, int]] = []  # (flags, dx, dy)
+        self._batchDepth = 0
+        
+        # smooth movement: velocity (px/s) integrated by update(), 
+        # sub-pixel remainder is carried to the next move
+        self.movementVelocity = (0.0, 0.0)
+        self._residual = (0.0, 0.0)
+        self._lastUpdate: float | None = None
+    
+    # ==== batching
+    @contextmanager
+    def batch(self):
+        '''queue everything inside, send it in one backend call on exit'''
+        self._batchDepth += 1
+        try:
+            yield self
+        finally:
+            self._batchDepth -= 1
+            if self._batchDepth == 0:
+                self.flush()
+    
+    def _queueEvent(self, flags: int, dx: int=0, dy: int=0) -> None:
+        if flags == self.MOUSEEVENTF_MOVE and self._queue and self._queue[-1][0] == flags:
+            # consecutive moves merge into one event
+            _, qx, qy = self._queue[-1]
+            self._queue[-1] = (flags, qx + dx, qy + dy)
+        else:
+            self._queue.append((flags, dx, dy))
+        
+        if self._batchDepth == 0:
+            self.flush()
     
-    def moveBy(self, dx, dy):
-        ctypes.windll.user32.mouse_event(self.MOUSEEVENTF_MOVE, dx, dy, 0, 0)
+    def flush(self) -> None:
+        if self._queue:
+            self.backend.send(self._queue)
+            self._queue = []
+    
+    # ==== movement
+    def moveBy(self, dx: float, dy: float) -> Tuple[int, int]:
+        '''
+        relative move, fractions are carried to the next move (toward zero, remainder keeps its sign)
+        -> (dx, dy) whole counts emitted
+        '''
+        rx, ry = self._residual
+        fx, fy = rx + dx, ry + dy
+        moveX, moveY = int(fx), int(fy)
+        self._residual = (fx - moveX, fy - moveY)
+        
+        if moveX or moveY:
+            self._queueEvent(self.MOUSEEVENTF_MOVE, moveX, moveY)
+        return moveX, moveY
+    
+    def clearResidual(self) -> None:
+        self._residual = (0.0, 0.0)
     
     def moveTo(self, x, y):
-        ctypes.windll.user32.SetCursorPos(x, y)
+        self.flush()
+        self.backend.moveTo(x, y)
 
     def click(self, mouseBtn: str | Literal[64]) -> None:
-        self.pressBtn(mouseBtn)
-        self.releaseBtn(mouseBtn)
+        with self.batch():  # down + up in one send
+            self.pressBtn(mouseBtn)
+            self.releaseBtn(mouseBtn)
 
     def pressBtn(self, mouseBtn: str | Literal[64]) -> None:
-        if mouseBtn == "left":
-            ctypes.windll.user32.mouse_event(self.MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)
-            self.pressedButtons.add("left")
-        elif mouseBtn == "right":
-            ctypes.windll.user32.mouse_event(self.MOUSEEVENTF_RIGHTDOWN, 0, 0, 0, 0)
-            self.pressedButtons.add("right")
-        elif mouseBtn == "middle":
-            ctypes.windll.user32.mouse_event(self.MOUSEEVENTF_MIDDLEDOWN, 0, 0, 0, 0)
-            self.pressedButtons.add("middle")
-        else:
+        if mouseBtn not in self.BUTTON_FLAGS:
             raise ValueError(f"Unsupported button: {mouseBtn}")
+        self.pressedButtons.add(mouseBtn)
+        self._queueEvent(self.BUTTON_FLAGS[mouseBtn][0])
 
     def releaseBtn(self, mouseBtn: str | Literal[64]) -> None:
-        if mouseBtn == "left" and "left" in self.pressedButtons:
-            ctypes.windll.user32.mouse_event(self.MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)
-            self.pressedButtons.remove("left")
-        elif mouseBtn == "right" and "right" in self.pressedButtons:
-            ctypes.windll.user32.mouse_event(self.MOUSEEVENTF_RIGHTUP, 0, 0, 0, 0)
-            self.pressedButtons.remove("right")
-        elif mouseBtn == "middle" and "middle" in self.pressedButtons:
-            ctypes.windll.user32.mouse_event(self.MOUSEEVENTF_MIDDLEUP, 0, 0, 0, 0)
-            self.pressedButtons.remove("middle")
-        else:
+        if mouseBtn not in self.BUTTON_FLAGS or mouseBtn not in self.pressedButtons:
             raise ValueError(f"Unsupported or unpressed button: {mouseBtn}")
+        self.pressedButtons.remove(mouseBtn)
+        self._queueEvent(self.BUTTON_FLAGS[mouseBtn][1])
 
     def moveSmoothlyTo(self, x, y, timeElapse):
         raise NotImplementedError
     
     def setVelocity(self, vx, vy):
-        raise NotImplementedError
+        '''px/s, applied by update()'''
+        self.movementVelocity = (float(vx), float(vy))
     
-    def update(self):
+    def update(self, now: float | None=None) -> Tuple[int, int]:
         '''
         method that will update state of the mouse 
         (mostly for smooth implementations of movement)
+        moves by velocity * time since last update -> (dx, dy) moved
+        now: perf_counter time, default read here
         '''
+        if now is None:
+            now = time.perf_counter()
+        elapsed = now - self._lastUpdate if self._lastUpdate is not None else 0.0
+        self._lastUpdate = now
+        
+        vx, vy = self.movementVelocity
+        return self.moveBy(vx * elapsed, vy * elapsed)
+
+
+class MouseBackend:
+    '''
+    sink of mouse input for Mouse
+    send() gets a batch of (flags, dx, dy) events (Mouse.MOUSEEVENTF_* flags) to emit in order
+    '''
+    
+    def send(self, events: List[Tuple[int, int, int]]) -> None:
         raise NotImplementedError
+    
+    def moveTo(self, x: int, y: int) -> None:
+        raise NotImplementedError
+
+
+class _MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ('dx', ctypes.c_int32),
+        ('dy', ctypes.c_int32),
+        ('mouseData', ctypes.c_uint32),
+        ('dwFlags', ctypes.c_uint32),
+        ('time', ctypes.c_uint32),
+        ('dwExtraInfo', ctypes.c_size_t),
+    ]
+
+
+class _INPUT(ctypes.Structure):
+    class _INPUTUNION(ctypes.Union):
+        # MOUSEINPUT is the largest member of the win32 union, keyboard/hardware inputs are not sent
+        _fields_ = [('mi', _MOUSEINPUT)]
+    
+    _anonymous_ = ('u',)
+    _fields_ = [('type', ctypes.c_uint32), ('u', _INPUTUNION)]
+
+
+class SendInputMouseBackend(MouseBackend):
+    '''
+    one SendInput call per batch (legacy mouse_event is one call per event, 
+    and other input can land between the events of a click)
+    '''
+    INPUT_MOUSE = 0
+    
+    def send(self, events: List[Tuple[int, int, int]]) -> None:
+        # user32 is resolved on first use, constructing the backend works without win32
+        inputs = (_INPUT * len(events))()
+        for inp, (flags, dx, dy) in zip(inputs, events):
+            inp.type = self.INPUT_MOUSE
+            inp.mi.dx = dx
+            inp.mi.dy = dy
+            inp.mi.dwFlags = flags
+        ctypes.windll.user32.SendInput(len(events), inputs, ctypes.sizeof(_INPUT))
+    
+    def moveTo(self, x: int, y: int) -> None:
+        ctypes.windll.user32.SetCursorPos(x, y)
+
+
+class MemoryMouseBackend(MouseBackend):
+    '''in-memory mouse (tests, simulations): records every batch, sums up relative moves'''
+    
+    def __init__(self) -> None:
+        self.batches: List[List[Tuple[int, int, int]]] = []
+        self.position = np.zeros(2, dtype=np.int64)  # relative moves summed up, moveTo() sets it
+    
+    @property
+    def events(self) -> List[Tuple[int, int, int]]:
+        return [event for batch in self.batches for event in batch]
+    
+    @property
+    def moves(self) -> List[Tuple[int, int]]:
+        return [(dx, dy) for flags, dx, dy in self.events if flags == Mouse.MOUSEEVENTF_MOVE]
+    
+    def send(self, events: List[Tuple[int, int, int]]) -> None:
+        self.batches.append(list(events))
+        for flags, dx, dy in events:
+            if flags == Mouse.MOUSEEVENTF_MOVE:
+                self.position += (dx, dy)
+    
+    def moveTo(self, x: int, y: int) -> None:
+        self.position[:] = (x, y)
+    
+    def clear(self) -> None:
+        self.batches.clear()
+
+
+class KeyboardBackend:
+    '''
+    source of keyboard snapshots for KeyboardInputHandler
+    read() -> bool array of 256 entries, True if key with that virtual-key code is down
+    '''
+    
+    def read(self) -> np.ndarray:
+        raise NotImplementedError
+
+
+class Win32KeyboardBackend(KeyboardBackend):
+    '''
+    reads the async state of key codes in one pass per snapshot
+    (GetKeyboardState would be one call, but it only follows keyboard messages of the 
+    calling thread's queue, not keys pressed in the game window)
+    codes: key codes to read, default all of 0x08 - 0xFD (every hex key set sees every key);
+    e.g. KeyboardInputHandler.VK_CODES.values() reads only the named keys, ~5x fewer calls per snapshot
+    '''
+    SCAN_CODES = range(0x08, 0xFE)
+    
+    def __init__(self, codes: Iterable[int] | None=None) -> None:
+        self.codes = sorted(set(codes if codes is not None else self.SCAN_CODES))
+        self._getAsyncKeyState = None  # resolved on first read(), constructing works without win32
+        self._state = np.zeros(256, dtype=bool)
+    
+    def read(self) -> np.ndarray:
+        if self._getAsyncKeyState is None:
+            self._getAsyncKeyState = ctypes.windll.user32.GetAsyncKeyState
+        getAsyncKeyState = self._getAsyncKeyState
+        state = self._state
+        for vk in self.codes:
+            state[vk] = getAsyncKeyState(vk) & 0x8000
+        return state.copy()
+
+
+class MemoryKeyboardBackend(KeyboardBackend):
+    '''in-memory keyboard (tests, replays): keys are pressed/released by code or VK_CODES name'''
+    
+    def __init__(self) -> None:
+        self._state = np.zeros(256, dtype=bool)
+    
+    @staticmethod
+    def _code(key: str | int) -> int:
+        return KeyboardInputHandler.VK_CODES[key] if isinstance(key, str) else key
+    
+    def press(self, *keys: str | int) -> None:
+        for key in keys:
+            self._state[self._code(key)] = True
+    
+    def release(self, *keys: str | int) -> None:
+        for key in keys:
+            self._state[self._code(key)] = False
+    
+    def read(self) -> np.ndarray:
+        return self._state.copy()
 
 
 class KeyboardInputHandler:
@@ -88,56 +289,74 @@ class KeyboardInputHandler:
     }
     
     INVERSE_MAP = {v: k for k, v in VK_CODES.items()}
+    
+    # named keys as arrays, for snapshot -> set of names
+    _NAMED_CODES = np.array(list(VK_CODES.values()))
+    _NAMES = np.array(list(VK_CODES.keys()))
 
-    def __init__(self):
-        self.prevState: Set[str] = set()  # human-readable
-        self._previousStateHex = set()
+    def __init__(self, backend: KeyboardBackend | None=None):
+        '''
+        keyboard state is read once per tick with poll(), every key set below is derived 
+        from that snapshot (and the one taken at the last updateKeyboard())
+        '''
+        self.backend = backend if backend is not None else Win32KeyboardBackend()
+        
+        self._state = np.zeros(256, dtype=bool)  # snapshot of last poll()
+        self._prevState = np.zeros(256, dtype=bool)  # snapshot at last updateKeyboard()
+        self._cache = {}  # derived sets of current snapshots
+
+    def poll(self) -> Set[str]:
+        '''take keyboard snapshot for this tick -> currently pressed keys'''
+        self._state = self.backend.read()
+        self._cache.clear()
+        return self._currentState
+    
+    def _names(self, state: np.ndarray) -> Set[str]:
+        return set(self._NAMES[state[self._NAMED_CODES]].tolist())
+    
+    def _derived(self, key: str, fn) -> Set:
+        if key not in self._cache:
+            self._cache[key] = fn()
+        return self._cache[key]
 
     @property
     def _currentState(self) -> Set[str]:
         '''
-        get keys that are currently pressed
+        get keys that are currently pressed (as of last poll)
         human-readable ver
         '''
-        pressed_keys = set()
-        for name, vk in self.VK_CODES.items():
-            if ctypes.windll.user32.GetAsyncKeyState(vk) & 0x8000:
-                pressed_keys.add(name)
-        return pressed_keys
+        return self._derived('current', lambda: self._names(self._state))
 
     @property
     def _currentStateHex(self) -> Set[int]:
         """not-human-readable"""
-        pressed_keys = set()
-        for vk_code in range(0x08, 0xFE):
-            if ctypes.windll.user32.GetAsyncKeyState(vk_code) & 0x8000:
-                key_name = self.INVERSE_MAP.get(vk_code, f"VK_{vk_code}")
-                pressed_keys.add(vk_code)  # Add the key code, not the key name
-        return pressed_keys
+        return self._derived('currentHex', lambda: set(np.flatnonzero(self._state).tolist()))
+    
+    @property
+    def prevState(self) -> Set[str]:
+        return self._derived('prev', lambda: self._names(self._prevState))
 
     @property
     def pressedKeys(self) -> Set[str]:
         '''Returns the set of keys pressed since the last update (human-readable)'''
-        return self._currentState.difference(self.prevState)
+        return self._derived('pressed', lambda: self._names(self._state & ~self._prevState))
     
     @property
     def releasedKeys(self) -> Set[str]:
         '''Returns the set of keys released since the last update (human-readable)'''
-        return self.prevState.difference(self._currentState)
+        return self._derived('released', lambda: self._names(self._prevState & ~self._state))
 
     @property
     def pressedKeysHex(self) -> Set[int]:
         '''Returns the set of keys pressed since the last update (hex codes)'''
-        return self._currentStateHex.difference(self._previousStateHex)
+        return self._derived('pressedHex', lambda: set(np.flatnonzero(self._state & ~self._prevState).tolist()))
     
     @property
     def releasedKeysHex(self) -> Set[int]:
         '''Returns the set of keys released since the last update (hex codes)'''
-        return self._previousStateHex.difference(self._currentStateHex)
+        return self._derived('releasedHex', lambda: set(np.flatnonzero(self._prevState & ~self._state).tolist()))
     
     def updateKeyboard(self) -> None:
-        self.prevState = self._currentState
-        self._previousStateHex = self._currentStateHex
-
-
-
+        '''current snapshot becomes the reference for pressed/released keys'''
+        self._prevState = self._state
+        self._cache.clear()
@@ -1,3 +1,4 @@
+import threading
 import numpy as np
 import cv2 as cv
 import mss
@@ -8,6 +9,8 @@ import win32con
 import win32api
 import win32com.client
 
+from sources import FrameSource
+
 # TODO:
 # high-fps window capture (win32 api?)
 # OpenGL q3-hook 
@@ -23,14 +26,29 @@ class WindowCaptureAbstract:
         if not self.hWnd:
             raise Exception(f"Window with title '{windowTitle}' not found!")
 
-        window_rect = win32gui.GetWindowRect(self.hWnd)
-        self.offset_x = window_rect[0]
-        self.offset_y = window_rect[1]
-        self.w = window_rect[2] - window_rect[0]
-        self.h = window_rect[3] - window_rect[1]
+        self.offset_x, self.offset_y, self.w, self.h = self._getWindowGeometry()
         
         win32gui.SetForegroundWindow(self.hWnd)
     
+    def _getWindowGeometry(self):
+        '''-> (left, top, width, height) of the window'''
+        window_rect = win32gui.GetWindowRect(self.hWnd)
+        return (
+            window_rect[0], 
+            window_rect[1], 
+            window_rect[2] - window_rect[0], 
+            window_rect[3] - window_rect[1],
+        )
+    
+    def _on_resize(self) -> bool:
+        '''refresh cached geometry if window was moved/resized, -> True if it changed'''
+        geometry = self._getWindowGeometry()
+        if geometry == (self.offset_x, self.offset_y, self.w, self.h):
+            return False
+        
+        self.offset_x, self.offset_y, self.w, self.h = geometry
+        return True
+    
     def listWindowNames(self):
         def winEnumHandler(hwnd, ctx):
             if win32gui.IsWindowVisible(hwnd):
@@ -87,19 +105,60 @@ class WindowCaptureWin32(WindowCaptureAbstract):
         
         return img
 
-    def _on_resize(self):
-        # update window if resized
-        
-        pass
-
     def update(self):
         pass
 
 
-class WindowCaptureMSS(WindowCaptureAbstract):
+class WindowCaptureMSS(WindowCaptureAbstract, FrameSource):
+    '''
+    long-lived mss session:
+    - grabber is created once (per thread, mss handles are thread-bound)
+    - monitor dict is cached and refreshed only when window geometry changes
+    - frames are converted into a reusable BGR buffer
+    '''
+    # frames between window geometry checks
+    resizeCheckInterval = 30
     
     def __init__(self, windowTitle: str):
         super().__init__(windowTitle=windowTitle)
+        
+        self._session = threading.local()
+        self._sessions = []  # every thread's grabber, closed together by close()
+        self._sessionsLock = threading.Lock()
+        self._frameCount = 0
+        self._updateMonitor()
+    
+    def _updateMonitor(self) -> None:
+        self.monitor = {
+            "top": self.offset_y,
+            "left": self.offset_x,
+            "width": self.w,
+            "height": self.h
+        }
+        self._frameBuffer = np.empty((self.h, self.w, 3), dtype=np.uint8)
+    
+    def _on_resize(self) -> bool:
+        resized = super()._on_resize()
+        if resized:
+            self._updateMonitor()
+        return resized
+    
+    @property
+    def sct(self) -> mss.base.MSSBase:
+        sct = getattr(self._session, 'sct', None)
+        if sct is None:
+            sct = self._session.sct = mss.mss()
+            with self._sessionsLock:
+                self._sessions.append(sct)
+        return sct
+    
+    def close(self) -> None:
+        '''release grabbers of all threads (a thread grabbing again gets a new one)'''
+        with self._sessionsLock:
+            sessions, self._sessions = self._sessions, []
+            self._session = threading.local()
+        for sct in sessions:
+            sct.close()
     
     def focusCurrentWindow(self) -> None:
         '''Error for commented code on Alt+tab'''
@@ -116,22 +175,27 @@ class WindowCaptureMSS(WindowCaptureAbstract):
         shell.SendKeys('%')
         win32gui.SetForegroundWindow(self.hWnd)
     
-    def takeScreenshot(self) -> np.ndarray:
+    def takeScreenshot(self, out: np.ndarray | None=None) -> np.ndarray:
+        '''
+        -> BGR frame
+        without `out` the frame lives in the internal buffer and is overwritten by the next call
+        '''
         # ensure window is always focused
         
         # self.focusCurrentWindow()
         
-        monitor = {
-            "top": self.offset_y,
-            "left": self.offset_x,
-            "width": self.w,
-            "height": self.h
-        }
+        self._frameCount += 1
+        if self._frameCount % self.resizeCheckInterval == 0:
+            self._on_resize()
+        
+        screenshot = self.sct.grab(self.monitor)
+        bgra = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+        
+        if out is None:
+            if self._frameBuffer.shape[:2] != bgra.shape[:2]:  # grab clipped by screen bounds
+                self._frameBuffer = np.empty((*bgra.shape[:2], 3), dtype=np.uint8)
+            out = self._frameBuffer
         
-        with mss.mss() as sct:
-            screenshot = sct.grab(monitor)
-            
-            img = np.array(screenshot)[:, :, :3]
-            return img
+        return cv.cvtColor(bgra, cv.COLOR_BGRA2BGR, dst=out)
 
 
@@ -1,91 +1,397 @@
-import cv2 as cv
-from time import time
+from __future__ import annotations
+
+import os
 import click
 
+from typing import TYPE_CHECKING
+
 import cmd_helper
-from vision import ProcessingParams
-from control import PIDParams
-from aim import AutoAimBot, AutoFireBot
+
+# numpy, OpenCV and the bots load when a mode/subcommand needs them, --help only needs click;
+# win32 capture is imported by openWindowCapture() for live modes only
+np = cmd_helper.LazyModule('numpy')
+benchmarks = cmd_helper.LazyModule('bench')
+simulate = cmd_helper.LazyModule('simulate')
+sweeps = cmd_helper.LazyModule('sweep')
+
+if TYPE_CHECKING:
+    from vision import ProcessingParams
+    from control import PIDParams
+    from sources import FrameSource
+    from events import MouseBackend, KeyboardBackend
+
+WINDOW_TITLE = 'Quake 3: Arena'
 
 # TODO:
 # fullscale console app (click)
 
 # ====== Main functions =========
+def enableStageTimings(frameProc, timingsPath: str | None) -> None:
+    '''per-stage vision timers on, summary dumped as json on exit'''
+    if not timingsPath:
+        return
+    frameProc.timers.enabled = True
+    frameProc.timers.dumpOnExit(timingsPath)
+
+
+def openFrameSource(
+    record: str | None=None,
+    replay: str | None=None,
+    replaySpeed: float=1.0,
+    recordFrames: int=3600,
+) -> FrameSource:
+    '''live window capture (optionally recorded to file) or replay of a recorded file'''
+    from sources import FrameRecorder, ReplayFrameSource
+    
+    if replay:
+        # speed 0 -> as fast as possible
+        return ReplayFrameSource(replay, speed=replaySpeed or None)
+    
+    from aim import openWindowCapture
+    
+    source = openWindowCapture(WINDOW_TITLE)
+    if record:
+        source = FrameRecorder(source, record, capacity=recordFrames)
+    return source
+
+
+def openInputBackends(replay: str | None=None, holdKeys: tuple=()) -> tuple:
+    '''
+    -> (mouse backend, keyboard backend): None, None (bots use SendInput / GetAsyncKeyState) for
+    live play; in-memory ones for replays and machines without win32, holdKeys stay pressed there
+    '''
+    import ctypes
+    from events import MemoryMouseBackend, MemoryKeyboardBackend
+    
+    if not replay and hasattr(ctypes, 'windll'):
+        return None, None
+    
+    keyboard = MemoryKeyboardBackend()
+    keyboard.press(*holdKeys)
+    return MemoryMouseBackend(), keyboard
+
+
 def runAutoAim(
-    procParams: ProcessingParams=ProcessingParams(),
-    pidParams: PIDParams=PIDParams(),
+    procParams: ProcessingParams | None=None,
+    pidParams: PIDParams | None=None,
     debug: bool=False,
+    pipelined: bool=False,
+    frameSource: FrameSource | None=None,
+    timingsPath: str | None=None,
+    tracking: bool=False,
+    latencyCompensation: bool=True,
+    controlRate: float | None=None,
+    visionProcesses: int=0,
+    sessionPath: str | None=None,
+    frameBudget: float | None=None,
+    mouseBackend: MouseBackend | None=None,
+    keyboardBackend: KeyboardBackend | None=None,
+    cameraFollowsMouse: bool=True,
 ) -> None:
+    from aim import AutoAimBot
+    from vision import ProcessingParams
+    from control import PIDParams
+    from quality import QualityParams
     
     autoAimBot = AutoAimBot(
-        windowTitle='Quake 3: Arena', 
-        processingParams=procParams,
-        pidParams=pidParams,
+        windowTitle=WINDOW_TITLE, 
+        processingParams=procParams or ProcessingParams(),
+        pidParams=pidParams or PIDParams(),
         debug=debug,
+        pipelined=pipelined,
+        frameSource=frameSource,
+        tracking=tracking,
+        latencyCompensation=latencyCompensation,
+        controlRate=controlRate,
+        visionProcesses=visionProcesses,
+        sessionPath=sessionPath,
+        qualityParams=QualityParams(frameBudget=frameBudget) if frameBudget else None,
+        mouseBackend=mouseBackend,
+        keyboardBackend=keyboardBackend,
+        cameraFollowsMouse=cameraFollowsMouse,
     )
+    enableStageTimings(autoAimBot.frameProc, timingsPath)
     autoAimBot.mainLoop()
 
 
 def runAutoFire(
-    procParams: ProcessingParams=ProcessingParams(),
+    procParams: ProcessingParams | None=None,
     debug: bool=False,
+    pipelined: bool=False,
+    frameSource: FrameSource | None=None,
+    timingsPath: str | None=None,
+    visionProcesses: int=0,
+    mouseBackend: MouseBackend | None=None,
+    keyboardBackend: KeyboardBackend | None=None,
 ):
+    from aim import AutoFireBot
+    from vision import ProcessingParams
     
     autoFireBot = AutoFireBot(
-        windowTitle='Quake 3: Arena', 
-        processingParams=procParams,
+        windowTitle=WINDOW_TITLE, 
+        processingParams=procParams or ProcessingParams(),
         debug=debug,
+        pipelined=pipelined,
+        frameSource=frameSource,
+        visionProcesses=visionProcesses,
+        mouseBackend=mouseBackend,
+        keyboardBackend=keyboardBackend,
     )
+    enableStageTimings(autoFireBot.frameProc, timingsPath)
     autoFireBot.mainLoop()
 
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option('--mode', default=None, help='autoaim / autofire')
 @click.option('--debug', default=False, help='enables debug mode: FPS, ROI-lines for autoAim detection area')
+@click.option('--pipelined', default=False, help='run capture and vision in background threads (newest frame wins)')
+@click.option('--tracking', default=False, help='autoaim: process only a search window around the held target')
+@click.option('--latencyCompensation', 'latencyCompensation', default=True, help='autoaim: aim where the target will be when mouse input lands')
+@click.option('--controlRate', 'controlRate', default=0.0, help='autoaim: run PID in a control thread at this rate (Hz, e.g. 1000), output is mouse velocity px/s; 0 - one step per frame')
+@click.option('--frameBudget', 'frameBudget', default=0.0, help='autoaim: vision ms per frame to hold by lowering blur/dilation/downscale under load (0 - off)')
+@click.option('--visionProcesses', 'visionProcesses', default=0, help='run vision in this many worker processes fed by a shared memory frame ring (0 - off)')
+@click.option('--record', default=None, help='record captured frames into raw frame file')
+@click.option('--recordFrames', 'recordFrames', default=3600, help='--record: stop recording after this many frames (file grows as frames come in)')
+@click.option('--replay', default=None, help='replay recorded frame file instead of live capture')
+@click.option('--replaySpeed', 'replaySpeed', default=1.0, help='replay speed, 1.0 - real time, 0 - as fast as possible')
+@click.option('--timings', default=None, help='enable per-stage vision timers, dump p50/p95/p99/max json to this path on exit')
+@click.option('--session', default=None, help='autoaim: log per-tick detections, target, PID terms and mouse deltas into this session file')
 @click.option('--hsvmin', cls=cmd_helper.ClickLiteralOption, default='[50, 210, 70]')
 @click.option('--hsvmax', cls=cmd_helper.ClickLiteralOption, default='[70, 255, 255]')
 @click.option('--gaussianBlurSize', 'gaussianBlurSize', cls=cmd_helper.ClickLiteralOption, default='(21, 21)')
 @click.option('--morphKernelSize', 'morphKernelSize', cls=cmd_helper.ClickLiteralOption, default='(3, 3)')
+@click.option('--downscale', default=1.0, help='process frames at this fraction of capture resolution (0.5, 0.25, ...)')
+@click.option('--thresholdEngine', 'thresholdEngine', default='hsv', help='hsv / lut (cached BGR -> mask table)')
+@click.option('--blurEngine', 'blurEngine', default='gaussian', help='gaussian / box / stack / downsample / mask (blur thresholded mask) / none')
 @click.option('--pid', cls=cmd_helper.ClickLiteralOption, default='[4.0, 0.2, 0.3]')
+@click.pass_context
 def main(
+    ctx: click.Context,
     mode: str, 
     debug: bool, 
+    pipelined: bool,
+    visionProcesses: int,
+    frameBudget: float,
+    tracking: bool,
+    latencyCompensation: bool,
+    controlRate: float,
+    record: str,
+    recordFrames: int,
+    replay: str,
+    replaySpeed: float,
+    timings: str,
+    session: str,
     hsvmin: list,
     hsvmax: list,
     gaussianBlurSize: tuple,
     morphKernelSize: tuple,
+    downscale: float,
+    thresholdEngine: str,
+    blurEngine: str,
     pid: list,
 ) -> None:
+    frameProcDict = {
+        'hsvmin': hsvmin,
+        'hsvmax': hsvmax,
+        'gaussianBlurSize': gaussianBlurSize,
+        'morphKernelSize': morphKernelSize,
+        'downscale': downscale,
+        'thresholdEngine': thresholdEngine,
+        'blurEngine': blurEngine,
+    }
+    
+    if ctx.invoked_subcommand is not None:
+        # subcommands (bench, ...) share processing params, built by those that need them
+        ctx.obj = {'procParamsDict': frameProcDict}
+        return
+    
+    frameProcParams = cmd_helper.constructProcessingParams(**frameProcDict)
+    
     print({
         'mode': mode,
         'debug': debug,
+        'pipelined': pipelined,
+        'visionProcesses': visionProcesses,
+        'frameBudget': frameBudget,
+        'tracking': tracking,
+        'latencyCompensation': latencyCompensation,
+        'controlRate': controlRate,
+        'record': record,
+        'recordFrames': recordFrames,
+        'replay': replay,
+        'replaySpeed': replaySpeed,
+        'timings': timings,
+        'session': session,
         'hsvmin': hsvmin,
         'hsvmax': hsvmax,
         'gaussianBlurSize': gaussianBlurSize,
         'morphKernelSize': morphKernelSize,
+        'downscale': downscale,
+        'thresholdEngine': thresholdEngine,
+        'blurEngine': blurEngine,
         'pid': pid,
     })
-    frameProcDict = {
-        'hsvmin': hsvmin,
-        'hsvmax': hsvmax,
-        'gaussianBlurSize': gaussianBlurSize,
-        'morphKernelSize': morphKernelSize,
-    }
-    
-    frameProcParams = cmd_helper.constructProcessingParams(**frameProcDict)
     
     if mode.lower() == 'autoaim':
         pidParams = cmd_helper.constructPIDParams(pidCoefs=pid)
-        runAutoAim(procParams=frameProcParams, pidParams=pidParams, debug=debug)
+        from aim import TRACK_TARGET_KEY
+        
+        frameSource = openFrameSource(record=record, replay=replay, replaySpeed=replaySpeed, recordFrames=recordFrames)
+        # replays aim into an in-memory mouse with the track key held (see --session)
+        mouseBackend, keyboardBackend = openInputBackends(replay, holdKeys=(TRACK_TARGET_KEY,))
+        runAutoAim(procParams=frameProcParams, pidParams=pidParams, debug=debug, pipelined=pipelined, frameSource=frameSource, timingsPath=timings, tracking=tracking, latencyCompensation=latencyCompensation, controlRate=controlRate or None, visionProcesses=visionProcesses, sessionPath=session, frameBudget=frameBudget / 1e3 or None, mouseBackend=mouseBackend, keyboardBackend=keyboardBackend, cameraFollowsMouse=not replay)
         return
         
     elif mode.lower() == 'autofire':
-        runAutoFire(procParams=frameProcParams, debug=debug)
+        from aim import ENABLE_AUTOFIRE_KEY
+        
+        frameSource = openFrameSource(record=record, replay=replay, replaySpeed=replaySpeed, recordFrames=recordFrames)
+        mouseBackend, keyboardBackend = openInputBackends(replay, holdKeys=(ENABLE_AUTOFIRE_KEY,))
+        runAutoFire(procParams=frameProcParams, debug=debug, pipelined=pipelined, frameSource=frameSource, timingsPath=timings, visionProcesses=visionProcesses, mouseBackend=mouseBackend, keyboardBackend=keyboardBackend)
         return
     
     raise ValueError('Mode must ne one of these: autoaim, autofire')
+
+
+@main.command()
+@click.option('--resolutions', cls=cmd_helper.ClickLiteralOption, default=lambda: str(benchmarks.BENCH_RESOLUTIONS), help='list of (width, height)')
+@click.option('--blobs', cls=cmd_helper.ClickLiteralOption, default=lambda: str(benchmarks.BENCH_BLOB_COUNTS), help='list of blob counts for synthetic frames')
+@click.option('--frames', default=20, help='frames per case')
+@click.option('--scales', cls=cmd_helper.ClickLiteralOption, default=lambda: str(benchmarks.BENCH_SCALES), help='downscale factors to compare, [1.0] - full scale only')
+@click.option('--blurEngines', 'blurEngines', cls=cmd_helper.ClickLiteralOption, default=lambda: str(benchmarks.BENCH_BLUR_ENGINES), help="blur engines to compare with --blurEngine at full scale, [] - skip")
+@click.option('--recording', default=None, help='also benchmark frames of a recorded frame file')
+@click.option('--baseline', default=None, help='baseline json to compare against, machine specific: create one with --saveBaseline True')
+@click.option('--saveBaseline', 'saveBaseline', default=False, help='write results to --baseline instead of comparing')
+@click.option('--tolerance', default=0.15, help='allowed p50 slowdown vs baseline')
+@click.option('--importRepeats', 'importRepeats', default=5, help='fresh-interpreter samples per timed import (0 - skip import timings)')
+@click.pass_context
+def bench(
+    ctx: click.Context,
+    resolutions: list,
+    blobs: list,
+    frames: int,
+    scales: list,
+    blurEngines: list,
+    recording: str,
+    baseline: str,
+    saveBaseline: bool,
+    tolerance: float,
+    importRepeats: int,
+) -> None:
+    '''
+    vision pipeline benchmarks: per-stage latency percentiles and fps, CLI/module import times
+    
+    no baseline is shipped, timings only compare on the same machine and settings:
+    
+    \b
+    bench --baseline bench_baseline.json --saveBaseline True   (once, e.g. on the main branch)
+    bench --baseline bench_baseline.json                       (exit code 1 on p50 regressions)
+    '''
+    if baseline and not saveBaseline and not os.path.isfile(baseline):
+        raise click.BadParameter(f"'{baseline}' does not exist, create it with --saveBaseline True", param_hint='--baseline')
     
+    results = benchmarks.runBenchmarks(
+        params=cmd_helper.constructProcessingParams(**ctx.obj['procParamsDict']),
+        resolutions=resolutions,
+        blobCounts=blobs,
+        frameCount=frames,
+        recording=recording,
+        scales=scales,
+        blurEngines=blurEngines,
+    )
+    
+    regressions = None
+    if baseline and saveBaseline:
+        benchmarks.saveBaseline(baseline, results)
+    elif baseline:
+        regressions = benchmarks.compareWithBaseline(results, benchmarks.loadBaseline(baseline), tolerance=tolerance)
+    
+    imports = benchmarks.importBenchmarks(repeats=importRepeats) if importRepeats else None
+    print(benchmarks.formatReport(results, regressions, imports))
+    if regressions:
+        ctx.exit(1)
+    
+
+@main.command()
+@click.option('--candidates', default=20000, help='random PID candidates to evaluate')
+@click.option('--kp', cls=cmd_helper.ClickLiteralOption, default='(0.05, 2.0)', help='(low, high) range of kp')
+@click.option('--ki', cls=cmd_helper.ClickLiteralOption, default='(0.0, 1.0)', help='(low, high) range of ki')
+@click.option('--kd', cls=cmd_helper.ClickLiteralOption, default='(0.0, 0.2)', help='(low, high) range of kd')
+@click.option('--trajectories', cls=cmd_helper.ClickLiteralOption, default=lambda: str(list(simulate.TRAJECTORIES)), help='target trajectories to simulate')
+@click.option('--fps', default=60.0, help='control steps per second')
+@click.option('--measurementDelay', 'measurementDelay', default=1, help='frames between capture and control step')
+@click.option('--actuationDelay', 'actuationDelay', default=1, help='frames between mouse input and camera movement')
+@click.option('--mouseGain', 'mouseGain', default=1.0, help='camera px per mouse count')
+@click.option('--latencyCompensation', 'latencyCompensation', default=True, help='simulate the control law of `run --latencyCompensation` (use the same value there)')
+@click.option('--workers', default=0, help='worker processes, 0 - all cores')
+@click.option('--top', default=10, help='candidates to print')
+@click.option('--seed', default=0)
+def tune(
+    candidates: int,
+    kp: tuple,
+    ki: tuple,
+    kd: tuple,
+    trajectories: list,
+    fps: float,
+    measurementDelay: int,
+    actuationDelay: int,
+    mouseGain: float,
+    latencyCompensation: bool,
+    workers: int,
+    top: int,
+    seed: int,
+) -> None:
+    '''offline PID tuning: simulated closed loop, candidates ranked by settle time and overshoot'''
+    plant = simulate.PlantParams(fps=fps, measurementDelay=measurementDelay, actuationDelay=actuationDelay, mouseGain=mouseGain, 
+                                 latencyCompensation=latencyCompensation)
+    pidCandidates = simulate.randomCandidates(candidates, {'kp': kp, 'ki': ki, 'kd': kd}, seed=seed)
+    
+    ranked = simulate.tune(pidCandidates, trajectories=trajectories, plant=plant, workers=workers or None)
+    
+    print(simulate.formatRanking(ranked, top))
+    best = simulate.toPIDParams(ranked)
+    # gains only hold for the control law they were tuned on
+    print(f"\nbest: --pid \"[{best.kp:.3f}, {best.ki:.3f}, {best.kd:.3f}]\" --latencyCompensation {latencyCompensation}")
+
+
+@main.command()
+@click.option('--recording', required=True, help='recorded frame file to evaluate on')
+@click.option('--labels', default=None, help='ground-truth json (per-frame box lists); default: detections of current params')
+@click.option('--frames', default=200, help='max frames used')
+@click.option('--grid', cls=cmd_helper.ClickLiteralOption, default=lambda: str(sweeps.DEFAULT_SWEEP_GRID), help='{ProcessingParams field: [values]}')
+@click.option('--minPrecision', 'minPrecision', default=0.9)
+@click.option('--minRecall', 'minRecall', default=0.9)
+@click.option('--iou', default=0.5, help='IoU threshold of a match')
+@click.option('--workers', default=0, help='worker processes, 0 - all cores')
+@click.option('--top', default=20, help='rows to print')
+@click.pass_context
+def sweep(
+    ctx: click.Context,
+    recording: str,
+    labels: str,
+    frames: int,
+    grid: dict,
+    minPrecision: float,
+    minRecall: float,
+    iou: float,
+    workers: int,
+    top: int,
+) -> None:
+    '''processing params grid vs labelled recording: precision/recall/IoU and per-frame cost'''
+    procParams = cmd_helper.constructProcessingParams(**ctx.obj['procParamsDict'])
+    recordedFrames = np.stack(benchmarks.loadRecordedFrames(recording, limit=frames))
+    
+    if labels:
+        truth = sweeps.loadGroundTruth(labels)
+    else:
+        print("no --labels, using detections of current params as ground truth (agreement sweep)")
+        truth = sweeps.referenceGroundTruth(recordedFrames, procParams)
+    
+    rows = sweeps.runSweep(recordedFrames, truth, sweeps.paramGrid(procParams, grid), iouThreshold=iou, workers=workers or None)
+    rows = sweeps.rankRows(rows, minPrecision=minPrecision, minRecall=minRecall)
+    print(sweeps.formatSweep(rows, grid, minPrecision, minRecall, top=top))
+
 
 if __name__ == '__main__':
     
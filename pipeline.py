@@ -0,0 +1,518 @@
+import threading
+import time
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Any, Callable, Tuple
+
+from vision import VisionResult
+from sources import FrameSource
+
+
+class LatestValueSlot:
+    '''
+    bounded (size 1) hand-off between two threads: latest value wins
+    - put() overwrites value that was not read yet (counted in `dropped`)
+    - get() blocks until a value newer than `lastSeq` is there
+    - value returned by get() is owned by the consumer until its next get()
+    '''
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._value = None
+        self._pending = False
+        self._closed = False
+
+        self.taken = None  # value held by the consumer
+        self.dropped = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def pendingValue(self) -> Any:
+        '''value that was put but not taken yet (None if there is none)'''
+        with self._cond:
+            return self._value if self._pending else None
+
+    def put(self, value: Any) -> int:
+        with self._cond:
+            if self._pending:
+                self.dropped += 1
+            self._seq += 1
+            self._value = value
+            self._pending = True
+            self._cond.notify_all()
+            return self._seq
+
+    def get(self, lastSeq: int=0, timeout: float | None=None) -> Tuple[int, Any]:
+        '''-> (seq, value), (lastSeq, None) on timeout or close'''
+        with self._cond:
+            ready = self._cond.wait_for(lambda: self._seq > lastSeq or self._closed, timeout=timeout)
+            if not ready or self._seq <= lastSeq:
+                return lastSeq, None
+
+            self._pending = False
+            self.taken = self._value
+            return self._seq, self._value
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+@dataclass
+class CapturedFrame:
+    seq: int
+    captureTime: float  # time.perf_counter() right after grab
+    frame: np.ndarray
+
+
+@dataclass
+class Detection:
+    seq: int  # seq of the source frame
+    captureTime: float
+    frame: np.ndarray  # may be reused by capture thread once newer detections arrive
+    result: VisionResult
+
+
+class VisionPipeline:
+    '''
+    capture thread -> [latest frame] -> vision thread -> [latest detection] -> consumer
+
+    stale frames/detections are dropped instead of queued, so consumer always
+    works on the newest data and throughput goes toward the slowest single stage
+    (mss grab and OpenCV calls release the GIL)
+    '''
+
+    def __init__(
+        self,
+        frameSource: FrameSource,
+        visionFn: Callable[[np.ndarray], VisionResult],
+        bufferCount: int=3,
+    ) -> None:
+        # 3 buffers: one being written, one waiting in the slot, one being processed
+        if bufferCount < 3:
+            raise ValueError("bufferCount must be at least 3")
+
+        self.frameSource = frameSource
+        self.visionFn = visionFn
+        self.bufferCount = bufferCount
+
+        self.frames = LatestValueSlot()
+        self.detections = LatestValueSlot()
+
+        self._buffers = []
+        self._lastSeq = 0  # slot seq of the last detection handed to the consumer
+        self._stopEvent = threading.Event()
+        self._threads = []
+
+        self.captured = 0
+        self.processed = 0
+
+    @property
+    def droppedFrames(self) -> int:
+        return self.frames.dropped
+
+    @property
+    def closed(self) -> bool:
+        '''no detections will come anymore (source exhausted or pipeline stopped) and none is left to take'''
+        return self.detections.closed and self.detections.pendingValue is None
+
+    def _acquireBuffer(self) -> np.ndarray | None:
+        '''buffer that is neither waiting in the frame slot nor held by the vision thread'''
+        pending = self.frames.pendingValue
+        taken = self.frames.taken
+        busy = {id(f.frame) for f in (pending, taken) if f is not None}
+
+        for buffer in self._buffers:
+            if id(buffer) not in busy:
+                return buffer
+        return None
+
+    def _captureLoop(self) -> None:
+        seq = 0
+        while not self._stopEvent.is_set():
+            out = self._acquireBuffer()
+            frame = self.frameSource.takeScreenshot(out=out)
+            captureTime = time.perf_counter()
+
+            if frame is None:  # source exhausted
+                break
+
+            if frame is not out and self.frameSource.reusesBuffer:
+                # no free buffer yet or frame shape changed:
+                # adopt a private copy, source reuses its own buffer on next grab
+                frame = frame.copy()
+                self._buffers = [b for b in self._buffers if b.shape == frame.shape]
+                if len(self._buffers) < self.bufferCount:
+                    self._buffers.append(frame)
+
+            seq += 1
+            self.captured += 1
+            self.frames.put(CapturedFrame(seq, captureTime, frame))
+
+        self.frames.close()
+
+    def _visionLoop(self) -> None:
+        lastSeq = 0
+        while not self._stopEvent.is_set():
+            lastSeq, captured = self.frames.get(lastSeq, timeout=0.1)
+            if captured is None:
+                if self.frames.closed:
+                    break
+                continue
+
+            result = self.visionFn(captured.frame)
+            self.processed += 1
+            self.detections.put(Detection(captured.seq, captured.captureTime, captured.frame, result))
+
+        self.detections.close()
+
+    def start(self) -> 'VisionPipeline':
+        self._stopEvent.clear()
+        self._threads = [
+            threading.Thread(target=self._captureLoop, name='capture', daemon=True),
+            threading.Thread(target=self._visionLoop, name='vision', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout: float=1.0) -> None:
+        self._stopEvent.set()
+        self.frames.close()
+        self.detections.close()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def latest(self, timeout: float | None=None) -> Detection | None:
+        '''newest detection not seen yet, None on timeout or when pipeline stopped'''
+        self._lastSeq, detection = self.detections.get(self._lastSeq, timeout=timeout)
+        return detection
+
+    def __enter__(self) -> 'VisionPipeline':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+# ==== multi-process layout
+# capture thread -> [shared memory frame ring] -> vision worker processes -> [detection record] -> consumer
+MAX_DETECTIONS = 64
+
+DETECTION_RECORD = np.dtype([
+    ('seq', '<i8'),
+    ('captureTime', '<f8'),
+    ('slot', '<i4'),  # frame ring slot the detection was computed on
+    ('count', '<i4'),
+    ('bboxes', '<i4', (MAX_DETECTIONS, 4)),  # largest blobs first when there are more
+    ('areas', '<f4', (MAX_DETECTIONS,)),
+    ('centroids', '<f4', (MAX_DETECTIONS, 2)),
+])
+
+# shared int64 state, guarded by the pipeline condition
+(_STOP, _CAPTURE_DONE, _FRAME_SEQ, _FRAME_SLOT, _CLAIMED_SEQ, _BUSY,
+ _DET_SEQ, _DET_TAKEN, _CAPTURED, _PROCESSED, _DROPPED, _STALE, _READY) = range(13)
+_STATE_SIZE = 13
+
+
+def _writeDetection(record: np.ndarray, seq: int, captureTime: float, slot: int, result: VisionResult) -> None:
+    count = len(result.bboxes)
+    order = np.arange(count)
+    if count > MAX_DETECTIONS:
+        order = np.argsort(-np.asarray(result.areas), kind='stable')[:MAX_DETECTIONS]
+        count = MAX_DETECTIONS
+
+    record['seq'] = seq
+    record['captureTime'] = captureTime
+    record['slot'] = slot
+    record['count'] = count
+    if count:
+        record['bboxes'][:count] = np.asarray(result.bboxes, dtype=np.int32).reshape(-1, 4)[order]
+        record['areas'][:count] = np.asarray(result.areas)[order]
+        record['centroids'][:count] = np.asarray(result.centroids).reshape(-1, 2)[order]
+
+
+def _visionWorker(specs: dict, cond, params, method: str) -> None:
+    '''vision process: newest unclaimed frame -> detection record, frames are read in place'''
+    from sharedmem import SharedArray
+    from vision import FrameProcessorCV
+
+    frames = SharedArray.attach(specs['frames'])
+    readers = SharedArray.attach(specs['readers'])
+    times = SharedArray.attach(specs['times'])
+    state = SharedArray.attach(specs['state'])
+    detection = SharedArray.attach(specs['detection'])
+    s, slotReaders = state.array, readers.array
+
+    visionFn = getattr(FrameProcessorCV(params=params), method)
+    with cond:
+        s[_READY] += 1
+        cond.notify_all()
+
+    while True:
+        with cond:
+            cond.wait_for(lambda: s[_STOP] or s[_FRAME_SEQ] > s[_CLAIMED_SEQ] or s[_CAPTURE_DONE], timeout=0.5)
+            if s[_STOP] or (s[_CAPTURE_DONE] and s[_FRAME_SEQ] <= s[_CLAIMED_SEQ]):
+                break
+            if s[_FRAME_SEQ] <= s[_CLAIMED_SEQ]:
+                continue
+            seq, slot = int(s[_FRAME_SEQ]), int(s[_FRAME_SLOT])
+            s[_CLAIMED_SEQ] = seq
+            s[_BUSY] += 1
+            slotReaders[slot] += 1
+            captureTime = float(times.array[slot])
+
+        result = visionFn(frames.array[slot])
+
+        with cond:
+            s[_BUSY] -= 1
+            s[_PROCESSED] += 1
+            record = detection.array[0]
+            if seq > s[_DET_SEQ]:
+                # previous record gives up its hold on its frame unless the consumer took it over
+                if s[_DET_SEQ] > 0 and not s[_DET_TAKEN]:
+                    slotReaders[record['slot']] -= 1
+                _writeDetection(record, seq, captureTime, slot, result)
+                s[_DET_SEQ] = seq
+                s[_DET_TAKEN] = 0
+            else:  # a newer frame finished first
+                s[_STALE] += 1
+                slotReaders[slot] -= 1
+            cond.notify_all()
+
+    for shared in (frames, readers, times, state, detection):
+        shared.close()
+
+
+class ProcessVisionPipeline:
+    '''
+    same interface as VisionPipeline, vision runs in worker processes:
+    - capture thread writes frames into a shared memory ring of preallocated slots
+    - workers claim the newest frame (older unclaimed frames are dropped), run
+      FrameProcessorCV on the slot in place and publish a compact detection record
+    - sequence numbers decide what is newest, results of frames older than the
+      published one are discarded
+    - a slot is reused only when no worker, published record or consumer holds it
+    
+    results carry bboxes/areas/centroids only, masks stay in the workers
+    frame shape is fixed by the first frame, frames of other shapes are skipped
+    capture starts once every worker is up (spawning takes ~1s), a short source is not 
+    drained before anything can process it
+    '''
+
+    def __init__(
+        self,
+        frameSource: FrameSource,
+        params,
+        workers: int=2,
+        method: str='__call__',  # FrameProcessorCV method run on every frame
+    ) -> None:
+        import multiprocessing as mp
+
+        self.frameSource = frameSource
+        self.params = params
+        self.workers = workers
+        self.method = method
+        # one slot per worker + capture, latest frame, published record, consumer
+        self.slotCount = workers + 4
+
+        self._ctx = mp.get_context('spawn')
+        self._cond = self._ctx.Condition()
+        self._shared = {}
+        self._processes = []
+        self._captureThread = None
+        self._firstFrame = None
+        self._heldSlot = None
+        self._lastSeq = 0
+        self._finalState = np.zeros(_STATE_SIZE, dtype=np.int64)  # counters after stop()
+        self.skippedFrames = 0
+
+    # ==== counters (same names as VisionPipeline)
+    def _counter(self, idx: int) -> int:
+        state = self._shared.get('state')
+        return int(state.array[idx] if state is not None else self._finalState[idx])
+
+    @property
+    def captured(self) -> int:
+        return self._counter(_CAPTURED)
+
+    @property
+    def processed(self) -> int:
+        return self._counter(_PROCESSED)
+
+    @property
+    def droppedFrames(self) -> int:
+        return self._counter(_DROPPED)
+
+    # ====
+    def _allocate(self, frameShape: Tuple[int, ...]) -> None:
+        from sharedmem import SharedArray
+
+        self._shared = {
+            'frames': SharedArray.create((self.slotCount, *frameShape), np.uint8),
+            'readers': SharedArray.create((self.slotCount,), np.int64),
+            'times': SharedArray.create((self.slotCount,), np.float64),
+            'state': SharedArray.create((_STATE_SIZE,), np.int64),
+            'detection': SharedArray.create((1,), DETECTION_RECORD),
+        }
+        for shared in self._shared.values():
+            shared.array[...] = 0
+
+    def _captureLoop(self) -> None:
+        frames = self._shared['frames'].array
+        slotReaders = self._shared['readers'].array
+        times = self._shared['times'].array
+        s = self._shared['state'].array
+
+        pending = self._firstFrame
+        self._firstFrame = None
+        seq = 0
+        while True:
+            with self._cond:
+                if s[_STOP]:
+                    break
+                free = [i for i in range(self.slotCount) if slotReaders[i] == 0 and (seq == 0 or i != s[_FRAME_SLOT])]
+            if not free:  # cannot happen with slotCount holders, be safe anyway
+                time.sleep(0.001)
+                continue
+            slot = free[0]
+            out = frames[slot]
+
+            if pending is not None:
+                frame, captureTime, pending = pending, time.perf_counter(), None
+            else:
+                frame = self.frameSource.takeScreenshot(out=out)
+                captureTime = time.perf_counter()
+            if frame is None:  # source exhausted
+                break
+            if frame is not out:
+                if frame.shape != out.shape:
+                    self.skippedFrames += 1
+                    continue
+                out[...] = frame
+
+            seq += 1
+            with self._cond:
+                if s[_FRAME_SEQ] > s[_CLAIMED_SEQ]:  # previous frame was never claimed
+                    s[_DROPPED] += 1
+                times[slot] = captureTime
+                s[_FRAME_SEQ] = seq
+                s[_FRAME_SLOT] = slot
+                s[_CAPTURED] += 1
+                self._cond.notify_all()
+
+        with self._cond:
+            s[_CAPTURE_DONE] = 1
+            self._cond.notify_all()
+
+    def start(self) -> 'ProcessVisionPipeline':
+        # ring is sized by the first frame
+        frame = self.frameSource.takeScreenshot()
+        if frame is None:
+            raise ValueError("Frame source produced no frames")
+        self._firstFrame = frame.copy() if self.frameSource.reusesBuffer else frame
+        self._allocate(frame.shape)
+
+        specs = {name: shared.spec for name, shared in self._shared.items()}
+        self._processes = [
+            self._ctx.Process(target=_visionWorker, args=(specs, self._cond, self.params, self.method), 
+                              name=f'vision-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for process in self._processes:
+            process.start()
+        self._waitForWorkers()
+
+        self._captureThread = threading.Thread(target=self._captureLoop, name='capture', daemon=True)
+        self._captureThread.start()
+        return self
+
+    def _waitForWorkers(self) -> None:
+        s = self._shared['state'].array
+        with self._cond:
+            while not self._cond.wait_for(lambda: s[_READY] >= self.workers, timeout=0.1):
+                if not all(process.is_alive() for process in self._processes):
+                    self.stop()
+                    raise RuntimeError("Vision worker exited during startup")
+
+    def stop(self, timeout: float=1.0) -> None:
+        if not self._shared:
+            return
+        with self._cond:
+            self._shared['state'].array[_STOP] = 1
+            self._cond.notify_all()
+
+        if self._captureThread is not None:
+            self._captureThread.join(timeout=timeout)
+        for process in self._processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._captureThread = None
+
+        self._finalState = self._shared['state'].array.copy()
+        for shared in self._shared.values():
+            shared.unlink()
+        self._shared = {}
+        self._heldSlot = None
+
+    def _finished(self) -> bool:
+        s = self._shared['state'].array
+        return bool(s[_STOP] or (s[_CAPTURE_DONE] and s[_FRAME_SEQ] <= s[_CLAIMED_SEQ] and s[_BUSY] == 0))
+
+    @property
+    def closed(self) -> bool:
+        '''no detections will come anymore (source exhausted or pipeline stopped) and none is left to take'''
+        if not self._shared:
+            return True
+        with self._cond:
+            return self._finished() and self._shared['state'].array[_DET_SEQ] <= self._lastSeq
+
+    def latest(self, timeout: float | None=None) -> Detection | None:
+        '''newest detection not seen yet, None on timeout or when pipeline stopped'''
+        if not self._shared:
+            return None
+        s = self._shared['state'].array
+        slotReaders = self._shared['readers'].array
+
+        with self._cond:
+            # frame of the previous detection is released on the next call
+            if self._heldSlot is not None:
+                slotReaders[self._heldSlot] -= 1
+                self._heldSlot = None
+
+            ready = self._cond.wait_for(lambda: s[_DET_SEQ] > self._lastSeq or self._finished(), timeout=timeout)
+            if not ready or s[_DET_SEQ] <= self._lastSeq:
+                return None
+
+            record = self._shared['detection'].array[0].copy()
+            s[_DET_TAKEN] = 1  # record's hold on its frame passes to us
+            self._heldSlot = int(record['slot'])
+            self._lastSeq = int(record['seq'])
+
+        frame = self._shared['frames'].array[self._heldSlot]
+        count = int(record['count'])
+        result = VisionResult(
+            np.zeros((0, 0), dtype=np.uint8),
+            [tuple(box) for box in record['bboxes'][:count].tolist()],
+            record['areas'][:count].astype(np.float64),
+            record['centroids'][:count].astype(np.float64),
+            labels=np.zeros((0, 0), dtype=np.int32),
+            region=(0, 0, 0, 0),  # masks are not shipped back
+            frameShape=frame.shape,
+        )
+        return Detection(self._lastSeq, float(record['captureTime']), frame, result)
+
+    def __enter__(self) -> 'ProcessVisionPipeline':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
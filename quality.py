@@ -0,0 +1,132 @@
+import dataclasses
+import numpy as np
+
+from dataclasses import dataclass
+from typing import List
+
+from vision import FrameProcessorCV, ProcessingParams
+from debug import StageTimer
+
+
+@dataclass
+class QualityParams:
+    '''
+    frame budget and bounds of the knobs QualityController may turn
+    level 0 is the configured ProcessingParams, every level below degrades one knob by one step
+    '''
+    frameBudget: float = 0.008  # s, vision time per frame
+    percentile: float = 90.0  # of the frame times in the window, compared against the budget
+    window: int = 16  # frames measured at a level before it is judged
+    upgradeHeadroom: float = 0.8  # step up only if the level above is predicted below this fraction of the budget
+
+    # knob bounds and steps, knobs are degraded in turn: blur, dilation, downscale
+    minBlurSize: int = 5  # px (odd)
+    blurSizeStep: int = 4  # px, keeps size odd
+    minDilationIterations: int = 3
+    dilationStep: int = 2
+    minDownscale: float = 0.25
+    downscaleStep: float = 0.75  # factor
+
+
+def qualityLadder(base: ProcessingParams, params: QualityParams=QualityParams()) -> List[ProcessingParams]:
+    '''-> [base, base with one knob degraded, ...] down to every knob at its bound'''
+    def blurDown(p):
+        size = p.gaussianBlurSize[0]
+        if size <= params.minBlurSize or p.blurEngine == 'none':
+            return None
+        size = max(size - params.blurSizeStep, params.minBlurSize) | 1
+        return dataclasses.replace(p, gaussianBlurSize=(size, size))
+
+    def dilationDown(p):
+        if p.dilationIterations <= params.minDilationIterations:
+            return None
+        return dataclasses.replace(p, dilationIterations=max(p.dilationIterations - params.dilationStep, params.minDilationIterations))
+
+    def downscaleDown(p):
+        if p.downscale <= params.minDownscale:
+            return None
+        return dataclasses.replace(p, downscale=max(p.downscale * params.downscaleStep, params.minDownscale))
+
+    ladder = [base]
+    knobs = [blurDown, dilationDown, downscaleDown]
+    while knobs:
+        for knob in list(knobs):
+            degraded = knob(ladder[-1])
+            if degraded is None:
+                knobs.remove(knob)
+            else:
+                ladder.append(degraded)
+    return ladder
+
+
+class QualityController:
+    '''
+    holds vision time per frame under a budget by moving frameProc.params along a quality ladder
+    - observe() gets the cost of every processed frame, a level is judged once per window frames
+    - over budget (percentile) -> one level down
+    - one level up when the cost of the level above, predicted from the cost ratio measured the last 
+      time the controller stepped between the two, fits into upgradeHeadroom * budget
+    observe() has to run on the thread that calls frameProc (params switch between frames)
+    '''
+
+    def __init__(self, frameProc: FrameProcessorCV, params: QualityParams=QualityParams()) -> None:
+        self.frameProc = frameProc
+        self.params = params
+        self.ladder = qualityLadder(frameProc.params, params)
+        self.level = 0
+
+        self.frameTimes = StageTimer(sz=params.window)
+        self._framesAtLevel = 0
+        # cost(level) / cost(level + 1), measured across a step (nearly the same scene on both sides)
+        self.stepRatios = np.full(len(self.ladder) - 1, np.nan)
+        self._prevCost: float | None = None  # judged cost of the level before the last step
+        self._prevLevel: int | None = None
+        self.cost = 0.0  # s, last judged cost
+        self.changes = 0
+
+    @property
+    def currentParams(self) -> ProcessingParams:
+        return self.ladder[self.level]
+
+    def setLevel(self, level: int) -> None:
+        level = min(max(level, 0), len(self.ladder) - 1)
+        if level != self.level:
+            self._prevCost, self._prevLevel = self.cost, self.level
+            self.level = level
+            self.frameProc.params = self.ladder[level]
+            self.changes += 1
+        self._framesAtLevel = 0
+
+    def observe(self, frameTime: float) -> bool:
+        '''s spent on one frame -> True if quality level changed'''
+        self.frameTimes.add(frameTime)
+        self._framesAtLevel += 1
+        if self._framesAtLevel < self.params.window:
+            return False
+
+        self.cost = cost = float(np.percentile(self.frameTimes.window, self.params.percentile))
+        if self._prevLevel is not None and abs(self._prevLevel - self.level) == 1 and cost > 0:
+            upper = min(self._prevLevel, self.level)
+            self.stepRatios[upper] = (self._prevCost / cost) if upper == self._prevLevel else (cost / self._prevCost)
+            self._prevLevel = None
+
+        budget = self.params.frameBudget
+        if cost > budget and self.level < len(self.ladder) - 1:
+            self.setLevel(self.level + 1)
+            return True
+
+        if self.level > 0:
+            ratio = self.stepRatios[self.level - 1]
+            predicted = cost * (ratio if np.isfinite(ratio) else 1.0)
+            if predicted <= budget * self.params.upgradeHeadroom:
+                self.setLevel(self.level - 1)
+                return True
+
+        self._framesAtLevel = 0
+        return False
+
+    def reset(self) -> None:
+        '''back to full quality'''
+        self.setLevel(0)
+        self.stepRatios[:] = np.nan
+        self._prevLevel = None
@@ -0,0 +1,131 @@
+import numpy as np
+
+from typing import Dict, Iterable, Tuple
+
+# ==== session log file
+# [header 64B][record x N], records are appended, N = (file size - header) / record size
+SESSION_FILE_MAGIC = b'ULYSESSN'
+SESSION_FILE_VERSION = 1
+SESSION_FILE_HEADER = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('recordSize', '<u4'),
+    ('maxBboxes', '<u4'),
+    ('reserved', 'V44'),
+])
+
+
+def sessionRecordDtype(maxBboxes: int=32) -> np.dtype:
+    '''one record per bot tick'''
+    return np.dtype([
+        ('timestamp', '<f8'),  # time.perf_counter() when the tick was logged
+        ('captureTime', '<f8'),  # capture time of the frame the tick worked on
+        ('frameRef', '<i8'),  # index of the frame in a recording of the same run (-1 if unknown)
+        ('count', '<i4'),  # detections in the frame (bboxes keeps the first maxBboxes)
+        ('bboxes', '<i4', (maxBboxes, 4)),
+        ('targetId', '<i8'),  # -1: no target
+        ('target', '<f4', (2,)),  # position the tick aimed at (aimPoint, published measurement with a control thread), nan if not aiming
+        ('pTerm', '<f4', (2,)),  # yaw, pitch
+        ('iTerm', '<f4', (2,)),
+        ('dTerm', '<f4', (2,)),
+        ('mouseDelta', '<i4', (2,)),  # mouse movement emitted since previous tick
+    ])
+
+
+class SessionRecorder:
+    '''
+    appends fixed-width tick records to a session file
+    a tick costs one record fill + a buffered write, the file is readable with loadSession()
+    at any time (partially written trailing record is ignored)
+    '''
+
+    def __init__(self, path: str, maxBboxes: int=32) -> None:
+        self.path = path
+        self.dtype = sessionRecordDtype(maxBboxes)
+        self.maxBboxes = maxBboxes
+        self.count = 0
+
+        header = np.zeros(1, dtype=SESSION_FILE_HEADER)
+        header['magic'] = SESSION_FILE_MAGIC
+        header['version'] = SESSION_FILE_VERSION
+        header['recordSize'] = self.dtype.itemsize
+        header['maxBboxes'] = maxBboxes
+
+        self._file = open(path, 'wb')
+        self._file.write(header.tobytes())
+        self._record = np.zeros(1, dtype=self.dtype)  # reused for every tick
+
+    def append(
+        self,
+        timestamp: float,
+        captureTime: float,
+        frameRef: int,
+        bboxes: Iterable[Tuple[int, int, int, int]],
+        targetId: int | None,
+        target: Tuple[float, float] | None,
+        pTerm: Iterable[float],
+        iTerm: Iterable[float],
+        dTerm: Iterable[float],
+        mouseDelta: Tuple[int, int],
+    ) -> None:
+        record = self._record[0]
+        boxes = np.asarray(bboxes, dtype=np.int32).reshape(-1, 4)
+        stored = min(len(boxes), self.maxBboxes)
+
+        record['timestamp'] = timestamp
+        record['captureTime'] = captureTime
+        record['frameRef'] = frameRef
+        record['count'] = len(boxes)
+        record['bboxes'][:stored] = boxes[:stored]
+        record['bboxes'][stored:] = 0
+        record['targetId'] = -1 if targetId is None else targetId
+        record['target'] = (np.nan, np.nan) if target is None else target
+        record['pTerm'] = pTerm
+        record['iTerm'] = iTerm
+        record['dTerm'] = dTerm
+        record['mouseDelta'] = mouseDelta
+
+        self._file.write(self._record.tobytes())
+        self.count += 1
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> 'SessionRecorder':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def loadSession(path: str) -> np.ndarray:
+    '''-> memory-mapped structured array of all complete records'''
+    header = np.fromfile(path, dtype=SESSION_FILE_HEADER, count=1)
+    if header.size == 0 or header['magic'][0] != SESSION_FILE_MAGIC:
+        raise ValueError(f"'{path}' is not a session file")
+    if header['version'][0] != SESSION_FILE_VERSION:
+        raise ValueError(f"Unsupported session file version {header['version'][0]}")
+
+    dtype = sessionRecordDtype(int(header['maxBboxes'][0]))
+    if dtype.itemsize != header['recordSize'][0]:
+        raise ValueError(f"Record size mismatch: file {header['recordSize'][0]}, expected {dtype.itemsize}")
+
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+    count = (size - SESSION_FILE_HEADER.itemsize) // dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=SESSION_FILE_HEADER.itemsize, shape=(count,))
+
+
+def sessionArrays(path: str) -> Dict[str, np.ndarray]:
+    '''session -> {field: array over ticks}, plus tick dt and per-tick latency (s)'''
+    records = loadSession(path)
+    arrays = {name: np.asarray(records[name]) for name in records.dtype.names}
+    arrays['dt'] = np.diff(arrays['timestamp'], prepend=arrays['timestamp'][:1])
+    arrays['latency'] = arrays['timestamp'] - arrays['captureTime']
+    return arrays
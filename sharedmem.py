@@ -0,0 +1,65 @@
+import numpy as np
+
+from multiprocessing import shared_memory
+from typing import Tuple
+
+# (block name, shape, dtype) - everything a process needs to attach
+SharedArraySpec = Tuple[str, Tuple[int, ...], np.dtype]
+
+
+class SharedArray:
+    '''
+    numpy array in a shared memory block, created once by the owner and attached by name
+    in other processes without copying
+    - owner: SharedArray.create(shape, dtype) / SharedArray.fromArray(array), unlink() when done
+    - others: SharedArray.attach(spec), close() when done
+    '''
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, ...], dtype, owner: bool) -> None:
+        self.shm = shm
+        self.owner = owner
+        self.array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape: Tuple[int, ...], dtype=np.uint8) -> 'SharedArray':
+        size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        return cls(shared_memory.SharedMemory(create=True, size=size), tuple(shape), dtype, owner=True)
+
+    @classmethod
+    def fromArray(cls, array: np.ndarray) -> 'SharedArray':
+        shared = cls.create(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, spec: SharedArraySpec) -> 'SharedArray':
+        name, shape, dtype = spec
+        # pool/child processes share the owner's resource tracker, attaching registers
+        # the same block again, which is a no-op; unlink() of the owner unregisters it
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, tuple(shape), dtype, owner=False)
+
+    @property
+    def spec(self) -> SharedArraySpec:
+        return self.shm.name, self.array.shape, self.array.dtype  # np.dtype keeps structured fields
+
+    def close(self) -> None:
+        self.array = None  # drop the view before closing the mapping
+        try:
+            self.shm.close()
+        except BufferError:  # views handed out are still alive, mapping goes away with them
+            pass
+
+    def unlink(self) -> None:
+        self.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> 'SharedArray':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.owner:
+            self.unlink()
+        else:
+            self.close()
@@ -0,0 +1,240 @@
+import os
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from control import PIDBank, PIDParams
+
+TRAJECTORIES = ('step', 'linear', 'strafe', 'jitter')
+
+
+@dataclass
+class PlantParams:
+    '''mouse/camera plant as seen by the per-frame control loop of AutoAimBot'''
+    fps: float = 60.0  # control steps per second (one per vision frame)
+    measurementDelay: int = 1  # frames between capture and control step (capture + vision)
+    actuationDelay: int = 1  # frames between mouse input and camera movement
+    mouseGain: float = 1.0  # camera px per mouse count
+    duration: float = 2.0  # s
+    settleTolerance: float = 4.0  # px, target counts as settled within this distance
+    # AutoAimBot latencyCompensation: aim at the target extrapolated by the capture -> input latency, 
+    # tracked in the world frame (screen + mouse counts emitted before capture), minus counts emitted since
+    latencyCompensation: bool = True
+    trackHistory: int = 8  # measurements the velocity is fitted to (TrackerParams.historySize)
+    maxPredictionTime: float = 0.15  # s, cap on extrapolation (AutoAimBot.maxPredictionTime)
+
+
+@dataclass
+class TrajectoryParams:
+    initialOffset: Tuple[float, float] = (160.0, -60.0)  # px, target offset from crosshair at t=0
+    speed: float = 250.0  # px/s ('linear', 'strafe' peak speed, 'jitter' rms speed)
+    period: float = 1.2  # s, strafe period
+    seed: int = 0
+
+
+def targetTrajectory(kind: str, steps: int, dt: float, params: TrajectoryParams=TrajectoryParams()) -> np.ndarray:
+    '''-> (steps, 2) target positions in camera px, crosshair starts at (0, 0)'''
+    t = np.arange(steps) * dt
+    start = np.asarray(params.initialOffset, dtype=np.float64)
+
+    if kind == 'step':
+        motion = np.zeros((steps, 2))
+    elif kind == 'linear':
+        direction = np.array((1.0, 0.25)) / np.hypot(1.0, 0.25)
+        motion = t[:, None] * params.speed * direction
+    elif kind == 'strafe':
+        # left-right dodging, peak speed = params.speed
+        omega = 2 * np.pi / params.period
+        motion = np.zeros((steps, 2))
+        motion[:, 0] = params.speed / omega * np.sin(omega * t)
+    elif kind == 'jitter':
+        # random walk in velocity, smoothed so the target cannot teleport
+        rng = np.random.default_rng(params.seed)
+        velocity = np.cumsum(rng.normal(0, params.speed * np.sqrt(dt), size=(steps, 2)), axis=0)
+        velocity *= params.speed / max(np.sqrt((velocity ** 2).sum(axis=1).mean()), 1e-9)
+        motion = np.cumsum(velocity * dt, axis=0)
+    else:
+        raise ValueError(f"Unknown trajectory '{kind}', must be one of {TRAJECTORIES}")
+
+    return start + motion
+
+
+def simulate(bank: PIDBank, target: np.ndarray, plant: PlantParams=PlantParams()) -> np.ndarray:
+    '''
+    closed loop of len(bank) // 2 candidates at once, bank holds (yaw, pitch) controller pairs
+    control law is AutoAimBot.update: PID on crosshair -> target offset (AutoAimBot.aimPoint when 
+    plant.latencyCompensation), moved by whole counts, fractions carried to the next step (Mouse.moveBy)
+    -> (steps, candidates, 2) target - crosshair error after every step
+    '''
+    steps = target.shape[0]
+    n = len(bank) // 2
+    dt = 1.0 / plant.fps
+
+    aim = np.zeros((n, 2))
+    aimHistory = np.zeros((steps, n, 2))
+    # mouse moves in flight, slot k % size lands at step k
+    inFlight = np.zeros((plant.actuationDelay + 1, n, 2))
+    errors = np.empty((steps, n, 2))
+    residual = np.zeros((n, 2))  # sub-count carry of the mouse
+    
+    emitted = np.zeros((n, 2))  # mouse counts emitted so far (MotionLog.total)
+    emittedHistory = np.zeros((steps, n, 2))  # emitted at the start of every step (= at capture)
+    world = np.zeros((steps, n, 2))  # tracked target position of the frame captured at every step
+    horizon = min(plant.measurementDelay * dt, plant.maxPredictionTime)
+
+    for k in range(steps):
+        aim += plant.mouseGain * inFlight[k % inFlight.shape[0]]
+        inFlight[k % inFlight.shape[0]] = 0
+        aimHistory[k] = aim
+        emittedHistory[k] = emitted
+
+        # frame the controller sees was captured measurementDelay frames ago
+        captured = max(k - plant.measurementDelay, 0)
+        offset = target[captured] - aimHistory[captured]
+
+        if plant.latencyCompensation:
+            world[captured] = offset + emittedHistory[captured]
+            # least-squares velocity over the last trackHistory frames (Tracker._fitVelocities)
+            history = world[max(captured - plant.trackHistory + 1, 0):captured + 1]
+            t = np.arange(len(history)) * dt
+            tDev = t - t.mean()
+            den = (tDev ** 2).sum()
+            velocity = (tDev[:, None, None] * (history - history.mean(axis=0))).sum(axis=0) / den if den > 0 else 0.0
+            offset = world[captured] + velocity * horizon - emitted
+
+        command = bank.step(dt, 0, offset.reshape(-1)).reshape(n, 2) + residual
+        move = np.trunc(command)
+        residual = command - move
+        emitted += move
+        inFlight[(k + plant.actuationDelay) % inFlight.shape[0]] += move
+
+        errors[k] = target[k] - aim
+
+    return errors
+
+
+def settleMetrics(errors: np.ndarray, plant: PlantParams=PlantParams()) -> Dict[str, np.ndarray]:
+    '''
+    (steps, candidates, 2) errors -> per candidate
+    - settleTime: s until error stays within settleTolerance (plant.duration if it never does)
+    - settled: 1.0 if error ended up within settleTolerance
+    - overshoot: max travel past the target along initial error direction, fraction of initial error
+    - rmsError: px, over the second half of the run (tracking quality on moving targets)
+    '''
+    steps = errors.shape[0]
+    dt = 1.0 / plant.fps
+    with np.errstate(over='ignore', invalid='ignore'):  # unstable candidates diverge
+        distance = np.hypot(errors[..., 0], errors[..., 1])
+        outside = ~(distance <= plant.settleTolerance)
+
+        # last step outside of tolerance + 1, 0 if always inside
+        lastOutside = np.where(outside.any(axis=0), steps - np.argmax(outside[::-1], axis=0), 0)
+        settled = lastOutside < steps
+        settleTime = np.where(settled, lastOutside * dt, plant.duration)
+
+        initial = errors[0]
+        initialNorm = np.maximum(np.hypot(initial[:, 0], initial[:, 1]), 1e-9)
+        along = (errors * (initial / initialNorm[:, None])).sum(axis=2)
+        overshoot = np.maximum(-np.nan_to_num(along, nan=-np.inf).min(axis=0), 0) / initialNorm
+
+        rmsError = np.sqrt((distance[steps // 2:] ** 2).mean(axis=0))
+
+    return {
+        'settleTime': settleTime, 
+        'settled': settled.astype(np.float64), 
+        'overshoot': overshoot, 
+        'rmsError': np.nan_to_num(rmsError, nan=np.inf),
+    }
+
+
+def evaluateCandidates(
+    coefs: Dict[str, np.ndarray],
+    trajectories: List[str]=list(TRAJECTORIES),
+    plant: PlantParams=PlantParams(),
+    trajectoryParams: TrajectoryParams=TrajectoryParams(),
+    overshootPenalty: float=0.5,
+    maxOvershoot: float=4.0,
+) -> Dict[str, np.ndarray]:
+    '''
+    PIDParams field -> (N,) candidate arrays, simulated on every trajectory
+    -> candidate arrays + mean settleTime, settled, overshoot, rmsError and score (lower is better)
+    score = settleTime + overshootPenalty * overshoot (s per 100% overshoot, capped at maxOvershoot)
+    '''
+    steps = int(round(plant.duration * plant.fps))
+    n = len(np.broadcast_arrays(*coefs.values())[0].ravel()) if coefs else 1
+
+    metrics = {name: np.zeros(n) for name in ('settleTime', 'settled', 'overshoot', 'rmsError')}
+    for kind in trajectories:
+        # every candidate steps a yaw and a pitch controller
+        bank = PIDBank.fromArrays(**{name: np.repeat(np.broadcast_to(values, (n,)), 2) for name, values in coefs.items()})
+        target = targetTrajectory(kind, steps, 1.0 / plant.fps, trajectoryParams)
+        for name, values in settleMetrics(simulate(bank, target, plant), plant).items():
+            metrics[name] += values / len(trajectories)
+
+    result = {name: np.broadcast_to(np.asarray(values, dtype=np.float64), (n,)).copy() for name, values in coefs.items()}
+    result.update(metrics)
+    result['score'] = metrics['settleTime'] + overshootPenalty * np.minimum(metrics['overshoot'], maxOvershoot)
+    return result
+
+
+def _evaluateChunk(args) -> Dict[str, np.ndarray]:
+    return evaluateCandidates(*args)
+
+
+def randomCandidates(count: int, ranges: Dict[str, Tuple[float, float]], seed: int=0) -> Dict[str, np.ndarray]:
+    '''PIDParams field -> (low, high), uniform samples'''
+    rng = np.random.default_rng(seed)
+    return {name: rng.uniform(low, high, size=count) for name, (low, high) in ranges.items()}
+
+
+def gridCandidates(**axes) -> Dict[str, np.ndarray]:
+    '''PIDParams field -> values, full grid'''
+    names = list(axes)
+    grids = np.meshgrid(*(np.asarray(axes[name], dtype=np.float64) for name in names), indexing='ij')
+    return {name: grid.ravel() for name, grid in zip(names, grids)}
+
+
+def tune(
+    candidates: Dict[str, np.ndarray],
+    trajectories: List[str]=list(TRAJECTORIES),
+    plant: PlantParams=PlantParams(),
+    trajectoryParams: TrajectoryParams=TrajectoryParams(),
+    overshootPenalty: float=0.5,
+    workers: int | None=None,
+    chunkSize: int=2048,
+) -> Dict[str, np.ndarray]:
+    '''evaluate candidates across a process pool -> same arrays sorted by score (best first)'''
+    n = len(next(iter(candidates.values())))
+    chunks = [
+        ({name: values[start:start + chunkSize] for name, values in candidates.items()},
+         trajectories, plant, trajectoryParams, overshootPenalty)
+        for start in range(0, n, chunkSize)
+    ]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        results = list(map(_evaluateChunk, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_evaluateChunk, chunks))
+
+    merged = {name: np.concatenate([r[name] for r in results]) for name in results[0]}
+    order = np.argsort(merged['score'], kind='stable')
+    return {name: values[order] for name, values in merged.items()}
+
+
+def toPIDParams(ranked: Dict[str, np.ndarray], idx: int=0) -> PIDParams:
+    return PIDParams(**{name: float(ranked[name][idx]) for name in PIDParams.__dataclass_fields__ if name in ranked})
+
+
+def formatRanking(ranked: Dict[str, np.ndarray], top: int=10) -> str:
+    names = [name for name in PIDParams.__dataclass_fields__ if name in ranked]
+    header = "".join(f"{name:>10}" for name in names) + "".join(f"{h:>10}" for h in ('settle s', 'settled', 'overshoot', 'rms px', 'score'))
+    lines = [header]
+    for i in range(min(top, len(ranked['score']))):
+        lines.append("".join(f"{ranked[name][i]:>10.3f}" for name in names)
+                     + f"{ranked['settleTime'][i]:>10.3f}{ranked['settled'][i]:>10.2f}{ranked['overshoot'][i]:>10.3f}"
+                     + f"{ranked['rmsError'][i]:>10.2f}{ranked['score'][i]:>10.3f}")
+    return "\n".join(lines)
@@ -0,0 +1,227 @@
+import time
+import warnings
+import numpy as np
+
+from typing import Tuple
+
+
+class FrameSource:
+    '''
+    anything that produces BGR frames for the bots
+    - takeScreenshot(out) -> frame, or None when the source is exhausted
+    - `out` is a hint: sources may write into it or return their own array
+    - reusesBuffer: True if returned array may be overwritten by the next call
+    '''
+    reusesBuffer: bool = True
+
+    def takeScreenshot(self, out: np.ndarray | None=None) -> np.ndarray | None:
+        raise NotImplementedError
+
+    def focusCurrentWindow(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'FrameSource':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ==== raw frame file
+# [header 64B][timestamps float64 x capacity][frames uint8 x N x h x w x c], N <= capacity
+# the frames part grows in chunks while recording, only the first header['count'] frames are valid
+FRAME_FILE_MAGIC = b'ULYFRAME'
+FRAME_FILE_VERSION = 1
+FRAME_FILE_HEADER = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('channels', '<u4'),
+    ('capacity', '<u4'),
+    ('count', '<u4'),
+    ('reserved', 'V32'),
+])
+FRAME_FILE_GROW_BYTES = 256 << 20  # frames part of a recording grows by about this much at a time
+
+
+def _frameFileLayout(header) -> Tuple[int, int]:
+    '''-> (timestamps offset, frames offset)'''
+    tsOffset = FRAME_FILE_HEADER.itemsize
+    framesOffset = tsOffset + 8 * int(header['capacity'])
+    return tsOffset, framesOffset
+
+
+def openFrameFile(path: str, mode: str='r') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''-> (header, timestamps, frames) memmaps, only the first header['count'] frames are valid'''
+    header = np.memmap(path, dtype=FRAME_FILE_HEADER, mode=mode, shape=(1,))[0]
+    if header['magic'] != FRAME_FILE_MAGIC:
+        raise ValueError(f"'{path}' is not a frame file")
+    if header['version'] != FRAME_FILE_VERSION:
+        raise ValueError(f"Unsupported frame file version {header['version']}")
+
+    tsOffset, framesOffset = _frameFileLayout(header)
+    capacity = int(header['capacity'])
+    frameShape = (int(header['height']), int(header['width']), int(header['channels']))
+
+    timestamps = np.memmap(path, dtype=np.float64, mode=mode, offset=tsOffset, shape=(capacity,))
+    return header, timestamps, _mapFrames(path, framesOffset, frameShape, mode)
+
+
+def _mapFrames(path: str, framesOffset: int, frameShape: Tuple[int, int, int], mode: str='r') -> np.ndarray:
+    '''memmap of every whole frame the file currently holds'''
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+    allocated = max(size - framesOffset, 0) // int(np.prod(frameShape))
+    if allocated == 0:
+        return np.zeros((0, *frameShape), dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode=mode, offset=framesOffset, shape=(allocated, *frameShape))
+
+
+def createFrameFile(path: str, frameShape: Tuple[int, int, int], capacity: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''frame file for up to `capacity` frames, no frames allocated yet (see growFrameFile) -> (header, timestamps, frames) memmaps'''
+    h, w, c = frameShape
+    header = np.zeros(1, dtype=FRAME_FILE_HEADER)
+    header['magic'] = FRAME_FILE_MAGIC
+    header['version'] = FRAME_FILE_VERSION
+    header['height'], header['width'], header['channels'] = h, w, c
+    header['capacity'] = capacity
+
+    _, framesOffset = _frameFileLayout(header[0])
+    with open(path, 'wb') as f:
+        f.write(header.tobytes())
+        f.truncate(framesOffset)
+
+    return openFrameFile(path, mode='r+')
+
+
+def growFrameFile(path: str, header, frames: int) -> np.ndarray:
+    '''extend the frames part to `frames` frames (capped at capacity) -> new frames memmap'''
+    _, framesOffset = _frameFileLayout(header)
+    frameShape = (int(header['height']), int(header['width']), int(header['channels']))
+    frames = min(frames, int(header['capacity']))
+    with open(path, 'r+b') as f:
+        f.truncate(framesOffset + frames * int(np.prod(frameShape)))
+    return _mapFrames(path, framesOffset, frameShape, mode='r+')
+
+
+class FrameRecorder(FrameSource):
+    '''
+    pass-through source that records frames of another source into a memory-mapped frame file
+    frames are grabbed straight into the mapped file, so recording costs no extra copy
+    the file grows by FRAME_FILE_GROW_BYTES as frames come in, when capacity is reached 
+    recording stops (with a warning) and frames are passed through
+    '''
+
+    def __init__(self, source: FrameSource, path: str, capacity: int=3600) -> None:
+        self.source = source
+        self.path = path
+        self.capacity = capacity
+
+        self.count = 0
+        self._header = None
+        self._timestamps = None
+        self._frames = None
+
+    @property
+    def full(self) -> bool:
+        return self._frames is not None and self.count >= self.capacity
+
+    @property
+    def reusesBuffer(self) -> bool:
+        return self.source.reusesBuffer if self.full else False
+
+    def takeScreenshot(self, out: np.ndarray | None=None) -> np.ndarray | None:
+        if self.full:
+            return self.source.takeScreenshot(out=out)
+
+        if self._frames is None:
+            frame = self.source.takeScreenshot()
+            if frame is None:
+                return None
+            self._header, self._timestamps, self._frames = createFrameFile(self.path, frame.shape, self.capacity)
+            self._grow()
+            slot = self._frames[0]
+            slot[...] = frame
+        else:
+            if self.count >= len(self._frames):
+                self._grow()
+            slot = self._frames[self.count]
+            frame = self.source.takeScreenshot(out=slot)
+            if frame is None:
+                return None
+            if frame is not slot:
+                if frame.shape != slot.shape:
+                    raise ValueError(f"Frame shape changed during recording: {slot.shape} -> {frame.shape}")
+                slot[...] = frame
+
+        self._timestamps[self.count] = time.perf_counter()
+        self.count += 1
+        self._header['count'] = self.count
+        if self.full:
+            warnings.warn(f"Recording '{self.path}' reached its capacity of {self.capacity} frames, "
+                          f"later frames are not recorded", RuntimeWarning, stacklevel=2)
+        return slot
+
+    def _grow(self) -> None:
+        frameBytes = int(np.prod(self._frames.shape[1:]))
+        chunk = max(1, FRAME_FILE_GROW_BYTES // frameBytes)
+        if isinstance(self._frames, np.memmap):
+            self._frames.flush()
+        self._frames = growFrameFile(self.path, self._header, len(self._frames) + chunk)
+
+    def focusCurrentWindow(self) -> None:
+        self.source.focusCurrentWindow()
+
+    def close(self) -> None:
+        if self._frames is not None:
+            self._frames.flush()
+            self._timestamps.flush()
+            self._header.base.flush()
+        self.source.close()
+
+
+class ReplayFrameSource(FrameSource):
+    '''
+    serves frames of a recorded frame file as zero-copy memmap views
+    speed: 1.0 - real time (recorded timestamps), 2.0 - twice as fast, None - as fast as possible
+    '''
+    reusesBuffer = False  # views into the file are never overwritten
+
+    def __init__(self, path: str, speed: float | None=1.0, loop: bool=False) -> None:
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+
+        header, self.timestamps, self.frames = openFrameFile(path)
+        self.count = int(header['count'])
+        if self.count == 0:
+            raise ValueError(f"'{path}' contains no frames")
+
+        self.index = 0
+        self._startTime = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def takeScreenshot(self, out: np.ndarray | None=None) -> np.ndarray | None:
+        if self.index >= self.count:
+            if not self.loop:
+                return None
+            self.index = 0
+            self._startTime = None
+
+        if self.speed is not None:
+            now = time.perf_counter()
+            if self._startTime is None:
+                self._startTime = now
+            dueTime = self._startTime + (self.timestamps[self.index] - self.timestamps[0]) / self.speed
+            if dueTime > now:
+                time.sleep(dueTime - now)
+
+        frame = self.frames[self.index]
+        self.index += 1
+        return frame
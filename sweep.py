@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import itertools
+import dataclasses
+import numpy as np
+import cv2 as cv
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from vision import FrameProcessorCV, ProcessingParams
+from sharedmem import SharedArray, SharedArraySpec
+from bench import latencyStats
+import utils
+
+Bbox = Tuple[int, int, int, int]
+
+# ProcessingParams field -> values, swept as a full grid
+DEFAULT_SWEEP_GRID = {
+    'gaussianBlurSize': [(5, 5), (11, 11), (21, 21)],
+    'morphKernelSize': [(3, 3), (5, 5)],
+    'dilationIterations': [5, 9],
+    'downscale': [1.0, 0.5],
+}
+
+
+# ==== ground truth
+def loadGroundTruth(path: str) -> List[List[Bbox]]:
+    '''json list (one entry per recorded frame) of (x, y, w, h) box lists'''
+    with open(path) as f:
+        return [[tuple(int(v) for v in box) for box in boxes] for boxes in json.load(f)]
+
+
+def saveGroundTruth(path: str, truth: List[List[Bbox]]) -> None:
+    with open(path, 'w') as f:
+        json.dump([[list(box) for box in boxes] for boxes in truth], f)
+
+
+def referenceGroundTruth(frames: np.ndarray, params: ProcessingParams=ProcessingParams()) -> List[List[Bbox]]:
+    '''detections of a reference processor, starting point for labelling (or agreement-only sweeps)'''
+    frameProc = FrameProcessorCV(params=params)
+    return [frameProc(frame).bboxes for frame in frames]
+
+
+# ==== evaluation
+def paramGrid(base: ProcessingParams, grid: Dict[str, List[Any]]) -> List[ProcessingParams]:
+    names = list(grid)
+    return [dataclasses.replace(base, **dict(zip(names, values))) for values in itertools.product(*grid.values())]
+
+
+def evaluateParams(
+    params: ProcessingParams,
+    frames: np.ndarray,
+    truth: List[List[Bbox]],
+    iouThreshold: float=0.5,
+    warmup: int=1,
+) -> Dict[str, float]:
+    '''
+    -> precision, recall, meanIoU vs truth and per-frame cost (ms percentiles, fps)
+    only boxes centred inside params.roi count, on both sides
+    '''
+    frameProc = FrameProcessorCV(params=params)
+    for frame in frames[:warmup]:
+        frameProc(frame)
+
+    def inRoi(boxes):
+        return [box for box in boxes if params.roi.contains(box[0] + box[2] // 2, box[1] + box[3] // 2)]
+
+    tp = fp = fn = 0
+    ious, samples = [], []
+    for frame, truthBoxes in zip(frames, truth):
+        t0 = time.perf_counter()
+        result = frameProc(frame)
+        samples.append(time.perf_counter() - t0)
+
+        match = utils.matchBboxes(inRoi(truthBoxes), inRoi(result.bboxes), iouThreshold)
+        tp, fp, fn = tp + match['tp'], fp + match['fp'], fn + match['fn']
+        ious.extend(match['ious'])
+
+    metrics = {
+        'precision': tp / (tp + fp) if tp + fp else 1.0,
+        'recall': tp / (tp + fn) if tp + fn else 1.0,
+        'meanIoU': float(np.mean(ious)) if ious else 0.0,
+    }
+    metrics.update(latencyStats(samples))
+    return metrics
+
+
+# worker process state: frames attached once per process
+_worker: Dict[str, Any] = {}
+
+
+def _initWorker(framesSpec: SharedArraySpec, truth: List[List[Bbox]]) -> None:
+    cv.setNumThreads(1)  # parallelism comes from the pool
+    _worker['frames'] = SharedArray.attach(framesSpec)
+    _worker['truth'] = truth
+
+
+def _evaluateWorker(args) -> Tuple[int, Dict[str, float]]:
+    idx, params, iouThreshold = args
+    return idx, evaluateParams(params, _worker['frames'].array, _worker['truth'], iouThreshold)
+
+
+def runSweep(
+    frames: np.ndarray,
+    truth: List[List[Bbox]],
+    paramsList: List[ProcessingParams],
+    iouThreshold: float=0.5,
+    workers: int | None=None,
+) -> List[Dict[str, Any]]:
+    '''
+    evaluate every params across a process pool, frames are copied into shared memory once
+    -> one row per params: {'params': ProcessingParams, precision, recall, meanIoU, p50, p95, p99, max, fps}
+    '''
+    if len(truth) < len(frames):
+        raise ValueError(f"Ground truth covers {len(truth)} frames, {len(frames)} given")
+
+    rows: List[Dict[str, Any]] = [{'params': params} for params in paramsList]
+    tasks = [(idx, params, iouThreshold) for idx, params in enumerate(paramsList)]
+
+    with SharedArray.fromArray(np.ascontiguousarray(frames)) as shared:
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count() or 1,
+            initializer=_initWorker,
+            initargs=(shared.spec, truth[:len(frames)]),
+        ) as pool:
+            for idx, metrics in pool.map(_evaluateWorker, tasks):
+                rows[idx].update(metrics)
+
+    return rows
+
+
+def rankRows(rows: List[Dict[str, Any]], minPrecision: float=0.9, minRecall: float=0.9) -> List[Dict[str, Any]]:
+    '''rows meeting the accuracy bar, cheapest (p50) first, then the rest by recall'''
+    def meetsBar(row) -> bool:
+        return row['precision'] >= minPrecision and row['recall'] >= minRecall
+    
+    passing = [row for row in rows if meetsBar(row)]
+    failing = [row for row in rows if not meetsBar(row)]
+    return sorted(passing, key=lambda row: row['p50']) + sorted(failing, key=lambda row: -row['recall'])
+
+
+def formatSweep(rows: List[Dict[str, Any]], grid: Dict[str, List[Any]], minPrecision: float, minRecall: float, top: int=20) -> str:
+    columns = list(grid)
+    header = "".join(f"{name:>20}" for name in columns) + "".join(f"{h:>10}" for h in ('prec', 'recall', 'IoU', 'p50 ms', 'p95 ms', 'ok'))
+    lines = [header]
+    for row in rows[:top]:
+        params = row['params']
+        ok = row['precision'] >= minPrecision and row['recall'] >= minRecall
+        lines.append("".join(f"{str(getattr(params, name)):>20}" for name in columns)
+                     + f"{row['precision']:>10.3f}{row['recall']:>10.3f}{row['meanIoU']:>10.3f}"
+                     + f"{row['p50']:>10.2f}{row['p95']:>10.2f}{'yes' if ok else '':>10}")
+    return "\n".join(lines)
@@ -0,0 +1,61 @@
+import time
+import numpy as np
+
+from aim import AutoAimBot, TRACK_TARGET_KEY
+from bench import syntheticFrame
+from events import MemoryMouseBackend, MemoryKeyboardBackend
+from sources import FrameSource
+
+
+class RepeatSource(FrameSource):
+    '''same synthetic frame `count` times, `interval` s apart'''
+    reusesBuffer = False
+
+    def __init__(self, count: int, interval: float=0.002) -> None:
+        self.frame = syntheticFrame(320, 240, 3)
+        self.count = count
+        self.interval = interval
+
+    def takeScreenshot(self, out=None):
+        if self.count <= 0:
+            return None
+        self.count -= 1
+        time.sleep(self.interval)
+        return self.frame
+
+
+def makeBot(source: FrameSource, **kwargs) -> AutoAimBot:
+    keyboard = MemoryKeyboardBackend()
+    keyboard.press(TRACK_TARGET_KEY)
+    return AutoAimBot(frameSource=source, mouseBackend=MemoryMouseBackend(), keyboardBackend=keyboard, **kwargs)
+
+
+def test_pipelined_dt_is_tick_period():
+    # vision is faster than the main loop: dt must not be the (short) wait for the next detection
+    bot = makeBot(RepeatSource(150), pipelined=True)
+    dts = []
+    update = bot.update
+
+    def slowUpdate(dt, *args):
+        dts.append(dt)
+        time.sleep(0.02)
+        update(dt, *args)
+
+    bot.update = slowUpdate
+    bot.mainLoop()
+    assert len(dts) > 3
+    assert np.median(dts[1:]) >= 0.015
+
+
+def test_search_window_follows_mouse_since_capture():
+    bot = makeBot(RepeatSource(0), tracking=True)
+    bot.motion.add(1.0, 5, 0)
+    bot.cameraOffset = bot.motion.at(1.0)  # frame of the held bbox captured after the first move
+    bot.prevTargetBbox = (100, 80, 10, 10)
+    margin = 32 + 10
+
+    assert bot.searchWindow() == (100 - margin, 80 - margin, 10 + 2 * margin, 10 + 2 * margin)
+
+    # camera turned right/down since capture -> target is further left/up on the next frame
+    bot.motion.add(2.0, 12, -4)
+    assert bot.searchWindow() == (100 - 12 - margin, 80 + 4 - margin, 10 + 2 * margin, 10 + 2 * margin)
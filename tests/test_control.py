@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from control import ControlScheduler, PIDBank, PIDController, PIDParams, MotionLog
+from events import Mouse, MemoryMouseBackend
+
+
+PARAMS = [
+    PIDParams(),
+    PIDParams(kp=1.5, ki=0.8, kd=0.05, intMinLimit=-3, intMaxLimit=3, derMinLimit=-10, derMaxLimit=10),
+]
+
+
+def errorSequence(steps: int=50, seed: int=0):
+    rng = np.random.default_rng(seed)
+    dts = rng.uniform(0.001, 0.02, steps)
+    targets = np.cumsum(rng.normal(0, 20, (steps, len(PARAMS))), axis=0)  # walks into the clamps
+    return dts, targets
+
+
+def test_pid_bank_matches_scalar_controllers():
+    dts, targets = errorSequence()
+    bank = PIDBank(PARAMS)
+    scalars = [PIDController(p) for p in PARAMS]
+
+    for dt, target in zip(dts, targets):
+        out = bank.step(dt, 0, target)
+        expected = [c.step(dt, 0, t) for c, t in zip(scalars, target)]
+        np.testing.assert_allclose(out, expected, rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(bank.iTerm, [c.iTerm for c in scalars], rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(bank.dTerm, [c.dTerm for c in scalars], rtol=1e-12, atol=1e-12)
+
+
+def test_pid_bank_reset_mask():
+    bank = PIDBank(PIDParams(), n=3)
+    bank.step(0.01, 0, [1.0, 2.0, 3.0])
+    bank.reset(np.array([True, False, True]))
+
+    np.testing.assert_array_equal(bank.iTerm[[0, 2]], 0)
+    np.testing.assert_array_equal(bank.prevError[[0, 2]], 0)
+    assert bank.iTerm[1] != 0
+
+    fresh = PIDController(PIDParams())
+    assert bank.step(0.01, 0, [5.0, 0.0, 5.0])[0] == pytest.approx(fresh.step(0.01, 0, 5.0))
+
+
+def test_pid_bank_from_arrays_broadcasts():
+    bank = PIDBank.fromArrays(kp=[1.0, 2.0, 3.0], ki=0.0)
+    assert len(bank) == 3
+    assert bank.params(1) == PIDParams(kp=2.0, ki=0.0)
+
+
+def test_pid_bank_rejects_zero_dt():
+    with pytest.raises(ValueError):
+        PIDBank().step(0, 0, 1.0)
+
+
+def test_motion_log_lookup():
+    log = MotionLog(size=3)
+    np.testing.assert_array_equal(log.at(1.0), (0, 0))  # nothing moved yet
+
+    log.add(1.0, 1, 2)
+    log.add(2.0, 3, 0)
+    np.testing.assert_array_equal(log.at(0.5), (0, 0))
+    np.testing.assert_array_equal(log.at(1.5), (1, 2))
+    np.testing.assert_array_equal(log.at(2.0), (4, 2))
+    np.testing.assert_array_equal(log.total, (4, 2))
+
+    # older than the ring -> movement before its oldest entry
+    log.add(3.0, 1, 1)
+    log.add(4.0, 1, 1)
+    np.testing.assert_array_equal(log.at(0.5), (1, 2))
+    np.testing.assert_array_equal(log.at(4.5), (6, 4))
+
+
+def test_control_scheduler_ticks_by_hand():
+    # P-only, power of 2 steps: every move below is exact
+    backend = MemoryMouseBackend()
+    mouse = Mouse(backend=backend)
+    scheduler = ControlScheduler(PIDBank(PIDParams(kp=2.0, ki=0.0, kd=0.0), n=2), mouse)
+
+    scheduler.publish((10, 3), (0, 0), captureTime=0.0)
+    scheduler.tick(0.0, 0.25)  # first update only starts the mouse clock
+    scheduler.tick(0.25, 0.25)  # velocity (20, 6) for 0.25 s
+    scheduler.tick(0.5, 0.25)  # error minus what moved since capture: (5, 2) -> velocity (10, 4)
+    np.testing.assert_array_equal(scheduler.moved, (7, 2))
+    assert backend.position.tolist() == [7, 2]
+    assert mouse._residual == (0.5, 0.5)
+
+    # no target: stops, resets the controllers and the sub-pixel carry on the next tick
+    scheduler.clear()
+    scheduler.tick(0.75, 0.25)
+    assert mouse.movementVelocity == (0.0, 0.0)
+    assert mouse._residual == (0.0, 0.0)
+    np.testing.assert_array_equal(scheduler.controller.prevError, (0, 0))
+
+    # new target: movement before its capture is not subtracted, old carry does not leak in
+    scheduler.publish((-4, 0), (0, 0), captureTime=0.75)
+    scheduler.tick(1.0, 0.25)
+    np.testing.assert_array_equal(scheduler.moved, (5, 2))
+    assert scheduler.motion.at(0.5).tolist() == [7, 2]
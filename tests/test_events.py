@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from events import KeyboardInputHandler, MemoryKeyboardBackend, Mouse, MemoryMouseBackend, Win32KeyboardBackend
+
+
+def test_fractional_moves_add_up():
+    backend = MemoryMouseBackend()
+    mouse = Mouse(backend=backend)
+
+    emitted = [mouse.moveBy(0.25, -0.25) for _ in range(12)]
+    assert backend.position.tolist() == [3, -3]
+    assert sum(dx for dx, _ in emitted) == 3
+    assert emitted[0] == (0, 0)  # nothing sent until a whole count accumulated
+    assert len(backend.moves) == 3
+
+
+def test_residual_keeps_sign_and_is_cleared():
+    mouse = Mouse(backend=MemoryMouseBackend())
+    assert mouse.moveBy(1.75, -1.75) == (1, -1)
+    assert mouse._residual == pytest.approx((0.75, -0.75))
+    assert mouse.moveBy(-0.5, 0.5) == (0, 0)
+    assert mouse._residual == pytest.approx((0.25, -0.25))
+
+    mouse.clearResidual()
+    assert mouse.moveBy(0.9, -0.9) == (0, 0)
+
+
+def test_random_moves_lose_less_than_one_count():
+    rng = np.random.default_rng(0)
+    backend = MemoryMouseBackend()
+    mouse = Mouse(backend=backend)
+
+    moves = rng.normal(0, 2, (500, 2))
+    for dx, dy in moves:
+        mouse.moveBy(dx, dy)
+    assert np.all(np.abs(moves.sum(axis=0) - backend.position) < 1)
+
+
+def test_batch_merges_moves_into_one_send():
+    backend = MemoryMouseBackend()
+    mouse = Mouse(backend=backend)
+    with mouse.batch():
+        mouse.moveBy(2, 0)
+        mouse.moveBy(3, 1)
+        mouse.click('left')
+    assert len(backend.batches) == 1
+    assert backend.batches[0] == [
+        (Mouse.MOUSEEVENTF_MOVE, 5, 1),
+        (Mouse.MOUSEEVENTF_LEFTDOWN, 0, 0),
+        (Mouse.MOUSEEVENTF_LEFTUP, 0, 0),
+    ]
+
+
+# ==== keyboard
+
+def test_poll_takes_one_snapshot_per_tick():
+    backend = MemoryKeyboardBackend()
+    keyboard = KeyboardInputHandler(backend=backend)
+
+    backend.press('W', 0xA0)  # named key + unnamed left shift
+    assert keyboard.poll() == {'W'}
+    assert keyboard._currentStateHex == {0x57, 0xA0}
+
+    # keys change after the poll: derived sets keep describing the snapshot until the next poll
+    backend.release('W')
+    backend.press('SPACE')
+    assert keyboard.pressedKeys == {'W'}
+    assert keyboard.poll() == {'SPACE'}
+    assert keyboard.pressedKeys == {'SPACE'}
+
+
+def test_pressed_and_released_since_update():
+    backend = MemoryKeyboardBackend()
+    keyboard = KeyboardInputHandler(backend=backend)
+
+    backend.press('A', 'B')
+    keyboard.poll()
+    keyboard.updateKeyboard()
+    assert keyboard.prevState == {'A', 'B'}
+    assert keyboard.pressedKeys == set()
+
+    backend.release('A')
+    backend.press('C', 0xA0)
+    keyboard.poll()
+    assert keyboard.pressedKeys == {'C'}
+    assert keyboard.releasedKeys == {'A'}
+    assert keyboard.pressedKeysHex == {ord('C'), 0xA0}
+    assert keyboard.releasedKeysHex == {ord('A')}
+
+
+def test_derived_sets_are_cached_per_snapshot():
+    keyboard = KeyboardInputHandler(backend=MemoryKeyboardBackend())
+    keyboard.poll()
+    assert keyboard.pressedKeys is keyboard.pressedKeys
+    first = keyboard.pressedKeys
+    keyboard.poll()
+    assert keyboard.pressedKeys is not first
+
+
+def test_win32_backend_scans_full_range_by_default():
+    assert Win32KeyboardBackend().codes == list(range(0x08, 0xFE))
+    assert Win32KeyboardBackend(codes=[0x57, 0x41]).codes == [0x41, 0x57]
@@ -0,0 +1,143 @@
+import threading
+import time
+import numpy as np
+
+from bench import syntheticFrame
+from pipeline import LatestValueSlot, ProcessVisionPipeline, VisionPipeline
+from sources import FrameSource
+from vision import FrameProcessorCV, ProcessingParams, VisionResult
+
+
+def test_latest_value_wins():
+    slot = LatestValueSlot()
+    slot.put('a')
+    slot.put('b')
+    assert slot.dropped == 1
+    assert slot.get(0) == (2, 'b')
+    assert slot.taken == 'b'
+    assert slot.pendingValue is None
+
+
+def test_get_times_out_without_newer_value():
+    slot = LatestValueSlot()
+    seq = slot.put('a')
+    seq, _ = slot.get(0)
+
+    t0 = time.perf_counter()
+    assert slot.get(seq, timeout=0.05) == (seq, None)
+    assert time.perf_counter() - t0 >= 0.04
+    assert not slot.closed
+
+
+def test_get_wakes_on_put_from_other_thread():
+    slot = LatestValueSlot()
+    timer = threading.Timer(0.02, slot.put, args=('a',))
+    timer.start()
+    assert slot.get(0, timeout=1.0) == (1, 'a')
+    timer.join()
+
+
+def test_close_wakes_waiter_and_keeps_pending_value():
+    slot = LatestValueSlot()
+    timer = threading.Timer(0.02, slot.close)
+    timer.start()
+    assert slot.get(0, timeout=1.0) == (0, None)
+    timer.join()
+    assert slot.closed
+
+    # value put before close is still handed out
+    slot = LatestValueSlot()
+    slot.put('a')
+    slot.close()
+    assert slot.get(0) == (1, 'a')
+    assert slot.get(1) == (1, None)
+
+
+class CountingSource(FrameSource):
+    '''`count` frames, the first one after `stall` s'''
+    reusesBuffer = False
+
+    def __init__(self, count: int, stall: float=0.0) -> None:
+        self.count = count
+        self.stall = stall
+        self.taken = 0
+
+    def takeScreenshot(self, out=None):
+        if self.taken == 0 and self.stall:
+            time.sleep(self.stall)
+        if self.taken >= self.count:
+            return None
+        self.taken += 1
+        return np.zeros((8, 8, 3), dtype=np.uint8)
+
+
+def emptyVision(frame):
+    return VisionResult(frame[..., 0], [], np.empty(0), np.empty((0, 2)))
+
+
+def test_pipeline_timeout_is_not_closed():
+    with VisionPipeline(CountingSource(2, stall=0.3), emptyVision) as pipeline:
+        assert pipeline.latest(timeout=0.05) is None
+        assert not pipeline.closed
+
+        seqs = []
+        while not pipeline.closed:
+            detection = pipeline.latest(timeout=1.0)
+            if detection is not None:
+                seqs.append(detection.seq)
+        assert seqs and seqs[-1] == 2
+
+
+class ReplaySource(FrameSource):
+    '''paced replay of `count` distinct frames, written into the ring slot it is handed'''
+    reusesBuffer = True
+
+    def __init__(self, count: int, interval: float=0.01) -> None:
+        self.frames = [syntheticFrame(320, 240, 8, seed=seed) for seed in range(count)]
+        self.interval = interval
+        self.taken = 0
+
+    def takeScreenshot(self, out=None):
+        if self.taken >= len(self.frames):
+            return None
+        time.sleep(self.interval)
+        frame = self.frames[self.taken]
+        self.taken += 1
+        if out is None:
+            return frame
+        out[...] = frame
+        return out
+
+
+def test_process_pipeline_keeps_held_frames():
+    params = ProcessingParams()
+    source = ReplaySource(30)
+    frameProc = FrameProcessorCV(params)
+
+    mismatches, seqs = 0, []
+    with ProcessVisionPipeline(source, params, workers=2) as pipeline:
+        while not pipeline.closed:
+            detection = pipeline.latest(timeout=1.0)
+            if detection is None:
+                continue
+            seqs.append(detection.seq)
+            time.sleep(0.02)  # capture keeps writing the ring meanwhile
+            expected = sorted(map(tuple, frameProc(detection.frame).bboxes))
+            mismatches += expected != sorted(detection.result.bboxes)
+        processed = pipeline.processed
+
+    assert mismatches == 0
+    assert seqs == sorted(seqs) and seqs[-1] == 30
+    assert processed >= 20  # workers were up before capture started, few frames dropped
+
+
+def test_process_pipeline_short_source():
+    # source finishes immediately: it must not run dry before the workers exist
+    params = ProcessingParams()
+    with ProcessVisionPipeline(ReplaySource(3, interval=0.0), params, workers=2) as pipeline:
+        seqs = []
+        while not pipeline.closed:
+            detection = pipeline.latest(timeout=1.0)
+            if detection is not None:
+                seqs.append(detection.seq)
+    assert seqs and seqs[-1] == 3
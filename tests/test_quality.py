@@ -0,0 +1,65 @@
+import pytest
+
+from quality import QualityController, QualityParams
+from vision import FrameProcessorCV, ProcessingParams
+
+
+def controller(**kwargs) -> QualityController:
+    params = QualityParams(**{'frameBudget': 0.008, 'window': 4, **kwargs})
+    return QualityController(FrameProcessorCV(ProcessingParams()), params)
+
+
+def feed(quality: QualityController, frameTime: float, frames: int) -> list:
+    return [quality.observe(frameTime) for _ in range(frames)]
+
+
+def test_level_is_judged_on_window_percentile():
+    quality = controller(window=8, percentile=50.0)
+
+    # one slow frame in the window does not move the median
+    assert feed(quality, 0.004, 7) == [False] * 7
+    assert quality.observe(0.1) is False
+    assert quality.cost == pytest.approx(0.004)
+    assert quality.level == 0
+
+    # most of the next window over budget -> judged only on its last frame
+    assert feed(quality, 0.012, 8) == [False] * 7 + [True]
+    assert quality.level == 1
+
+
+def test_downgrade_then_predicted_upgrade():
+    quality = controller()
+    ladder = quality.ladder
+    assert len(ladder) > 2
+
+    # over budget -> one level down, frameProc switches params
+    assert feed(quality, 0.010, 4)[-1] is True
+    assert quality.level == 1
+    assert quality.frameProc.params is ladder[1]
+
+    # level 1 costs half: step ratio 2 is measured, level 0 predicted at 0.010 > 0.8 * budget
+    assert feed(quality, 0.005, 4) == [False] * 4
+    assert quality.stepRatios[0] == pytest.approx(2.0)
+    assert quality.level == 1
+
+    # scene got cheaper: level 0 predicted at 0.006 fits the headroom -> up
+    assert feed(quality, 0.003, 4)[-1] is True
+    assert quality.level == 0
+    assert quality.frameProc.params is ladder[0]
+
+    # the step up measures the ratio again
+    feed(quality, 0.009, 4)
+    assert quality.stepRatios[0] == pytest.approx(3.0)
+    assert quality.changes == 3
+    assert quality.level == 1
+
+
+def test_unmeasured_step_upgrades_on_current_cost():
+    quality = controller()
+    quality.setLevel(2)
+    assert feed(quality, 0.001, 4)[-1] is True  # no ratio for 1/2 yet, assumed 1
+    assert quality.level == 1
+
+    quality.reset()
+    assert quality.level == 0
+    assert quality.frameProc.params is quality.ladder[0]
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from session import SESSION_FILE_HEADER, SessionRecorder, loadSession, sessionArrays
+
+
+def writeSession(path, count: int, maxBboxes: int=4) -> SessionRecorder:
+    recorder = SessionRecorder(str(path), maxBboxes=maxBboxes)
+    for i in range(count):
+        aiming = i % 2 == 0
+        recorder.append(
+            timestamp=1.0 + 0.01 * i,
+            captureTime=1.0 + 0.01 * i - 0.004,
+            frameRef=i,
+            bboxes=[(i, i, 10, 10)] * (i + 1),  # more than maxBboxes from i = 4 on
+            targetId=i if aiming else None,
+            target=(i, -i) if aiming else None,
+            pTerm=(i, 0), iTerm=(0, i), dTerm=(1, 1),
+            mouseDelta=(i, -i),
+        )
+    return recorder
+
+
+def test_session_round_trip(tmp_path):
+    path = tmp_path / 'session.bin'
+    with writeSession(path, 6):
+        pass
+
+    header = np.fromfile(path, dtype=SESSION_FILE_HEADER, count=1)[0]
+    assert header['magic'] == b'ULYSESSN'
+    assert header['maxBboxes'] == 4
+
+    records = loadSession(str(path))
+    assert isinstance(records, np.memmap)
+    assert len(records) == 6
+    assert records['frameRef'].tolist() == list(range(6))
+    assert records['count'].tolist() == [1, 2, 3, 4, 5, 6]  # detections, not stored boxes
+    assert records['bboxes'][1].tolist() == [[1, 1, 10, 10]] * 2 + [[0, 0, 0, 0]] * 2
+    assert records['bboxes'][5].tolist() == [[5, 5, 10, 10]] * 4
+    assert records['targetId'].tolist() == [0, -1, 2, -1, 4, -1]
+    assert records['target'][2].tolist() == [2, -2]
+    assert np.isnan(records['target'][1]).all()
+    assert records['mouseDelta'][3].tolist() == [3, -3]
+
+
+def test_session_arrays(tmp_path):
+    path = tmp_path / 'session.bin'
+    with writeSession(path, 5):
+        pass
+
+    arrays = sessionArrays(str(path))
+    assert not isinstance(arrays['timestamp'], np.memmap)
+    np.testing.assert_allclose(arrays['dt'], [0, 0.01, 0.01, 0.01, 0.01])
+    np.testing.assert_allclose(arrays['latency'], 0.004)
+    assert arrays['pTerm'][:, 0].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_session_readable_while_recording(tmp_path):
+    path = tmp_path / 'session.bin'
+    recorder = writeSession(path, 3)
+    recorder.flush()
+    assert len(loadSession(str(path))) == 3
+
+    # a partially written trailing record is ignored
+    recorder._file.write(b'\0' * 10)
+    recorder.flush()
+    assert len(loadSession(str(path))) == 3
+    recorder.close()
+
+
+def test_empty_and_foreign_files(tmp_path):
+    path = tmp_path / 'session.bin'
+    SessionRecorder(str(path)).close()
+    assert len(loadSession(str(path))) == 0
+
+    other = tmp_path / 'other.bin'
+    other.write_bytes(b'\0' * 128)
+    with pytest.raises(ValueError):
+        loadSession(str(other))
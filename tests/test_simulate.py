@@ -0,0 +1,35 @@
+import numpy as np
+
+from control import PIDBank, PIDParams
+from simulate import PlantParams, settleMetrics, simulate, targetTrajectory
+
+
+def run(plant: PlantParams, kind: str, params: PIDParams) -> dict:
+    steps = int(round(plant.duration * plant.fps))
+    target = targetTrajectory(kind, steps, 1.0 / plant.fps)
+    errors = simulate(PIDBank(params, n=2), target, plant)
+    return {name: float(values[0]) for name, values in settleMetrics(errors, plant).items()}
+
+
+def test_compensated_law_tracks_moving_target_closer():
+    params = PIDParams(kp=0.8, ki=0.5, kd=0.0)
+    compensated = run(PlantParams(latencyCompensation=True), 'linear', params)
+    plain = run(PlantParams(latencyCompensation=False), 'linear', params)
+    assert compensated['rmsError'] < plain['rmsError']
+
+
+def test_compensated_law_settles_on_static_target():
+    metrics = run(PlantParams(latencyCompensation=True), 'step', PIDParams(kp=0.8, ki=0.0, kd=0.0))
+    assert metrics['settled'] == 1.0
+    assert metrics['settleTime'] < 0.5
+
+
+def test_compensation_without_delay_matches_plain_law():
+    # nothing in flight and frames are fresh: the compensated offset is the measured one
+    plant = dict(measurementDelay=0, actuationDelay=0)
+    steps = 60
+    target = targetTrajectory('step', steps, 1 / 60)
+    params = PIDParams(kp=0.6, ki=0.2, kd=0.01)
+    a = simulate(PIDBank(params, n=2), target, PlantParams(latencyCompensation=True, **plant))
+    b = simulate(PIDBank(params, n=2), target, PlantParams(latencyCompensation=False, **plant))
+    np.testing.assert_allclose(a, b)
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+import pytest
+
+import sources
+from sources import FrameRecorder, FrameSource, ReplayFrameSource, openFrameFile
+
+
+class CountingSource(FrameSource):
+    '''frame i is filled with i, `count` frames'''
+    reusesBuffer = False
+
+    def __init__(self, count: int, shape=(4, 6, 3)) -> None:
+        self.count = count
+        self.shape = shape
+        self.taken = 0
+
+    def takeScreenshot(self, out=None):
+        if self.taken >= self.count:
+            return None
+        self.taken += 1
+        return np.full(self.shape, self.taken - 1, dtype=np.uint8)
+
+
+def test_recording_grows_in_chunks_and_replays(tmp_path, monkeypatch):
+    frameBytes = 4 * 6 * 3
+    monkeypatch.setattr(sources, 'FRAME_FILE_GROW_BYTES', 4 * frameBytes)  # 4 frames per chunk
+    path = str(tmp_path / 'rec.frames')
+
+    recorder = FrameRecorder(CountingSource(10), path, capacity=100)
+    for _ in range(5):
+        recorder.takeScreenshot()
+    _, _, frames = openFrameFile(path)
+    assert len(frames) == 8  # two chunks, not the whole capacity
+    while recorder.takeScreenshot() is not None:
+        pass
+    recorder.close()
+
+    replay = ReplayFrameSource(path, speed=None)
+    assert len(replay) == 10
+    for i in range(10):
+        np.testing.assert_array_equal(replay.takeScreenshot(), i)
+    assert replay.takeScreenshot() is None
+    assert os.path.getsize(path) < 100 * frameBytes
+
+
+def test_recording_warns_when_full(tmp_path):
+    path = str(tmp_path / 'rec.frames')
+    recorder = FrameRecorder(CountingSource(5), path, capacity=3)
+    recorder.takeScreenshot()
+    recorder.takeScreenshot()
+    with pytest.warns(RuntimeWarning, match='capacity of 3 frames'):
+        recorder.takeScreenshot()
+
+    # frames are still passed through, only the first 3 are in the file
+    np.testing.assert_array_equal(recorder.takeScreenshot(), 3)
+    recorder.close()
+    assert len(ReplayFrameSource(path, speed=None)) == 3
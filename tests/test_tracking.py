@@ -0,0 +1,59 @@
+import numpy as np
+
+from tracking import Tracker, TrackerParams
+
+
+def box(cx, cy, size=10):
+    return (int(cx) - size // 2, int(cy) - size // 2, size, size)
+
+
+def test_ids_follow_targets_across_frames():
+    tracker = Tracker()
+    centers = np.array([[100.0, 100.0], [300.0, 120.0]])
+    ids = tracker.update(centers, [box(*c) for c in centers], 0.0)
+    assert ids.tolist() == [0, 1]
+
+    # detections come in a different order and moved a little
+    moved = centers[::-1] + (5, -3)
+    ids = tracker.update(moved, [box(*c) for c in moved], 0.01)
+    assert ids.tolist() == [1, 0]
+
+
+def test_far_detection_starts_new_track():
+    tracker = Tracker(TrackerParams(maxMatchDistance=50))
+    tracker.update([[100, 100]], [box(100, 100)], 0.0)
+    ids = tracker.update([[200, 100]], [box(200, 100)], 0.01)
+    assert ids.tolist() == [1]
+    assert tracker.activeIds == [0, 1]  # track 0 coasts
+
+
+def test_velocity_and_prediction():
+    tracker = Tracker()
+    velocity = np.array([200.0, -50.0])  # px/s
+    for i in range(6):
+        t = i * 0.01
+        center = np.array([100.0, 200.0]) + velocity * t
+        trackId, = tracker.update([center], [box(*center)], t)
+
+    assert trackId == 0
+    np.testing.assert_allclose(tracker.velocity(trackId), velocity)
+    np.testing.assert_allclose(tracker.position(trackId, 0.1), np.array([100.0, 200.0]) + velocity * 0.1)
+    x, y, w, h = tracker.bbox(trackId, 0.1)
+    assert (x + w // 2, y + h // 2) == (120, 195)
+
+
+def test_track_dropped_after_missed_frames():
+    tracker = Tracker(TrackerParams(maxMissedFrames=2))
+    trackId, = tracker.update([[100, 100]], [box(100, 100)], 0.0)
+    for i in range(2):
+        tracker.update(np.empty((0, 2)), [], 0.01 * (i + 1))
+        assert trackId in tracker
+    tracker.update(np.empty((0, 2)), [], 0.03)
+    assert trackId not in tracker
+
+
+def test_table_full_returns_minus_one():
+    tracker = Tracker(TrackerParams(maxTracks=2))
+    centers = [[0, 0], [200, 0], [400, 0]]
+    ids = tracker.update(centers, [box(*c) for c in centers], 0.0)
+    assert ids.tolist() == [0, 1, -1]
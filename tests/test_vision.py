@@ -0,0 +1,66 @@
+import cv2 as cv
+import numpy as np
+import pytest
+
+from bench import syntheticFrame, detectionAgreement
+from vision import BLUR_ENGINES, FrameProcessorCV, ProcessingParams
+
+
+FRAMES = [syntheticFrame(640, 480, 20, seed=seed) for seed in range(3)]
+
+
+def baselineBboxes(frame, params: ProcessingParams):
+    '''whole-frame pipeline as it was before plans/ROI crop/engines: blur, hsv, open, close, dilate, clear outside ROI'''
+    blur = cv.GaussianBlur(frame, params.gaussianBlurSize, 0)
+    mask = cv.inRange(cv.cvtColor(blur, cv.COLOR_BGR2HSV), params.hsvMin, params.hsvMax)
+    kernel = cv.getStructuringElement(params.morphKernelShape, params.morphKernelSize)
+    mask = cv.morphologyEx(mask, cv.MORPH_OPEN, kernel)
+    mask = cv.morphologyEx(mask, cv.MORPH_CLOSE, kernel)
+    mask = cv.morphologyEx(mask, cv.MORPH_DILATE, kernel, iterations=params.dilationIterations)
+
+    x_min, y_min, x_max, y_max = params.roi.clip(frame.shape)
+    cleared = np.zeros_like(mask)
+    cleared[y_min:y_max, x_min:x_max] = mask[y_min:y_max, x_min:x_max]
+
+    _, _, stats, _ = cv.connectedComponentsWithStats(cleared)
+    return sorted((x, y, w - 1, h - 1) for x, y, w, h in stats[1:, :4].tolist())  # legacy (x_max - x_min)
+
+
+@pytest.mark.parametrize('thresholdEngine', ['hsv', 'lut'])
+@pytest.mark.parametrize('bboxEngine', ['stats', 'contours', 'labels'])
+def test_full_scale_engines_match_baseline(bboxEngine, thresholdEngine):
+    params = ProcessingParams(bboxEngine=bboxEngine, thresholdEngine=thresholdEngine)
+    frameProc = FrameProcessorCV(params)
+    for frame in FRAMES:
+        expected = baselineBboxes(frame, params)
+        assert expected
+        assert sorted(map(tuple, frameProc(frame).bboxes)) == expected
+
+
+@pytest.mark.parametrize('blurEngine', [engine for engine in BLUR_ENGINES if engine != 'gaussian'])
+def test_blur_engines_agree_with_gaussian(blurEngine):
+    reference = FrameProcessorCV(ProcessingParams())
+    agreement = detectionAgreement(reference, FrameProcessorCV(ProcessingParams(blurEngine=blurEngine)), FRAMES)
+    assert agreement['precision'] >= 0.9
+    assert agreement['recall'] >= 0.9
+    assert agreement['meanIoU'] >= 0.8
+
+
+def test_downscaled_processing_agrees_with_full_scale():
+    reference = FrameProcessorCV(ProcessingParams())
+    agreement = detectionAgreement(reference, FrameProcessorCV(ProcessingParams(downscale=0.5)), FRAMES)
+    assert agreement['recall'] >= 0.9
+    assert agreement['meanIoU'] >= 0.8
+
+
+def test_search_window_keeps_boxes_inside():
+    frameProc = FrameProcessorCV(ProcessingParams())
+    frame = FRAMES[0]
+    full = sorted(map(tuple, frameProc(frame).bboxes))
+    window = (200, 100, 300, 250)
+    wx, wy, ww, wh = window
+
+    inside = [b for b in full if wx < b[0] and wy < b[1] and b[0] + b[2] < wx + ww - 1 and b[1] + b[3] < wy + wh - 1]
+    windowed = sorted(map(tuple, frameProc(frame, window=window).bboxes))
+    assert set(inside) <= set(windowed)
+    assert all(wx <= x and wy <= y and x + w < wx + ww and y + h < wy + wh for x, y, w, h in windowed)
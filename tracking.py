@@ -0,0 +1,169 @@
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple
+
+
+@dataclass
+class TrackerParams:
+    maxTracks: int = 32
+    historySize: int = 8  # positions per track the velocity is fitted to
+    maxMatchDistance: float = 80.0  # px, farther detections start a new track
+    maxMissedFrames: int = 3  # frames a track coasts on its prediction before it is dropped
+
+
+class Tracker:
+    '''
+    multi-target tracker with constant-velocity prediction
+    - all state lives in fixed-size arrays indexed by slot, slot is free when ids[slot] == -1
+    - update() associates detections to predicted track positions (nearest first, gated)
+    - velocity is the least-squares slope of the track's (t, x, y) history ring
+    - tracks without a detection coast on their prediction for up to maxMissedFrames updates
+    '''
+
+    def __init__(self, params: TrackerParams=TrackerParams()) -> None:
+        self.params = params
+        n, historySize = params.maxTracks, params.historySize
+
+        self.ids = np.full(n, -1, dtype=np.int64)
+        self.positions = np.zeros((n, 2))  # last detected centre
+        self.bboxes = np.zeros((n, 4), dtype=np.int64)  # last detected bbox
+        self.velocities = np.zeros((n, 2))  # px/s
+        self.lastTimes = np.zeros(n)  # time of last detection
+        self.missed = np.zeros(n, dtype=np.int64)  # updates since last detection
+        self.hits = np.zeros(n, dtype=np.int64)  # detections so far, history write index is hits % historySize
+        self.history = np.zeros((n, historySize, 3))  # ring of (t, x, y)
+
+        self.time = None  # time of last update
+        self.frameInterval = 0.0  # time between last two updates
+        self._nextId = 0
+
+    # ==== lookups by track id
+    def slotOf(self, trackId: int | None) -> int | None:
+        if trackId is None or trackId < 0:
+            return None
+        slots = np.flatnonzero(self.ids == trackId)
+        return int(slots[0]) if slots.size else None
+
+    def __contains__(self, trackId: int | None) -> bool:
+        return self.slotOf(trackId) is not None
+
+    @property
+    def activeIds(self) -> List[int]:
+        return self.ids[self.ids >= 0].tolist()
+
+    def position(self, trackId: int, t: float | None=None) -> np.ndarray | None:
+        '''-> predicted (x, y) at time t (default: time of last update)'''
+        slot = self.slotOf(trackId)
+        if slot is None:
+            return None
+        return self._predict(np.array([slot]), self.time if t is None else t)[0]
+
+    def bbox(self, trackId: int, t: float | None=None) -> Tuple[int, int, int, int] | None:
+        '''-> last detected bbox moved to the predicted position'''
+        slot = self.slotOf(trackId)
+        if slot is None:
+            return None
+        shift = np.rint(self.position(trackId, t) - self.positions[slot]).astype(np.int64)
+        x, y, w, h = self.bboxes[slot].tolist()
+        return x + int(shift[0]), y + int(shift[1]), w, h
+
+    def velocity(self, trackId: int) -> np.ndarray | None:
+        '''-> (vx, vy) px/s'''
+        slot = self.slotOf(trackId)
+        return None if slot is None else self.velocities[slot].copy()
+
+    # ====
+    def _predict(self, slots: np.ndarray, t: float) -> np.ndarray:
+        return self.positions[slots] + self.velocities[slots] * (t - self.lastTimes[slots])[:, None]
+
+    def _associate(self, distances: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        '''(tracks, detections) distance matrix -> (track idx, detection idx), nearest pairs first'''
+        order = np.argsort(distances, axis=None)
+        order = order[distances.flat[order] <= self.params.maxMatchDistance]
+
+        trackUsed = np.zeros(distances.shape[0], dtype=bool)
+        detUsed = np.zeros(distances.shape[1], dtype=bool)
+        trackIdx, detIdx = [], []
+        for i, j in zip(*np.unravel_index(order, distances.shape)):
+            if trackUsed[i] or detUsed[j]:
+                continue
+            trackUsed[i] = detUsed[j] = True
+            trackIdx.append(i)
+            detIdx.append(j)
+
+        return np.array(trackIdx, dtype=np.int64), np.array(detIdx, dtype=np.int64)
+
+    def _fitVelocities(self, slots: np.ndarray) -> np.ndarray:
+        '''least-squares slope of x(t), y(t) over the valid part of each history ring'''
+        historySize = self.params.historySize
+        history = self.history[slots]
+        weights = (np.arange(historySize)[None] < np.minimum(self.hits[slots], historySize)[:, None]).astype(np.float64)
+        count = weights.sum(axis=1, keepdims=True)
+
+        t = history[..., 0]
+        tMean = (weights * t).sum(axis=1, keepdims=True) / count
+        tDev = (t - tMean) * weights
+        posMean = (weights[..., None] * history[..., 1:]).sum(axis=1) / count
+
+        num = (tDev[..., None] * (history[..., 1:] - posMean[:, None])).sum(axis=1)
+        den = (tDev * tDev).sum(axis=1)[:, None]
+        return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+    def _record(self, slots: np.ndarray, centers: np.ndarray, bboxes: np.ndarray, t: float) -> None:
+        writeIdx = self.hits[slots] % self.params.historySize
+        self.history[slots, writeIdx, 0] = t
+        self.history[slots, writeIdx, 1:] = centers
+        self.hits[slots] += 1
+
+        self.positions[slots] = centers
+        self.bboxes[slots] = bboxes
+        self.lastTimes[slots] = t
+        self.missed[slots] = 0
+        self.velocities[slots] = self._fitVelocities(slots)
+
+    def update(self, centers: Iterable, bboxes: Iterable, t: float) -> np.ndarray:
+        '''
+        one frame of detections (centres + (x, y, w, h) bboxes) captured at time t
+        -> track id per detection, -1 for detections that did not fit into the table
+        '''
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        bboxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)
+        detIds = np.full(len(centers), -1, dtype=np.int64)
+
+        active = np.flatnonzero(self.ids >= 0)
+        matched = np.zeros(active.size, dtype=bool)
+        if active.size and len(centers):
+            predicted = self._predict(active, t)
+            distances = np.linalg.norm(predicted[:, None, :] - centers[None, :, :], axis=2)
+            trackIdx, detIdx = self._associate(distances)
+
+            slots = active[trackIdx]
+            self._record(slots, centers[detIdx], bboxes[detIdx], t)
+            detIds[detIdx] = self.ids[slots]
+            matched[trackIdx] = True
+
+        # tracks without detection coast, dropped after maxMissedFrames
+        missedSlots = active[~matched]
+        self.missed[missedSlots] += 1
+        self.ids[missedSlots[self.missed[missedSlots] > self.params.maxMissedFrames]] = -1
+
+        # new tracks for unmatched detections while there are free slots
+        newDets = np.flatnonzero(detIds < 0)
+        freeSlots = np.flatnonzero(self.ids < 0)[:newDets.size]
+        newDets = newDets[:freeSlots.size]
+        if newDets.size:
+            self.ids[freeSlots] = np.arange(self._nextId, self._nextId + newDets.size)
+            self._nextId += newDets.size
+            self.hits[freeSlots] = 0
+            self._record(freeSlots, centers[newDets], bboxes[newDets], t)
+            detIds[newDets] = self.ids[freeSlots]
+
+        self.frameInterval = t - self.time if self.time is not None else 0.0
+        self.time = t
+        return detIds
+
+    def reset(self) -> None:
+        self.ids[:] = -1
+        self.time = None
+        self.frameInterval = 0.0
@@ -8,3 +8,42 @@ def distL2(p1: np.ndarray, p2: np.ndarray):
     return np.linalg.norm(p2 - p1)
 
 
+
+
+def bboxIoUMatrix(bboxesA, bboxesB) -> np.ndarray:
+    '''(x, y, w, h) bboxes -> (len(A), len(B)) matrix of IoU'''
+    a = np.asarray(bboxesA, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(bboxesB, dtype=np.float64).reshape(-1, 4)
+    
+    ax1, ay1 = a[:, 0:1], a[:, 1:2]
+    ax2, ay2 = ax1 + a[:, 2:3], ay1 + a[:, 3:4]
+    bx1, by1 = b[:, 0], b[:, 1]
+    bx2, by2 = bx1 + b[:, 2], by1 + b[:, 3]
+    
+    interW = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    interH = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = interW * interH
+    union = a[:, 2:3] * a[:, 3:4] + b[:, 2] * b[:, 3] - inter
+    
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def matchBboxes(reference, candidates, iouThreshold: float=0.5) -> dict:
+    '''greedy IoU matching -> {tp, fp, fn, ious (of matched pairs)}'''
+    iou = bboxIoUMatrix(reference, candidates)
+    ious = []
+    
+    if iou.size:
+        # best pairs first, each box matched at most once
+        for flatIdx in np.argsort(iou, axis=None)[::-1]:
+            i, j = np.unravel_index(flatIdx, iou.shape)
+            if iou[i, j] < iouThreshold:
+                break
+            if np.isnan(iou[i, j]):
+                continue
+            ious.append(float(iou[i, j]))
+            iou[i, :] = np.nan
+            iou[:, j] = np.nan
+    
+    tp = len(ious)
+    return {'tp': tp, 'fp': len(candidates) - tp, 'fn': len(reference) - tp, 'ious': ious}
@@ -1,9 +1,79 @@
 import numpy as np
 import cv2 as cv
 
+from functools import lru_cache
 from typing import Tuple, List
 from dataclasses import dataclass, field
 
+from debug import StageTimers
+
+# bbox extraction engines:
+# stats    - single pass connectedComponentsWithStats
+# contours - external contours + boundingRect (no label image)
+# labels   - legacy np.where scan per label, O(components * pixels)
+BBOX_ENGINES = ('stats', 'contours', 'labels')
+
+# hsv thresholding engines:
+# hsv - cvtColor(BGR2HSV) + inRange every frame
+# lut - precomputed BGR -> mask table (cached per hsvMin/hsvMax), no HSV image per frame
+THRESHOLD_ENGINES = ('hsv', 'lut')
+
+# blur engines (colour noise suppression before thresholding, sized by gaussianBlurSize):
+# gaussian   - GaussianBlur of the colour image (reference)
+# box        - box filter with the gaussian's variance, running sums, cost does not grow with size
+# stack      - stackBlur of the colour image, gaussian-like weights at near box cost
+# downsample - image shrunk by up to BLUR_MAX_PYRAMID_LEVELS pyrDowns (each halves + blurs), rest of
+#              the gaussian at low resolution, back up the pyramid with pyrUp
+# mask       - colour image thresholded as is, single-channel mask blurred and re-thresholded at half
+# none       - no blur
+BLUR_ENGINES = ('gaussian', 'box', 'stack', 'downsample', 'mask', 'none')
+BLUR_MAX_PYRAMID_LEVELS = 2
+
+# label -> BGR colour, fixed palette so objects keep colours between frames
+LABEL_COLOR_LUT = np.random.default_rng(0).integers(64, 256, size=(256, 3), dtype=np.uint8)
+LABEL_COLOR_LUT[0] = 0  # bg
+
+
+@lru_cache(maxsize=4)
+def buildThresholdLUT(hsvMin: Tuple[int, int, int], hsvMax: Tuple[int, int, int]) -> np.ndarray:
+    '''
+    -> uint8 table of 2^24 entries (16MB), table[b | g << 8 | r << 16] == inRange(hsv(b, g, r))
+    built once per bounds (~0.25s), same result as cvtColor + inRange
+    '''
+    allColors = np.arange(1 << 24, dtype=np.uint32).view(np.uint8).reshape(4096, 4096, 4)[:, :, :3]
+    hsv = cv.cvtColor(np.ascontiguousarray(allColors), cv.COLOR_BGR2HSV)
+    return cv.inRange(hsv, np.array(hsvMin), np.array(hsvMax)).ravel()
+
+
+def colorizeLabels(labels: np.ndarray) -> np.ndarray:
+    '''label image -> BGR image via LABEL_COLOR_LUT (labels wrap around every 255)'''
+    lutIdx = np.where(labels > 0, (labels - 1) % 255 + 1, 0).astype(np.uint8)
+    return LABEL_COLOR_LUT[lutIdx]
+
+
+@dataclass
+class ROIConfig:
+    '''
+    valid detection area in frame coords (bbox centres outside of it are ignored)
+    shared by FrameProcessorCV (crop before processing) and AutoAimBot (bbox filtering)
+    '''
+    xCenterMin: int = 135
+    xCenterMax: float = float('inf')
+    yCenterMin: int = 0
+    yCenterMax: float = float('inf')
+    
+    def clip(self, shape: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+        '''-> (x_min, y_min, x_max, y_max) of ROI clipped to frame of `shape`'''
+        h, w = shape[:2]
+        x_min = int(min(max(self.xCenterMin, 0), w))
+        x_max = int(max(min(self.xCenterMax, w), x_min))
+        y_min = int(min(max(self.yCenterMin, 0), h))
+        y_max = int(max(min(self.yCenterMax, h), y_min))
+        return x_min, y_min, x_max, y_max
+    
+    def contains(self, x: float, y: float) -> bool:
+        return self.xCenterMin <= x <= self.xCenterMax and self.yCenterMin <= y <= self.yCenterMax
+
 
 @dataclass
 class ProcessingParams:
@@ -14,100 +84,301 @@ class ProcessingParams:
     gaussianBlurSize: int = (21, 21)
     morphKernelSize: int = (3, 3)
     morphKernelShape: int = cv.MORPH_RECT
+    bboxEngine: str = 'stats'  # stats / contours / labels
+    thresholdEngine: str = 'hsv'  # hsv / lut
+    blurEngine: str = 'gaussian'  # see BLUR_ENGINES
+    roi: ROIConfig = field(default_factory=ROIConfig)
+    dilationIterations: int = 9
+    # main pipeline runs on image resized by this factor (0.5 - half resolution),
+    # blur size and dilation iterations are scaled to match, bboxes are mapped back
+    downscale: float = 1.0
 
     def __post_init__(self):
         if not isinstance(self.hsvMin, np.ndarray):
             self.hsvMin = np.array(self.hsvMin)
         if not isinstance(self.hsvMax, np.ndarray):
             self.hsvMax = np.array(self.hsvMax)
+        if self.bboxEngine not in BBOX_ENGINES:
+            raise ValueError(f"bboxEngine must be one of {BBOX_ENGINES}, got '{self.bboxEngine}'")
+        if self.thresholdEngine not in THRESHOLD_ENGINES:
+            raise ValueError(f"thresholdEngine must be one of {THRESHOLD_ENGINES}, got '{self.thresholdEngine}'")
+        if self.blurEngine not in BLUR_ENGINES:
+            raise ValueError(f"blurEngine must be one of {BLUR_ENGINES}, got '{self.blurEngine}'")
+        if not 0 < self.downscale <= 1:
+            raise ValueError(f"downscale must be in (0, 1], got {self.downscale}")
+
+    def planKey(self) -> tuple:
+        '''everything a VisionPlan is compiled from'''
+        return (
+            self.hsvMin.tobytes(), self.hsvMax.tobytes(),
+            tuple(self.gaussianBlurSize), tuple(self.morphKernelSize), self.morphKernelShape,
+            self.thresholdEngine, self.blurEngine, self.dilationIterations, self.downscale,
+        )
 
     def __str__(self):
         return (f"ProcessingParams(hsvColor={self.hsvColor}, "
                 f"hsvMin={self.hsvMin.tolist()}, "
-                f"hsvMax={self.hsvMax.tolist()})")
+                f"hsvMax={self.hsvMax.tolist()}, "
+                f"bboxEngine={self.bboxEngine}, "
+                f"thresholdEngine={self.thresholdEngine}, "
+                f"blurEngine={self.blurEngine}, "
+                f"downscale={self.downscale})")
 
     def to_dict(self):
         return {
             "hsvColor": self.hsvColor,
             "hsvMin": self.hsvMin.tolist(),
-            "hsvMax": self.hsvMax.tolist()
+            "hsvMax": self.hsvMax.tolist(),
+            "bboxEngine": self.bboxEngine,
+            "thresholdEngine": self.thresholdEngine,
+            "blurEngine": self.blurEngine,
+            "downscale": self.downscale,
         }
 
 
-class FrameProcessorCV:
-    # bbox filtering params
-    xCenterMin = 135
-    xCenterMax = float('inf')
-    yCenterMin = 0
-    yCenterMax = float('inf')
+class VisionPlan:
+    '''
+    ProcessingParams compiled for repeated use:
+    - structuring element, scaled blur size/iterations, hsv bounds and threshold table computed once
+    - intermediate images live in reusable buffers, passed to OpenCV as dst=
     
-    def __init__(self, params: ProcessingParams=ProcessingParams()):
-        self.params = params
+    buffers are flat and grow only, buffer(name, shape) hands out a contiguous view,
+    so frames/regions of changing size do not reallocate once the largest was seen
+    '''
     
-    # ==== middle-transform methods/functions
-    def hsvThresholding(self, image):
-        '''-> hsv-thresholded mask for image'''
-      
-        hsv_image = cv.cvtColor(image, cv.COLOR_BGR2HSV)
+    def __init__(self, params: ProcessingParams) -> None:
+        self.key = params.planKey()
+        
+        self.kernel = cv.getStructuringElement(params.morphKernelShape, tuple(params.morphKernelSize))
+        
+        scale = params.downscale
+        self.scale = scale
+        # gaussian kernel scaled to processing resolution (kept odd)
+        self.blurSize = tuple(max(1, int(round(k * scale)) | 1) for k in params.gaussianBlurSize)
+        self.blurEngine = params.blurEngine
+        # box of the same variance as the gaussian (sigma OpenCV derives from ksize): (b^2 - 1) / 12 = sigma^2
+        sigmas = [0.3 * ((k - 1) * 0.5 - 1) + 0.8 for k in self.blurSize]
+        self.boxSize = tuple(max(1, int(round(np.sqrt(12 * sigma ** 2 + 1))) | 1) for sigma in sigmas)
+        # pyrDown kernel has variance 1 at its level -> (4^levels - 1) / 3 at full resolution, as many 
+        # levels as the gaussian's variance allows, the rest of it is applied at the lowest level
+        self.pyramidLevels = 0
+        while (self.pyramidLevels < BLUR_MAX_PYRAMID_LEVELS 
+               and (4 ** (self.pyramidLevels + 1) - 1) / 3 <= min(sigmas) ** 2):
+            self.pyramidLevels += 1
+        pyramidVariance = (4 ** self.pyramidLevels - 1) / 3
+        self.smallBlurSigma = tuple(np.sqrt(max(sigma ** 2 - pyramidVariance, 0)) / 2 ** self.pyramidLevels for sigma in sigmas)
+        # dilation grows blobs by 1px per iteration, scaled to processing resolution
+        self.dilationIterations = max(1, int(round(params.dilationIterations * scale)))
+        
+        # processing px a mask pixel depends on around it: blur radius + open/close (2 passes each) + dilation,
+        # the ROI is cropped with this much context so blobs at its edges come out as on the whole frame
+        blurRadius = max(self.boxSize if self.blurEngine == 'box' else self.blurSize) // 2
+        if self.blurEngine == 'none':
+            blurRadius = 0
+        kernelRadius = max(params.morphKernelSize) // 2
+        self.margin = blurRadius + kernelRadius * (4 + self.dilationIterations)
         
-        lower_bound = self.params.hsvMin
-        upper_bound = self.params.hsvMax
+        self.hsvMin = np.asarray(params.hsvMin, dtype=np.uint8)
+        self.hsvMax = np.asarray(params.hsvMax, dtype=np.uint8)
+        self.lut = None
+        if params.thresholdEngine == 'lut':
+            self.lut = buildThresholdLUT(tuple(params.hsvMin.tolist()), tuple(params.hsvMax.tolist()))
         
-        mask = cv.inRange(hsv_image, lower_bound, upper_bound)
+        self._pool = {}
+    
+    def buffer(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        size = int(np.prod(shape))
+        flat = self._pool.get(name)
+        if flat is None or flat.size < size or flat.dtype != dtype:
+            flat = self._pool[name] = np.empty(size, dtype=dtype)
+        return flat[:size].reshape(shape)
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._pool.values())
 
-        return mask
+
+class VisionResult:
+    '''
+    output of the vision pipeline
+    bboxes/areas/centroids are always there, debug images 
+    (labels, colorMask, rgbMask) are built on first access only
+    '''
     
-    def clearMaskArea(self, mask: np.ndarray):
-        maskCp = mask.copy()
+    def __init__(
+        self, 
+        mask: np.ndarray, 
+        bboxes: List[Tuple[int, int, int, int]], 
+        areas: np.ndarray, 
+        centroids: np.ndarray,
+        labels: np.ndarray | None=None,
+        region: Tuple[int, int, int, int] | None=None,
+        frameShape: Tuple[int, ...] | None=None,
+    ) -> None:
+        self.mask = mask  # morphed single-channel mask of the processed region (processing scale)
+        self.bboxes = bboxes  # frame coords
+        self.areas = areas  # full-resolution pixels
+        self.centroids = centroids  # frame coords
         
-        cleared_mask = np.zeros_like(mask, dtype=np.uint8)
+        # processed region (x, y, w, h) inside the frame
+        self.frameShape = frameShape[:2] if frameShape is not None else mask.shape[:2]
+        self.region = region if region is not None else (0, 0, self.frameShape[1], self.frameShape[0])
+        
+        self._regionLabels = labels
+        self._labels = None
+        self._frameMask = None
+        self._colorMask = None
+        self._rgbMask = None
+    
+    @property
+    def offset(self) -> Tuple[int, int]:
+        return self.region[:2]
     
-        # valid region
-        x_min = max(self.xCenterMin, 0)
-        x_max = min(self.xCenterMax, mask.shape[1])
-        y_min = max(self.yCenterMin, 0)
-        y_max = min(self.yCenterMax, mask.shape[0])
+    def _toFrame(self, regionImage: np.ndarray) -> np.ndarray:
+        '''processed-region image (any scale) -> zeroed frame-sized image with region pasted in'''
+        if regionImage.shape[:2] == self.frameShape:
+            return regionImage
         
-        cleared_mask[y_min:y_max, x_min:x_max] = mask[y_min:y_max, x_min:x_max]
+        x, y, w, h = self.region
+        frameImage = np.zeros((*self.frameShape, *regionImage.shape[2:]), dtype=regionImage.dtype)
+        if not (w and h):  # nothing was processed
+            return frameImage
         
-        return cleared_mask
+        if regionImage.shape[:2] != (h, w):  # processed at lower resolution
+            regionImage = cv.resize(regionImage, (w, h), interpolation=cv.INTER_NEAREST)
         
+        frameImage[y:y + h, x:x + w] = regionImage
+        return frameImage
+    
+    @property
+    def frameMask(self) -> np.ndarray:
+        '''mask in frame size'''
+        if self._frameMask is None:
+            self._frameMask = self._toFrame(self.mask)
+        return self._frameMask
     
-    def maskMorphologyPipeline(self, mask):
+    @property
+    def labels(self) -> np.ndarray:
+        '''label image in frame size'''
+        if self._labels is None:
+            if self._regionLabels is None:
+                _, self._regionLabels = cv.connectedComponents(self.mask)
+            self._labels = self._toFrame(self._regionLabels)
+        return self._labels
     
-        maskCp = mask.copy()
+    @property
+    def colorMask(self) -> np.ndarray:
+        '''BGR image, one colour per object'''
+        if self._colorMask is None:
+            self._colorMask = colorizeLabels(self.labels)
+        return self._colorMask
+    
+    @property
+    def rgbMask(self) -> np.ndarray:
+        '''3-channel mask for debug drawing'''
+        if self._rgbMask is None:
+            self._rgbMask = cv.cvtColor(self.frameMask, cv.COLOR_GRAY2RGB)
+        return self._rgbMask
+
+
+class FrameProcessorCV:
+    
+    def __init__(
+        self, 
+        params: ProcessingParams=ProcessingParams(), 
+        timers: StageTimers | None=None,
+        keepMasks: bool=False,
+    ):
+        self.params = params
+        # stages: blur, hsvThreshold, morphology, roi, labels, bbox
+        self.timers = timers if timers is not None else StageTimers(enabled=False)
         
-        kernel = cv.getStructuringElement(self.params.morphKernelShape, self.params.morphKernelSize)
+        # masks of results live in plan buffers and are overwritten by the next frame,
+        # keepMasks copies them into the result (debug images read later, other threads)
+        self.keepMasks = keepMasks
+        self._plan = None
+    
+    @property
+    def plan(self) -> VisionPlan:
+        '''compiled params, rebuilt when params change'''
+        if self._plan is None or self._plan.key != self.params.planKey():
+            self._plan = VisionPlan(self.params)
+        return self._plan
+    
+    # ==== middle-transform methods/functions
+    def blurImage(self, image, dst: np.ndarray | None=None):
+        '''-> colour image blurred by plan.blurEngine, image itself for 'mask' / 'none' '''
+        plan = self.plan
+        engine = plan.blurEngine
         
-        openedMask = cv.morphologyEx(mask, cv.MORPH_OPEN, kernel)
-        closedMask = cv.morphologyEx(openedMask, cv.MORPH_CLOSE, kernel)
-        dilatedMask = cv.morphologyEx(closedMask, cv.MORPH_DILATE, kernel, iterations=9)
+        if engine == 'gaussian':
+            return cv.GaussianBlur(image, plan.blurSize, 0, dst=dst)
+        if engine == 'box':
+            return cv.blur(image, plan.boxSize, dst=dst)
+        if engine == 'stack':
+            return cv.stackBlur(image, plan.blurSize, dst=dst)
+        if engine == 'downsample':
+            small = image
+            sizes = []  # shape of every level's input
+            for level in range(plan.pyramidLevels):
+                sizes.append(small.shape)
+                sh, sw = (small.shape[0] + 1) // 2, (small.shape[1] + 1) // 2
+                small = cv.pyrDown(small, dst=plan.buffer(f'blurPyramid{level}', (sh, sw, *image.shape[2:])))
+            sigmaX, sigmaY = plan.smallBlurSigma
+            if sigmaX > 0 or sigmaY > 0:
+                small = cv.GaussianBlur(small, (0, 0), sigmaX, dst=plan.buffer('blurSmall', small.shape), sigmaY=sigmaY)
+            # back up the same pyramid, pyrUp samples line up with pyrDown (resize would shift by 0.5px per level)
+            for level in reversed(range(plan.pyramidLevels)):
+                up = plan.buffer(f'blurPyramid{level - 1}', sizes[level]) if level else dst
+                small = cv.pyrUp(small, dst=up, dstsize=sizes[level][1::-1])
+            return small
+        return image
+    
+    def blurMask(self, mask, dst: np.ndarray | None=None):
+        '''blurEngine 'mask': gaussian on the thresholded mask, back to binary at half intensity'''
+        plan = self.plan
+        blurred = cv.GaussianBlur(mask, plan.blurSize, 0, dst=plan.buffer('maskBlur', mask.shape))
+        _, binary = cv.threshold(blurred, 127, 255, cv.THRESH_BINARY, dst=dst)
+        return binary
+    
+    def hsvThresholding(self, image, dst: np.ndarray | None=None):
+        '''-> hsv-thresholded mask for image'''
+        plan = self.plan
         
-        roiMask = self.clearMaskArea(dilatedMask)
+        if plan.lut is not None:
+            return self.lutThresholding(image, dst)
+      
+        hsv_image = cv.cvtColor(image, cv.COLOR_BGR2HSV, dst=plan.buffer('hsv', image.shape))
         
-        # return dilatedMask
-        return roiMask
-    
-    def separateObjects(self, mask):
-        # Ensure the mask is binary (0 or 255 values)
-        _, binaryMask = cv.threshold(mask, 127, 255, cv.THRESH_BINARY)
+        mask = cv.inRange(hsv_image, plan.hsvMin, plan.hsvMax, dst=dst)
 
-        # Find connected components in the binary mask
-        # 'cv.connectedComponents' returns the label matrix and the number of labels
-        numLabels, labels = cv.connectedComponents(binaryMask)
+        return mask
+    
+    def lutThresholding(self, image, dst: np.ndarray | None=None):
+        '''-> same mask as hsvThresholding, one table lookup per pixel'''
+        plan = self.plan
+        lut = plan.lut if plan.lut is not None else buildThresholdLUT(tuple(self.params.hsvMin.tolist()), tuple(self.params.hsvMax.tolist()))
+        
+        # BGRA viewed as little-endian uint32 is b | g << 8 | r << 16 | a << 24
+        bgra = cv.cvtColor(image, cv.COLOR_BGR2BGRA, dst=plan.buffer('bgra', (*image.shape[:2], 4)))
+        # index built straight into an intp buffer, np.take would copy any other index dtype to intp
+        lutIdx = np.bitwise_and(bgra.view(np.uint32)[..., 0], 0xFFFFFF, out=plan.buffer('lutIdx', image.shape[:2], np.intp))
         
-        # Create a color image where each object is assigned a different color
-        # This is optional but useful for visualization
-        colorMask = cv.cvtColor(binaryMask, cv.COLOR_GRAY2BGR)
-        for label in range(1, numLabels):
-            # Assign a random color for each label (object)
-            color = np.random.randint(0, 255, size=3).tolist()
-            colorMask[labels == label] = color
+        # mode='clip' so numpy writes straight into dst (mode='raise' buffers out)
+        return np.take(lut, lutIdx, out=dst, mode='clip')
+    
+    def maskMorphologyPipeline(self, mask, dst: np.ndarray | None=None):
+        plan = self.plan
+        kernel = plan.kernel
+        opened = plan.buffer('opened', mask.shape)
         
-        # Return the labeled mask (labels) and the color mask for visualization
-        return labels, colorMask
-        # return colorMask
+        with self.timers.stage('morphology'):
+            openedMask = cv.morphologyEx(mask, cv.MORPH_OPEN, kernel, dst=opened)
+            closedMask = cv.morphologyEx(openedMask, cv.MORPH_CLOSE, kernel, dst=dst)
+            dilatedMask = cv.morphologyEx(closedMask, cv.MORPH_DILATE, kernel, dst=closedMask, iterations=plan.dilationIterations)
         
+        return dilatedMask
+    
     def getBoundingBoxesFromLabels(self, labels):
         bounding_boxes = []
         unique_labels = np.unique(labels)
@@ -124,40 +395,192 @@ class FrameProcessorCV:
         
         return bounding_boxes
     
-    def simpleMorphPipeline(self, image):
-        imageCp = image.copy()
+    def toFrameBboxes(
+        self, 
+        boxes: np.ndarray, 
+        offset: Tuple[int, int]=(0, 0), 
+        scale: float=1.0,
+    ) -> List[Tuple[int, int, int, int]]:
+        '''
+        (N, 4) [x, y, w, h] boxes with w/h in pixels, found on mask resized by `scale`
+        and placed at `offset` in the frame -> frame bboxes
+        '''
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        if scale != 1.0:
+            # box covers pixels [x, x + w) of the scaled mask -> [x / s, (x + w) / s) of the frame
+            start = np.floor(boxes[:, :2] / scale).astype(np.int64)
+            end = np.floor((boxes[:, :2] + boxes[:, 2:]) / scale).astype(np.int64)
+            boxes = np.hstack((start, end - start))
         
-        kernel  = cv.getStructuringElement(self.params.morphKernelShape, self.params.morphKernelSize)
-        dilated = cv.morphologyEx(imageCp, cv.MORPH_DILATE, kernel, iterations=5)
+        # w/h count pixels, legacy contract is (x_max - x_min)
+        boxes = boxes + (offset[0], offset[1], -1, -1)
+        return [tuple(box) for box in boxes.tolist()]
+    
+    def extractObjects(
+        self, 
+        mask, 
+        offset: Tuple[int, int]=(0, 0), 
+        scale: float=1.0,
+        binary: bool=False,
+    ) -> Tuple[List[Tuple[int, int, int, int]], np.ndarray, np.ndarray, np.ndarray | None]:
+        '''
+        -> (bboxes, areas, centroids, labels) of mask blobs, engine chosen by params.bboxEngine
+        mask is the frame region at `offset` resized by `scale`, bboxes/centroids/areas 
+        are returned in frame coords, labels (of the mask itself) is None for engines 
+        that do not build a label image
+        binary: mask is already 0/255 (pipeline masks), skips thresholding
+        labels are written into a plan buffer, valid until the next call
+        '''
+        engine = self.params.bboxEngine
+        plan = self.plan
+        labels = None
+        
+        with self.timers.stage('labels'):
+            if binary:
+                binaryMask = mask
+            else:
+                _, binaryMask = cv.threshold(mask, 127, 255, cv.THRESH_BINARY, dst=plan.buffer('binary', mask.shape))
+            
+            if engine == 'stats':
+                _, labels, stats, centroids = cv.connectedComponentsWithStats(binaryMask, labels=plan.buffer('labels', mask.shape, np.int32))
+            elif engine == 'contours':
+                # outer boundary only, blobs nested in holes of other blobs are dropped
+                contours, _ = cv.findContours(binaryMask, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+            else:
+                _, labels = cv.connectedComponents(binaryMask, labels=plan.buffer('labels', mask.shape, np.int32))
         
-        return dilated
+        with self.timers.stage('bbox'):
+            # boxes: (N, 4) [x, y, w, h], w/h in pixels, mask coords
+            if engine == 'stats':
+                boxes = stats[1:, :4]
+                areas = stats[1:, cv.CC_STAT_AREA]
+                centroids = centroids[1:]
+            elif engine == 'contours':
+                boxes, areas, centroids = [], [], []
+                for contour in contours:
+                    x, y, w, h = cv.boundingRect(contour)
+                    moments = cv.moments(contour)
+                    area = moments['m00']
+                    if area > 0:
+                        centroid = (moments['m10'] / area, moments['m01'] / area)
+                    else:
+                        centroid = (x + (w - 1) / 2, y + (h - 1) / 2)  # degenerate (line) contour
+                    boxes.append((x, y, w, h))
+                    areas.append(area)
+                    centroids.append(centroid)
+                areas = np.array(areas)
+                centroids = np.array(centroids).reshape(-1, 2)
+            else:
+                boxes = [(x, y, w + 1, h + 1) for x, y, w, h in self.getBoundingBoxesFromLabels(labels)]
+                areas = np.bincount(labels.ravel())[1:]
+                centroids = np.array([(x + (w - 1) / 2, y + (h - 1) / 2) for x, y, w, h in boxes]).reshape(-1, 2)  # box centres
+            
+            bboxes = self.toFrameBboxes(boxes, offset, scale)
+            if scale != 1.0:
+                centroids = (centroids + 0.5) / scale - 0.5
+                areas = areas / scale ** 2
+            centroids = centroids + offset
         
+        return bboxes, areas, centroids, labels
     
-    def simpleVisionPipeline(self, image) -> Tuple[np.ndarray, List[np.ndarray]]:
+    def simpleMorphPipeline(self, image, dst: np.ndarray | None=None):
+        return cv.morphologyEx(image, cv.MORPH_DILATE, self.plan.kernel, dst=dst, iterations=5)
         
-        imageCp = image.copy()
-        mask = self.hsvThresholding(imageCp)
-        morphedMask = self.simpleMorphPipeline(mask)
-        labels, colorMask = self.separateObjects(morphedMask)
-        bboxes = self.getBoundingBoxesFromLabels(labels)
+    
+    def simpleVisionPipeline(self, image) -> 'VisionResult':
+        plan = self.plan
+        shape = image.shape[:2]
+        
+        with self.timers.stage('hsvThreshold'):
+            mask = self.hsvThresholding(image, dst=plan.buffer('mask', shape))
+        with self.timers.stage('morphology'):
+            morphedMask = self.simpleMorphPipeline(mask, dst=plan.buffer('morphed', shape))
         
-        # return (cv.cvtColor(colorMask, cv.COLOR_BGR2RGB), bboxes)
-        return (cv.cvtColor(morphedMask, cv.COLOR_BGR2RGB), bboxes)
+        return self._result(morphedMask, self.extractObjects(morphedMask, binary=True))
         
     
+    def _result(self, mask, objects, **kwargs) -> 'VisionResult':
+        '''mask/labels are plan buffers, copied only when results have to outlive the next call'''
+        bboxes, areas, centroids, labels = objects
+        if self.keepMasks:
+            mask = mask.copy()
+            labels = labels.copy() if labels is not None else None
+        return VisionResult(mask, bboxes, areas, centroids, labels, **kwargs)
+    
     # ====
-    def __call__(self, image):
-        '''main pipeline for frame transformation'''
+    def processingRegion(
+        self, 
+        shape: Tuple[int, ...], 
+        window: Tuple[int, int, int, int] | None=None,
+    ) -> Tuple[int, int, int, int]:
+        '''-> (x_min, y_min, x_max, y_max) of ROI, intersected with window (x, y, w, h) if given'''
+        x_min, y_min, x_max, y_max = self.params.roi.clip(shape)
+        if window is not None:
+            wx, wy, ww, wh = window
+            x_min, y_min = max(x_min, wx), max(y_min, wy)
+            x_max, y_max = max(x_min, min(x_max, wx + ww)), max(y_min, min(y_max, wy + wh))
+        return x_min, y_min, x_max, y_max
+    
+    def __call__(self, image, window: Tuple[int, int, int, int] | None=None) -> 'VisionResult':
+        '''
+        main pipeline for frame transformation, only the ROI of the frame (+ plan.margin of context) is processed
+        window (x, y, w, h): search window in frame coords, narrows processing further (tracking)
+        every intermediate image goes into plan buffers, nothing is allocated per frame 
+        once the plan has seen the frame size (result mask is valid until the next call 
+        unless keepMasks is set)
+        '''
+        plan = self.plan
+        scale = plan.scale
         
-        imageCp = image.copy()
+        with self.timers.stage('roi'):
+            x_min, y_min, x_max, y_max = self.processingRegion(image.shape, window)
+            if x_max <= x_min or y_max <= y_min:  # window outside of ROI/frame
+                return VisionResult(
+                    np.zeros((0, 0), dtype=np.uint8), [], np.empty(0), np.empty((0, 2)),
+                    labels=np.zeros((0, 0), dtype=np.int32), region=(x_min, y_min, 0, 0), frameShape=image.shape,
+                )
+            
+            # ROI + margin (frame px) of context for blur/morphology, mask is clipped to the ROI below
+            pad = int(np.ceil(plan.margin / scale))
+            fh, fw = image.shape[:2]
+            px_min, py_min = max(x_min - pad, 0), max(y_min - pad, 0)
+            px_max, py_max = min(x_max + pad, fw), min(y_max + pad, fh)
+            roiImage = image[py_min:py_max, px_min:px_max]  # view, no copy
+            
+            if scale != 1.0:
+                # same output size OpenCV picks for fx/fy
+                h, w = round(roiImage.shape[0] * scale), round(roiImage.shape[1] * scale)
+                # slivers thinner than one processed pixel keep 1px (fx/fy alone would give an empty size)
+                dsize = None if h and w else (max(w, 1), max(h, 1))
+                h, w = max(h, 1), max(w, 1)
+                roiImage = cv.resize(roiImage, dsize, dst=plan.buffer('resized', (h, w, *roiImage.shape[2:])),
+                                     fx=scale, fy=scale, interpolation=cv.INTER_AREA)
         
-        blur = cv.GaussianBlur(imageCp, self.params.gaussianBlurSize, 0)
-        mask = self.hsvThresholding(blur)
-        morphedMask = self.maskMorphologyPipeline(mask)
-        labels, colorMask = self.separateObjects(morphedMask)
+        shape = roiImage.shape[:2]
+        if plan.blurEngine == 'mask':
+            with self.timers.stage('hsvThreshold'):
+                rawMask = self.hsvThresholding(roiImage, dst=plan.buffer('rawMask', shape))
+            with self.timers.stage('blur'):
+                mask = self.blurMask(rawMask, dst=plan.buffer('mask', shape))
+        else:
+            with self.timers.stage('blur'):
+                blur = self.blurImage(roiImage, dst=plan.buffer('blur', roiImage.shape))
+            with self.timers.stage('hsvThreshold'):
+                mask = self.hsvThresholding(blur, dst=plan.buffer('mask', shape))
+        morphedMask = self.maskMorphologyPipeline(mask, dst=plan.buffer('morphed', shape))
         
-        bboxes = self.getBoundingBoxesFromLabels(labels)
+        with self.timers.stage('roi'):
+            # mask clipped back to the ROI (processing px inside the padded region), the margin was context only
+            ix_min, iy_min = round((x_min - px_min) * scale), round((y_min - py_min) * scale)
+            ix_max, iy_max = round((x_max - px_min) * scale), round((y_max - py_min) * scale)
+            morphedMask[:iy_min] = 0
+            morphedMask[iy_max:] = 0
+            morphedMask[:, :ix_min] = 0
+            morphedMask[:, ix_max:] = 0
         
-        # return (cv.cvtColor(colorMask, cv.COLOR_BGR2RGB), bboxes)
-        return (cv.cvtColor(morphedMask, cv.COLOR_BGR2RGB), bboxes)
-
+        return self._result(
+            morphedMask, 
+            self.extractObjects(morphedMask, (px_min, py_min), scale, binary=True), 
+            region=(px_min, py_min, px_max - px_min, py_max - py_min), 
+            frameShape=image.shape,
+        )